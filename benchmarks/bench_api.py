@@ -0,0 +1,123 @@
+"""Пропускная способность HTTP API (запросов в секунду).
+
+Запуск: poetry run python benchmarks/bench_api.py [клиентов] [запросов_на_клиента]
+Сервер поднимается в этом же процессе на свободном порту с каталогом данных
+во временной папке, рабочие файлы data/ не трогаются.
+"""
+
+from __future__ import annotations
+import asyncio
+import http.client
+import json
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from valutatrade_hub.infra.settings import SettingsLoader
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def isolate_data_dir(tmp: str) -> None:
+    # до импорта use cases: пути к файлам данных вычисляются при импорте
+    settings = SettingsLoader()
+    settings._config["data_dir"] = tmp  # noqa: SLF001
+    settings._config["currencies_file"] = str(  # noqa: SLF001
+        ROOT / "data" / "currencies.json"
+    )
+
+
+def start_server():
+    from valutatrade_hub.api.server import ApiServer
+    from valutatrade_hub.core.utils import start_session_cache
+
+    start_session_cache()
+    server = ApiServer(port=0)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run() -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_until_complete(server.serve_forever())
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return server
+
+
+def request(conn, method: str, path: str, body=None, token=None, close=False):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if close:
+        headers["Connection"] = "close"
+    conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    if resp.status >= 400:
+        raise RuntimeError(f"{method} {path}: {resp.status} {data}")
+    return data
+
+
+def client(port: int, index: int, count: int, keep_alive: bool) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    creds = {"username": f"bench{index}", "password": "secret123"}
+    token = request(conn, "POST", "/login", creds)["token"]
+    for i in range(count):
+        if not keep_alive:
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+        if i % 2:
+            request(conn, "GET", "/rate?from=USD&to=BTC", close=not keep_alive)
+        else:
+            request(
+                conn, "GET", "/portfolio?base=USD", token=token, close=not keep_alive
+            )
+    conn.close()
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        isolate_data_dir(tmp)
+        server = start_server()
+        port = server.port
+
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        # сделки берут курс из кэша: заполняем его
+        request(conn, "GET", "/rate?from=BTC&to=USD")
+        for i in range(clients):
+            creds = {"username": f"bench{i}", "password": "secret123"}
+            request(conn, "POST", "/register", creds)
+            token = request(conn, "POST", "/login", creds)["token"]
+            order = {"currency": "BTC", "amount": 0.5}
+            request(conn, "POST", "/buy", order, token=token)
+        conn.close()
+
+        print(f"клиентов: {clients}, запросов на клиента: {per_client}")
+        print(f"{'режим':<12}{'время, с':>10}{'запр./с':>12}")
+        for label, keep_alive in (("keep-alive", True), ("close", False)):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                futures = [
+                    pool.submit(client, port, i, per_client, keep_alive)
+                    for i in range(clients)
+                ]
+                for f in futures:
+                    f.result()
+            elapsed = time.perf_counter() - start
+            total = clients * per_client
+            print(f"{label:<12}{elapsed:>10.2f}{total / elapsed:>12.0f}")
+
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
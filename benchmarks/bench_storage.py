@@ -0,0 +1,67 @@
+"""Сравнение скорости загрузки/сохранения портфелей в разных форматах.
+
+Запуск: poetry run python benchmarks/bench_storage.py [число_портфелей]
+Данные генерируются во временном каталоге, рабочие файлы data/ не трогаются.
+"""
+
+from __future__ import annotations
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from valutatrade_hub.core.currencies import get_precision
+from valutatrade_hub.infra.serializers import available_formats, get_serializer
+
+CODES = ["USD", "EUR", "RUB", "BTC", "ETH"]
+
+
+def make_portfolios(count: int) -> list[dict]:
+    rnd = random.Random(42)
+    portfolios = []
+    for user_id in range(1, count + 1):
+        codes = rnd.sample(CODES, rnd.randint(1, len(CODES)))
+        # баланс в минимальных единицах, как пишут buy/sell
+        wallets = {
+            code: {"units": rnd.randrange(10**12), "scale": get_precision(code)}
+            for code in codes
+        }
+        portfolios.append({"user_id": user_id, "wallets": wallets})
+    return portfolios
+
+
+def measure(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    portfolios = make_portfolios(count)
+
+    print(f"Портфелей: {count}")
+    print(f"{'формат':<8} {'save, с':>9} {'load, с':>9} {'размер, КБ':>11}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in available_formats():
+            serializer = get_serializer(name)
+            path = Path(tmp) / f"portfolios{serializer.suffix}"
+            save_time = measure(lambda: serializer.dump(path, portfolios))
+            load_time = measure(lambda: serializer.load(path))
+            assert serializer.load(path) == portfolios
+            results[name] = load_time
+            size_kb = path.stat().st_size / 1024
+            print(f"{name:<8} {save_time:>9.3f} {load_time:>9.3f} {size_kb:>11.0f}")
+
+    speedup = results["json"] / results["binary"]
+    print(f"Ускорение загрузки binary vs json: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
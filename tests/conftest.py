@@ -0,0 +1,67 @@
+"""Общие настройки тестов: каталог данных во временной папке."""
+
+from __future__ import annotations
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.infra.settings import SettingsLoader
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(tempfile.mkdtemp(prefix="valutatrade-tests-"))
+
+# до импорта use cases: пути к файлам данных вычисляются при импорте
+_settings = SettingsLoader()
+_settings._config["data_dir"] = str(DATA_DIR)  # noqa: SLF001
+_settings._config["currencies_file"] = str(  # noqa: SLF001
+    ROOT / "data" / "currencies.json"
+)
+
+
+@pytest.fixture(autouse=True)
+def data_dir():
+    """Пустой каталог данных и сброшенное состояние модулей на каждый тест."""
+    for child in DATA_DIR.iterdir():
+        if child.is_dir():
+            shutil.rmtree(child)
+        else:
+            child.unlink()
+
+    from valutatrade_hub.core.alerts import reset_alert_index
+    from valutatrade_hub.core.orders import reset_order_book
+
+    reset_order_book()
+    reset_alert_index()
+    yield DATA_DIR
+
+    from valutatrade_hub.core.events import event_bus
+
+    # фоновые подписчики дописывают файлы этого теста до очистки каталога
+    event_bus.flush()
+
+
+@pytest.fixture
+def write_rates(data_dir):
+    """Записать курсы в rates.json: write_rates({"BTC_USD": 60000.0})."""
+
+    def write(rates: dict, updated_at: str | None = None) -> None:
+        stamp = updated_at or datetime.now().isoformat(timespec="seconds")
+        payload = {
+            pair: {"rate": rate, "updated_at": stamp} for pair, rate in rates.items()
+        }
+        (data_dir / "rates.json").write_text(json.dumps(payload), encoding="utf-8")
+
+    return write
+
+
+@pytest.fixture
+def user(data_dir):
+    """Зарегистрированный пользователь с пустым портфелем."""
+    from valutatrade_hub.core.usecases import register_user
+
+    created, _ = register_user("alice", "secret")
+    return created
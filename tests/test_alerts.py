@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.core import alerts
+from valutatrade_hub.core.alerts import (
+    QueueAlertSink,
+    cancel_alert,
+    create_alert,
+    list_alerts,
+    process_rate_change,
+    reset_alert_index,
+    set_alert_sink,
+)
+
+
+@pytest.fixture(autouse=True)
+def sink():
+    queue_sink = QueueAlertSink()
+    set_alert_sink(queue_sink)
+    yield queue_sink
+    set_alert_sink(None)
+
+
+def test_only_thresholds_between_old_and_new_rate_fire(sink):
+    low, _ = create_alert(1, "BTC", "USD", "above", 60000)
+    high, _ = create_alert(1, "BTC", "USD", "above", 65000)
+    drop, _ = create_alert(1, "BTC", "USD", "below", 55000)
+
+    fired = process_rate_change({"BTC_USD": (59000.0, 61000.0)})
+    assert [a.alert_id for a in fired] == [low.alert_id]
+    assert sink.queue.get_nowait()[0].alert_id == low.alert_id
+
+    # повторное пересечение того же порога не срабатывает: оповещение разовое
+    assert process_rate_change({"BTC_USD": (59000.0, 61000.0)}) == []
+
+    fired = process_rate_change({"BTC_USD": (61000.0, 54000.0)})
+    assert [a.alert_id for a in fired] == [drop.alert_id]
+    active = [a.alert_id for a in list_alerts(1)]
+    assert active == [high.alert_id]
+
+
+def test_cancelled_alert_does_not_fire():
+    alert, _ = create_alert(1, "BTC", "USD", "above", 60000)
+    cancel_alert(1, alert.alert_id)
+    assert process_rate_change({"BTC_USD": (59000.0, 61000.0)}) == []
+    with pytest.raises(ValueError, match="уже неактивно"):
+        cancel_alert(1, alert.alert_id)
+
+
+def test_other_process_changes_are_replayed():
+    alert, _ = create_alert(1, "BTC", "USD", "above", 60000)
+
+    # индекс «другого процесса» отменяет оповещение через общий журнал
+    other = alerts.AlertIndex.load()
+    other.append([{"op": "close", "alert_id": alert.alert_id, "status": "cancelled"}])
+
+    assert process_rate_change({"BTC_USD": (59000.0, 61000.0)}) == []
+    assert list_alerts(1) == []
+
+
+def test_compaction_keeps_active_and_archives_closed(monkeypatch, data_dir):
+    monkeypatch.setattr(alerts, "COMPACT_AFTER", 2)
+    created = [create_alert(1, "BTC", "USD", "above", 60000 + i)[0] for i in range(3)]
+    process_rate_change({"BTC_USD": (59000.0, 60001.0)})
+
+    assert (data_dir / "alerts_closed.ndjson").exists()
+    reset_alert_index()
+    assert [a.alert_id for a in list_alerts(1)] == [created[2].alert_id]
+    everything = list_alerts(1, include_closed=True)
+    assert [a.status for a in everything] == ["fired", "fired", "active"]
+    new, _ = create_alert(1, "BTC", "USD", "below", 50000)
+    assert new.alert_id == created[-1].alert_id + 1
+
+
+def test_concurrent_creates_are_not_lost_by_background_checks():
+    stop = threading.Event()
+
+    def checker() -> None:
+        while not stop.is_set():
+            process_rate_change({"ETH_USD": (1.0, 2.0)})
+
+    thread = threading.Thread(target=checker)
+    thread.start()
+    try:
+        ids = [
+            create_alert(1, "BTC", "USD", "above", 70000)[0].alert_id
+            for _ in range(50)
+        ]
+    finally:
+        stop.set()
+        thread.join()
+
+    assert len(set(ids)) == 50
+    reset_alert_index()
+    assert sorted(a.alert_id for a in list_alerts(1)) == sorted(ids)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from valutatrade_hub.core import analytics
+from valutatrade_hub.core.analytics import _bounded_map, aggregate_portfolios
+from valutatrade_hub.core.utils import save_portfolios
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+def btc(units: int) -> dict:
+    return {"BTC": {"units": units}}
+
+
+@pytest.fixture(params=["json", "ndjson"])
+def portfolios(request, write_rates, monkeypatch):
+    monkeypatch.setitem(
+        SettingsLoader()._config, "storage_format", request.param  # noqa: SLF001
+    )
+    write_rates({"BTC_USD": 100.0})
+    # у user 1 две записи: учитывается первая (0.5 BTC), как в find_portfolio
+    save_portfolios(
+        [
+            {"user_id": 1, "wallets": btc(50_000_000)},
+            {"user_id": 2, "wallets": btc(100_000_000)},
+            {"user_id": 3, "wallets": btc(10_000_000)},
+            {"user_id": 1, "wallets": btc(700_000_000)},
+        ]
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+@pytest.mark.parametrize("chunk_size", [2, 5000])
+def test_first_record_of_duplicate_user_wins(
+    portfolios, monkeypatch, workers, chunk_size
+):
+    # chunk_size=2 и несколько воркеров разносят повторы по разным частям
+    monkeypatch.setattr(analytics, "CHUNK_SIZE", chunk_size)
+    result = aggregate_portfolios(top_n=2, workers=workers)
+
+    assert result.leaders() == [(2, pytest.approx(100.0)), (1, pytest.approx(50.0))]
+    assert result.portfolios == 3
+    assert result.duplicates == 1
+    assert result.total_value == pytest.approx(160.0)
+    assert result.holdings["BTC"] == pytest.approx(1.6)
+
+
+def test_bounded_map_limits_items_in_flight():
+    taken = []
+
+    def items():
+        for i in range(20):
+            taken.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = _bounded_map(pool, lambda x: x * 2, items(), window=3)
+        assert next(results) == 0
+        # первый результат получен после того, как взято window + 1 элементов
+        assert len(taken) == 4
+        assert list(results) == [x * 2 for x in range(1, 20)]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from valutatrade_hub.api import server as api
+from valutatrade_hub.core.models import wallet_balance
+from valutatrade_hub.core.utils import find_portfolio
+
+
+@pytest.fixture
+def server():
+    srv = api.ApiServer(port=0)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run() -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(srv.start())
+        ready.set()
+        loop.run_forever()
+        # обработчики keep-alive соединений ещё ждут следующий запрос
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+    yield srv
+    loop.call_soon_threadsafe(srv.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def call(srv, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, json.dumps(body) if body else None, headers)
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    conn.close()
+    return resp.status, data
+
+
+def raw(srv, payload: bytes) -> bytes:
+    with socket.create_connection(("127.0.0.1", srv.port), timeout=10) as sock:
+        sock.sendall(payload)
+        chunks = []
+        while chunk := sock.recv(4096):
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@pytest.mark.parametrize("value", [b"abc", b"-5"])
+def test_bad_content_length_is_400(server, value):
+    response = raw(
+        server, b"POST /login HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n"
+    )
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+
+def test_unexpected_error_is_500_and_connection_survives(server, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(api, "get_rate", broken)
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    conn.request("GET", "/rate?from=USD&to=BTC")
+    resp = conn.getresponse()
+    assert resp.status == 500
+    assert "boom" not in json.loads(resp.read())["error"]
+
+    # keep-alive соединение продолжает обслуживать запросы
+    conn.request("GET", "/nowhere")
+    assert conn.getresponse().status == 404
+    conn.close()
+
+
+def test_parallel_buys_from_different_users(server, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    tokens = []
+    for name in ("alice", "bob", "carol", "dave"):
+        call(server, "POST", "/register", {"username": name, "password": "secret"})
+        _, data = call(
+            server, "POST", "/login", {"username": name, "password": "secret"}
+        )
+        tokens.append(data["token"])
+
+    def trade(token):
+        for _ in range(5):
+            status, _ = call(
+                server, "POST", "/buy", {"currency": "BTC", "amount": 0.01}, token
+            )
+            assert status == 200
+
+    threads = [threading.Thread(target=trade, args=(t,)) for t in tokens]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for token in tokens:
+        status, data = call(server, "GET", "/portfolio", token=token)
+        assert status == 200
+        assert "BTC" in data["table"]
+    for user_id in range(1, 5):
+        wallets = find_portfolio(user_id)["wallets"]
+        assert wallet_balance("BTC", wallets["BTC"]) == pytest.approx(0.05)
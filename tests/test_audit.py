@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from valutatrade_hub.core.audit import mark_dirty, merkle_root, run_audit, update_tree
+from valutatrade_hub.core.usecases import register_user
+from valutatrade_hub.core.utils import load_portfolios, save_portfolios, storage_paths
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+@pytest.fixture
+def users():
+    return [register_user(name, "secret")[0] for name in ("ann", "bob", "cid")]
+
+
+def set_balance(user_id: int, code: str, balance: float) -> None:
+    portfolios = load_portfolios()
+    portfolio = next(p for p in portfolios if p["user_id"] == user_id)
+    portfolio["wallets"][code] = {"balance": balance}
+    save_portfolios(portfolios)
+
+
+def test_first_run_is_full_and_finds_violations(users):
+    set_balance(users[1].user_id, "BTC", -1.0)
+    portfolios = load_portfolios()
+    portfolios.append({"user_id": users[0].user_id, "wallets": {}})
+    portfolios.append({"user_id": 99, "wallets": {}})
+    save_portfolios(portfolios)
+
+    report = run_audit()
+    assert report.full
+    assert report.checked == 4
+    kinds = sorted((v.kind, v.user_id) for v in report.violations)
+    assert kinds == [
+        ("duplicate_portfolio", users[0].user_id),
+        ("negative_balance", users[1].user_id),
+        ("orphan_portfolio", 99),
+    ]
+
+
+def test_location_names_the_stored_field(users):
+    set_balance(users[0].user_id, "BTC", -1.0)
+    portfolios = load_portfolios()
+    portfolios[1]["wallets"]["BTC"] = {"units": -5, "scale": 8}
+    save_portfolios(portfolios)
+
+    locations = sorted(v.location for v in run_audit().violations)
+    assert locations == [
+        "portfolios.json, запись #0, wallets.BTC.balance",
+        "portfolios.json, запись #1, wallets.BTC.units",
+    ]
+
+
+def test_incremental_run_does_not_decode_other_records(monkeypatch):
+    monkeypatch.setitem(
+        SettingsLoader()._config, "storage_format", "ndjson"  # noqa: SLF001
+    )
+    ann, _ = register_user("ann", "secret")
+    run_audit()
+    set_balance(ann.user_id, "BTC", -1.0)
+    mark_dirty([ann.user_id])
+    # битая строка чужого пользователя: её разбор упал бы с ошибкой
+    with storage_paths()[1].open("a", encoding="utf-8") as f:
+        f.write('{"user_id": 99, "wallets": {broken\n')
+
+    report = run_audit()
+    assert not report.full
+    assert [v.location for v in report.violations] == [
+        "portfolios.ndjson, запись #0, wallets.BTC.balance"
+    ]
+
+
+def test_unchanged_files_return_previous_result(users):
+    first = run_audit()
+    second = run_audit()
+    assert second.unchanged
+    assert second.checked == 0
+    assert second.root == first.root
+
+
+def test_only_dirty_users_are_rehashed(users):
+    run_audit()
+    set_balance(users[2].user_id, "BTC", -5.0)
+    mark_dirty([users[2].user_id])
+
+    report = run_audit()
+    assert not report.full
+    assert report.checked == 1
+    assert [v.user_id for v in report.violations] == [users[2].user_id]
+
+    # тот же корень, что и при полном пересчёте
+    assert run_audit(full=True).root == report.root
+
+
+def test_fixed_violation_disappears_incrementally(users):
+    set_balance(users[0].user_id, "BTC", -1.0)
+    assert run_audit().violations
+    set_balance(users[0].user_id, "BTC", 1.0)
+    mark_dirty([users[0].user_id])
+    report = run_audit()
+    assert report.checked == 1
+    assert report.violations == []
+
+
+def test_new_users_are_appended_to_the_tree(users):
+    run_audit()
+    new, _ = register_user("dan", "secret")
+    mark_dirty([new.user_id])
+    report = run_audit()
+    assert report.total_users == 4
+    assert report.checked == 1
+    assert run_audit(full=True).root == report.root
+
+
+def test_change_without_dirty_marks_forces_full_scan(users):
+    run_audit()
+    # правка в обход use cases: журнал изменений пуст
+    set_balance(users[0].user_id, "BTC", -1.0)
+    report = run_audit()
+    assert report.full
+    assert [v.user_id for v in report.violations] == [users[0].user_id]
+
+
+def test_update_tree_matches_full_rebuild():
+    rnd = random.Random(7)
+    leaves = [f"{i:064x}" for i in range(13)]
+    levels = [list(leaves)]
+    update_tree(levels, range(len(leaves)))
+    for _ in range(30):
+        changed = set()
+        if rnd.random() < 0.3:
+            leaves.append(f"{rnd.getrandbits(256):064x}")
+            levels[0].append(leaves[-1])
+            changed.add(len(leaves) - 1)
+        pos = rnd.randrange(len(leaves))
+        leaves[pos] = levels[0][pos] = f"{rnd.getrandbits(256):064x}"
+        changed.add(pos)
+        assert update_tree(levels, changed) == merkle_root(leaves)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core.currencies import (
+    CryptoCurrency,
+    FiatCurrency,
+    from_minor_units,
+    list_currencies,
+    to_minor_units,
+)
+
+
+@pytest.mark.parametrize(
+    ("amount", "code", "units"),
+    [(0.1, "BTC", 10_000_000), ("19.99", "USD", 1999), (2, "USD", 200)],
+)
+def test_minor_units_round_trip(amount, code, units):
+    assert to_minor_units(amount, code) == units
+    assert from_minor_units(units, code) == float(amount)
+
+
+@pytest.mark.parametrize("amount", [True, "abc"])
+def test_non_numbers_are_rejected(amount):
+    with pytest.raises(TypeError):
+        to_minor_units(amount, "USD")
+
+
+def test_list_currencies_filters_by_kind_and_search():
+    fiat = list_currencies(kind="fiat")
+    assert fiat and all(isinstance(c, FiatCurrency) for c in fiat)
+    crypto = list_currencies(kind="crypto", search="bit")
+    assert "BTC" in [c.code for c in crypto]
+    assert all(isinstance(c, CryptoCurrency) for c in crypto)
+    codes = [c.code for c in list_currencies()]
+    assert codes == sorted(codes)
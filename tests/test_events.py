@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import threading
+
+from valutatrade_hub.core import subscribers
+from valutatrade_hub.core.events import EventBus, TradeExecuted
+from valutatrade_hub.core.history import query_history
+from valutatrade_hub.core.usecases import buy_currency
+
+
+def run_threads(target, count: int = 8) -> None:
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_shared_bus_installs_standard_subscribers(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    buy_currency(user.user_id, "BTC", 0.1)
+
+    assert len(query_history(user.user_id)) == 1
+
+
+def test_setup_runs_once_under_concurrent_publish():
+    calls = []
+    bus = EventBus(setup=lambda b: calls.append(b))
+    run_threads(lambda: bus.publish(object()))
+
+    assert calls == [bus]
+    assert bus.stats["published"] == 8
+
+
+def test_metrics_are_not_lost_between_threads():
+    bus = EventBus()
+    bus.subscribe(TradeExecuted, subscribers.count_trade, mode="thread")
+    bus.subscribe(TradeExecuted, subscribers.count_trade, mode="thread")
+    event = TradeExecuted(1, "buy", "BTC", "USD", 1.0, 1.0, 1.0)
+    before = subscribers.metrics["trades.buy"]
+
+    def publish() -> None:
+        for _ in range(500):
+            bus.publish(event)
+
+    run_threads(publish)
+    bus.shutdown()
+
+    assert subscribers.metrics["trades.buy"] - before == 2 * 8 * 500
+    assert bus.stats["delivered"] == 2 * 8 * 500
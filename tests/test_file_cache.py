@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import utils
+from valutatrade_hub.core.usecases import buy_currency, register_user
+from valutatrade_hub.core.utils import (
+    find_portfolio,
+    save_portfolio,
+    start_session_cache,
+    stop_session_cache,
+)
+from valutatrade_hub.infra.file_cache import session_cache
+
+
+@pytest.fixture
+def cache():
+    start_session_cache()
+    yield session_cache
+    stop_session_cache()
+
+
+def test_mutating_returned_portfolio_does_not_touch_cache(cache, user):
+    portfolio = find_portfolio(user.user_id)
+    portfolio["wallets"]["BTC"] = {"balance": 1.0}
+
+    assert find_portfolio(user.user_id)["wallets"] == {}
+
+
+def test_failed_trade_does_not_leave_auto_created_wallet(
+    cache, user, write_rates, monkeypatch
+):
+    write_rates({"BTC_USD": 60000.0})
+    find_portfolio(user.user_id)
+
+    def broken_dump(path, records):
+        raise OSError("диск заполнен")
+
+    monkeypatch.setattr(utils._serializer(), "dump", broken_dump)  # noqa: SLF001
+    with pytest.raises(OSError):
+        buy_currency(user.user_id, "BTC", 0.5)
+    monkeypatch.undo()
+
+    assert find_portfolio(user.user_id)["wallets"] == {}
+
+
+def test_saving_one_portfolio_keeps_other_users_cached(cache, user):
+    bob, _ = register_user("bob", "secret")
+    find_portfolio(user.user_id)
+    find_portfolio(bob.user_id)
+
+    portfolio = find_portfolio(user.user_id)
+    portfolio["wallets"]["EUR"] = {"balance": 5.0}
+    save_portfolio(portfolio)
+
+    misses = cache.misses
+    assert find_portfolio(bob.user_id)["wallets"] == {}
+    assert find_portfolio(user.user_id)["wallets"]["EUR"] == {"balance": 5.0}
+    assert cache.misses == misses
+
+
+def test_external_change_is_reread(cache, user):
+    find_portfolio(user.user_id)
+    # другой процесс переписывает файл в обход кэша
+    serializer = utils._serializer()  # noqa: SLF001
+    path = utils.storage_paths()[1]
+    serializer.dump(
+        path, [{"user_id": user.user_id, "wallets": {"EUR": {"balance": 2.0}}}]
+    )
+
+    assert find_portfolio(user.user_id)["wallets"]["EUR"] == {"balance": 2.0}
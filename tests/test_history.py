@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from valutatrade_hub.core import history
+from valutatrade_hub.core.history import query_history, record_trade
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def trades(monkeypatch):
+    # маленький блок: обратный проход читает индекс в несколько приёмов
+    monkeypatch.setattr(history, "_BLOCK", 3)
+    for i in range(10):
+        record_trade(
+            1,
+            "buy",
+            "BTC" if i % 2 else "ETH",
+            float(i),
+            100.0,
+            float(i),
+            "USD",
+            timestamp=START + timedelta(minutes=i),
+        )
+
+
+def test_pages_go_from_newest_to_oldest(trades):
+    first = query_history(1, limit=4)
+    assert [r["amount"] for r in first] == [9.0, 8.0, 7.0, 6.0]
+
+    cursor = datetime.fromisoformat(first[-1]["timestamp"])
+    second = query_history(1, limit=4, before=cursor)
+    assert [r["amount"] for r in second] == [5.0, 4.0, 3.0, 2.0]
+
+
+def test_currency_filter_and_empty_history(trades):
+    records = query_history(1, limit=10, currency="btc")
+    assert [r["amount"] for r in records] == [9.0, 7.0, 5.0, 3.0, 1.0]
+    assert query_history(2) == []
+    with pytest.raises(ValueError):
+        query_history(1, limit=0)
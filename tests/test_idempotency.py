@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.core import idempotency
+from valutatrade_hub.core.idempotency import IdempotencyStore
+from valutatrade_hub.core.models import wallet_balance
+from valutatrade_hub.core.usecases import buy_currency
+from valutatrade_hub.core.utils import find_portfolio
+
+
+def btc_balance(user_id: int) -> float:
+    return wallet_balance("BTC", find_portfolio(user_id)["wallets"].get("BTC"))
+
+
+def test_replay_returns_first_result_without_second_trade(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    first = buy_currency(user.user_id, "BTC", 0.1, idempotency_key="k1")
+    again = buy_currency(
+        user_id=user.user_id, currency_code="BTC", amount=0.1, idempotency_key="k1"
+    )
+
+    assert again == first
+    assert btc_balance(user.user_id) == 0.1
+
+
+def test_same_key_with_other_params_is_rejected(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    buy_currency(user.user_id, "BTC", 0.1, idempotency_key="k1")
+    with pytest.raises(ValueError):
+        buy_currency(user.user_id, "BTC", 0.2, idempotency_key="k1")
+
+
+def test_keys_are_scoped_by_positional_user_id(user, write_rates):
+    from valutatrade_hub.core.usecases import register_user
+
+    write_rates({"BTC_USD": 60000.0})
+    bob, _ = register_user("bob", "secret")
+    buy_currency(user.user_id, "BTC", 0.1, idempotency_key="same")
+    buy_currency(bob.user_id, "BTC", 0.1, idempotency_key="same")
+
+    assert btc_balance(bob.user_id) == 0.1
+
+
+def test_other_process_sees_keys_from_journal(data_dir):
+    path = data_dir / "keys.json"
+    writer = IdempotencyStore(path, ttl_seconds=60, max_keys=10)
+    reader = IdempotencyStore(path, ttl_seconds=60, max_keys=10)
+    writer.put((1, "BUY", "a"), "fp", ["ok"])
+
+    assert reader.get((1, "BUY", "a"), "fp") == ["ok"]
+    assert not path.exists()  # только журнал, снимок не переписывался
+
+
+def test_compaction_drops_expired_keys(data_dir, monkeypatch):
+    monkeypatch.setattr(idempotency, "COMPACT_AFTER", 4)
+    path = data_dir / "keys.json"
+    store = IdempotencyStore(path, ttl_seconds=60, max_keys=4)
+    store.put((1, "BUY", "old"), "fp", ["old"])
+
+    now = idempotency.time.time()
+    monkeypatch.setattr(idempotency.time, "time", lambda: now + 120)
+    for n in range(3):
+        store.put((1, "BUY", f"new{n}"), "fp", [n])
+
+    assert store.journal.generation == 1
+    assert store.journal.log_path().read_bytes() == b""
+    fresh = IdempotencyStore(path, ttl_seconds=60, max_keys=4)
+    assert fresh.get((1, "BUY", "old"), "fp") is None
+    assert fresh.get((1, "BUY", "new2"), "fp") == [2]
+
+
+def test_claims_of_other_users_do_not_wait(data_dir):
+    store = IdempotencyStore(data_dir / "keys.json", ttl_seconds=60, max_keys=10)
+    entered = threading.Event()
+
+    def other_user() -> None:
+        with store.claim((2, "BUY", "k"), "fp") as claim:
+            claim.commit(["bob"])
+        entered.set()
+
+    with store.claim((1, "BUY", "k"), "fp"):
+        thread = threading.Thread(target=other_user)
+        thread.start()
+        assert entered.wait(5)
+    thread.join()
+
+
+def test_concurrent_replay_waits_for_first_result(data_dir):
+    store = IdempotencyStore(data_dir / "keys.json", ttl_seconds=60, max_keys=10)
+    replayed = []
+
+    def replay() -> None:
+        with store.claim((1, "BUY", "k"), "fp") as claim:
+            replayed.append(claim.result)
+
+    with store.claim((1, "BUY", "k"), "fp") as claim:
+        assert not claim.done
+        thread = threading.Thread(target=replay)
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()  # повтор ждёт, пока первая сделка не завершится
+        claim.commit(["first"])
+    thread.join()
+    assert replayed == [["first"]]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core.importer import import_users
+from valutatrade_hub.core.usecases import login_user
+from valutatrade_hub.core.utils import find_portfolio, load_users
+
+
+def write_csv(path, rows):
+    path.write_text(
+        "username,password\n" + "".join(f"{u},{p}\n" for u, p in rows),
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_import_assigns_ids_after_existing_users(user, tmp_path):
+    csv_path = write_csv(
+        tmp_path / "users.csv",
+        [
+            ("bob", "secret"),
+            ("", "secret"),
+            ("eve", "123"),
+            ("alice", "secret"),
+            ("carl", "secret"),
+            ("bob", "secret"),
+        ],
+    )
+    result = import_users(csv_path, workers=1)
+
+    assert (result.imported, result.first_id, result.last_id) == (2, 2, 3)
+    assert [reason for _, _, reason in result.skipped] == [
+        "пустое имя пользователя",
+        "пароль короче 4 символов",
+        "имя уже занято",
+        "имя уже занято",
+    ]
+    assert [u.username for u in load_users()] == ["alice", "bob", "carl"]
+    assert find_portfolio(3) == {"user_id": 3, "wallets": {}, "version": 0}
+    assert login_user("carl", "secret")[0].user_id == 3
+
+
+def test_nothing_to_import_leaves_files_untouched(user, tmp_path, data_dir):
+    before = (data_dir / "users.json").read_bytes()
+    result = import_users(write_csv(tmp_path / "u.csv", [("alice", "x1234")]))
+    assert result.imported == 0
+    assert (data_dir / "users.json").read_bytes() == before
+
+
+def test_missing_columns_are_rejected(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("name,pass\nbob,secret\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        import_users(path, workers=1)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from valutatrade_hub.infra import log_archive
+from valutatrade_hub.infra.log_archive import (
+    PartitionedFileHandler,
+    compress_partition,
+    load_index,
+)
+
+
+def emit(handler: logging.Handler, message: str) -> None:
+    handler.handle(logging.makeLogRecord({"msg": message}))
+
+
+def wait_for_compression() -> None:
+    log_archive._COMPRESSOR.submit(lambda: None).result()  # noqa: SLF001
+
+
+def test_second_process_does_not_rotate_again(data_dir):
+    path = data_dir / "actions.log"
+    first, second = PartitionedFileHandler(path), PartitionedFileHandler(path)
+    emit(first, "a1")
+    emit(second, "b1")
+
+    # оба «процесса» дошли до одной границы партиции
+    boundary = time.time() - 1
+    first.rolloverAt = second.rolloverAt = boundary
+    emit(first, "a2")
+    wait_for_compression()
+    emit(second, "b2")
+    wait_for_compression()
+    first.close()
+    second.close()
+
+    partitions = load_index(data_dir / "archive")
+    assert [p["lines"] for p in partitions] == [2]
+    assert path.read_text(encoding="utf-8").split() == ["a2", "b2"]
+
+
+def test_partition_is_compressed_once(data_dir):
+    archive = data_dir / "archive"
+    archive.mkdir()
+    partition = archive / "actions-2026-01-01_10.log"
+    partition.write_text("line\n", encoding="utf-8")
+
+    assert compress_partition(partition)["lines"] == 1
+    assert compress_partition(partition) is None
+    assert len(load_index(archive)) == 1
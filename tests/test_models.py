@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core.models import Portfolio, Wallet, wallet_balance
+from valutatrade_hub.core.usecases import buy_currency, sell_currency
+from valutatrade_hub.core.utils import find_portfolio
+
+
+@pytest.mark.parametrize("method", ["deposit_units", "withdraw_units"])
+@pytest.mark.parametrize("units", [0, -1])
+def test_wallet_rejects_non_positive_units(method, units):
+    wallet = Wallet("BTC", units=100)
+    with pytest.raises(ValueError):
+        getattr(wallet, method)(units)
+    assert wallet.units == 100
+
+
+def test_legacy_float_balance_is_read_as_units():
+    portfolio = Portfolio.from_record(
+        {"user_id": 7, "wallets": {"BTC": {"balance": 0.10999999999999995}}}
+    )
+    assert portfolio.get_wallet("BTC").units == 11_000_000
+    assert portfolio.to_record() == {
+        "user_id": 7,
+        "wallets": {"BTC": {"units": 11_000_000, "scale": 8}},
+        "version": 0,
+    }
+
+
+def test_total_value_uses_given_rates():
+    portfolio = Portfolio.from_record(
+        {"user_id": 1, "wallets": {"BTC": {"units": 50_000_000}, "XYZ": {"units": 5}}}
+    )
+    assert portfolio.get_total_value({"BTC": 60000.0}) == pytest.approx(30000.0)
+
+
+def test_trades_store_integer_units(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    for _ in range(3):
+        buy_currency(user.user_id, "BTC", 0.1)
+    sell_currency(user.user_id, "BTC", 0.2)
+
+    wallets = find_portfolio(user.user_id)["wallets"]
+    assert wallets["BTC"] == {"units": 10_000_000, "scale": 8}
+    assert wallet_balance("BTC", wallets["BTC"]) == 0.1
+
+
+def test_units_written_at_other_precision_are_rejected():
+    record = {"user_id": 1, "wallets": {"BTC": {"units": 11_000_000, "scale": 6}}}
+    with pytest.raises(ValueError, match="точностью 6"):
+        Portfolio.from_record(record)
+    with pytest.raises(ValueError):
+        wallet_balance("BTC", record["wallets"]["BTC"])
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.infra import ndjson
+from valutatrade_hub.infra.serializers import get_serializer
+
+
+def records(n: int) -> list[dict]:
+    return [{"user_id": i, "wallets": {"BTC": {"units": i}}} for i in range(n)]
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson", "binary"])
+def test_readers_never_see_a_half_written_file(fmt, tmp_path):
+    serializer = get_serializer(fmt)
+    path = tmp_path / f"portfolios{serializer.suffix}"
+    serializer.dump(path, records(2000))
+    stop = threading.Event()
+
+    def writer() -> None:
+        size = 2000
+        while not stop.is_set():
+            size = 4000 if size == 2000 else 2000
+            serializer.dump(path, records(size))
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(50):
+            assert len(serializer.load(path)) in (2000, 4000)
+            assert serializer.find(path, 1999) == records(2000)[1999]
+    finally:
+        stop.set()
+        thread.join()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_read_record_recovers_from_index_of_replaced_file(tmp_path, monkeypatch):
+    path = tmp_path / "users.ndjson"
+    ndjson.write_records(path, records(3))
+    stale = ndjson.load_index(path)
+    ndjson.write_records(path, list(reversed(records(3))))
+
+    # индекс прочитан до замены файла данных
+    monkeypatch.setattr(ndjson, "load_index", lambda path, key="user_id": stale)
+    assert ndjson.read_record(path, 0) == records(3)[0]
+    assert ndjson.read_record(path, 2) == records(3)[2]
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "users.ndjson"
+    ndjson.write_records(path, records(3))
+
+    def broken():
+        yield records(1)[0]
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        ndjson.write_records(path, broken())
+    assert list(ndjson.iter_records(path)) == records(3)
+    assert not list(tmp_path.glob("*.tmp"))
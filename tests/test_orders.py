@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import orders
+from valutatrade_hub.core.orders import (
+    cancel_order,
+    list_orders,
+    place_order,
+    process_rate_update,
+    reset_order_book,
+)
+from valutatrade_hub.core.models import wallet_balance
+from valutatrade_hub.core.utils import load_portfolios
+
+
+def balance(user_id: int, code: str) -> float:
+    portfolio = next(p for p in load_portfolios() if p["user_id"] == user_id)
+    return wallet_balance(code, portfolio["wallets"].get(code))
+
+
+def test_crossed_orders_fill_in_limit_order(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    cheap, _ = place_order(user.user_id, "buy", "BTC", 58000, 0.1)
+    deep, _ = place_order(user.user_id, "buy", "BTC", 50000, 0.2)
+
+    assert process_rate_update({"BTC_USD": 59000.0}) == []
+
+    executed = process_rate_update({"BTC_USD": 57000.0})
+    assert [o.order_id for o, _ in executed] == [cheap.order_id]
+    assert executed[0][0].status == "filled"
+    assert balance(user.user_id, "BTC") == pytest.approx(0.1)
+
+    open_ids = [o.order_id for o in list_orders(user.user_id)]
+    assert open_ids == [deep.order_id]
+
+
+def test_sell_order_fills_when_rate_rises(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    place_order(user.user_id, "buy", "BTC", 70000, 0.5)
+    process_rate_update({"BTC_USD": 60000.0})
+    sell, _ = place_order(user.user_id, "sell", "BTC", 65000, 0.2)
+
+    assert process_rate_update({"BTC_USD": 64000.0}) == []
+    executed = process_rate_update({"BTC_USD": 66000.0})
+    assert [o.order_id for o, _ in executed] == [sell.order_id]
+    assert balance(user.user_id, "BTC") == pytest.approx(0.3)
+
+
+def test_cancelled_order_is_skipped(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    order, _ = place_order(user.user_id, "buy", "BTC", 58000, 0.1)
+    cancel_order(user.user_id, order.order_id)
+
+    assert process_rate_update({"BTC_USD": 50000.0}) == []
+    with pytest.raises(ValueError, match="уже закрыт"):
+        cancel_order(user.user_id, order.order_id)
+
+
+def test_changes_are_appended_not_rewritten(user, write_rates, data_dir):
+    write_rates({"BTC_USD": 60000.0})
+    place_order(user.user_id, "buy", "BTC", 58000, 0.1)
+    process_rate_update({"BTC_USD": 57000.0})
+
+    # снимок не создаётся, пока нет компактизации: только журнал
+    assert not (data_dir / "orders.json").exists()
+    lines = (data_dir / "orders.0.log").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+
+
+def test_other_process_changes_are_replayed(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    order, _ = place_order(user.user_id, "buy", "BTC", 58000, 0.1)
+
+    # книга «другого процесса» — отдельный объект поверх тех же файлов
+    reset_order_book()
+    other = orders.OrderBook.load()
+    other.close(other.orders[order.order_id], "cancelled")
+
+    reset_order_book()
+    assert list_orders(user.user_id) == []
+    assert process_rate_update({"BTC_USD": 50000.0}) == []
+
+
+def test_compaction_archives_terminal_orders(user, write_rates, data_dir, monkeypatch):
+    monkeypatch.setattr(orders, "COMPACT_AFTER", 3)
+    write_rates({"BTC_USD": 60000.0})
+    placed = [place_order(user.user_id, "buy", "BTC", 58000, 0.1)[0] for _ in range(4)]
+    for order in placed[:3]:
+        cancel_order(user.user_id, order.order_id)
+
+    assert not (data_dir / "orders.0.log").exists()
+    assert (data_dir / "orders.1.log").read_bytes() == b""
+    assert [o.order_id for o in list_orders(user.user_id)] == [placed[3].order_id]
+    everything = list_orders(user.user_id, include_closed=True)
+    assert [o.order_id for o in everything] == [o.order_id for o in placed]
+
+    # после перезапуска книга восстанавливается из снимка, id не повторяются
+    reset_order_book()
+    new, _ = place_order(user.user_id, "sell", "BTC", 70000, 0.1)
+    assert new.order_id == placed[-1].order_id + 1
+    with pytest.raises(ValueError, match="уже закрыт"):
+        cancel_order(user.user_id, placed[0].order_id)
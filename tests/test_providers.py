@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.infra import providers as prov
+from valutatrade_hub.infra.providers import (
+    CircuitBreaker,
+    FakeProvider,
+    PairUnavailableError,
+    ResilientFetcher,
+)
+
+
+def fake(name: str, **kwargs) -> FakeProvider:
+    provider = FakeProvider(seed=1, **kwargs)
+    provider.name = name
+    return provider
+
+
+def test_breaker_opens_after_threshold_and_probes_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # пока пробный запрос не завершён, остальные не пропускаются
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failing_provider_falls_over_and_is_short_circuited():
+    broken = fake("broken", failure_rate=1.0)
+    backup = fake("backup")
+    fetcher = ResilientFetcher([broken, backup], failure_threshold=2)
+
+    for _ in range(3):
+        assert fetcher.fetch("USD", "BTC") == (0.00001685, "backup")
+
+    assert fetcher.stats["broken"].failures == 2
+    assert fetcher.stats["broken"].short_circuited == 1
+    assert fetcher.breakers["broken"].state == CircuitBreaker.OPEN
+
+
+def test_slow_provider_is_hedged(monkeypatch):
+    monkeypatch.setattr(prov, "DEFAULT_HEDGE_DELAY", 0.05)
+    slow = fake("slow", delay=0.5)
+    fast = fake("fast")
+    fetcher = ResilientFetcher([slow, fast], deadline=2.0)
+
+    started = time.monotonic()
+    assert fetcher.fetch("BTC", "USD") == (59337.21, "fast")
+    assert time.monotonic() - started < 0.4
+    assert fetcher.stats["fast"].hedged == 1
+
+
+def test_deadline_raises_and_counts_timeouts():
+    fetcher = ResilientFetcher([fake("slow", delay=0.3)], deadline=0.05)
+    with pytest.raises(ApiRequestError):
+        fetcher.fetch("USD", "BTC")
+    assert fetcher.stats["slow"].timeouts == 1
+
+
+def test_unknown_pair_does_not_trip_breaker():
+    fetcher = ResilientFetcher([fake("only")], failure_threshold=1)
+    with pytest.raises(PairUnavailableError):
+        fetcher.fetch("USD", "EUR")
+    assert fetcher.breakers["only"].state == CircuitBreaker.CLOSED
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.quotes import create_quote
+from valutatrade_hub.core.usecases import buy_currency, sell_currency
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+def test_stale_cached_rate_is_rejected(user, write_rates):
+    old = (datetime.now() - timedelta(hours=1)).isoformat(timespec="seconds")
+    write_rates({"BTC_USD": 60000.0}, updated_at=old)
+    with pytest.raises(ValueError, match="устарел"):
+        buy_currency(user.user_id, "BTC", 0.1)
+
+
+def test_expired_quote_is_rejected(user, write_rates, monkeypatch):
+    write_rates({"BTC_USD": 60000.0})
+    config = SettingsLoader()._config  # noqa: SLF001
+    monkeypatch.setitem(config, "quote_ttl_seconds", 0)
+    quote = create_quote(user.user_id, "BTC", "USD")
+    with pytest.raises(ValueError):
+        buy_currency(user.user_id, "BTC", 0.1, quote_id=quote.quote_id)
+
+
+def test_quote_is_single_use(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    quote = create_quote(user.user_id, "BTC", "USD")
+    buy_currency(user.user_id, "BTC", 0.1, quote_id=quote.quote_id)
+    with pytest.raises(ValueError, match="не найдена"):
+        buy_currency(user.user_id, "BTC", 0.1, quote_id=quote.quote_id)
+
+
+def test_failed_trade_keeps_quote(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    buy_currency(user.user_id, "BTC", 0.1)
+    quote = create_quote(user.user_id, "BTC", "USD")
+    with pytest.raises(InsufficientFundsError):
+        sell_currency(user.user_id, "BTC", 5, quote_id=quote.quote_id)
+
+    sell_currency(user.user_id, "BTC", 0.05, quote_id=quote.quote_id)
+
+
+def test_parallel_trades_cannot_share_quote(user, write_rates):
+    write_rates({"BTC_USD": 60000.0})
+    quote = create_quote(user.user_id, "BTC", "USD")
+    outcomes = []
+
+    def trade() -> None:
+        try:
+            buy_currency(user.user_id, "BTC", 0.1, quote_id=quote.quote_id)
+            outcomes.append("ok")
+        except ValueError:
+            outcomes.append("rejected")
+
+    threads = [threading.Thread(target=trade) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ["ok", "rejected", "rejected", "rejected"]
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import time
+
+from valutatrade_hub.infra.rate_budget import RateBudget
+
+
+def test_reserve_is_kept_for_hot_pairs(tmp_path):
+    budget = RateBudget(tmp_path, capacity=3, refill_per_minute=0, reserve=1)
+    assert budget.try_acquire("EUR_USD")
+    assert budget.try_acquire("EUR_USD")
+    # остался один жетон — это резерв, холодной паре он не достаётся
+    assert not budget.try_acquire("EUR_USD")
+
+    budget.mark_traded("USD_BTC")
+    assert budget.try_acquire("BTC_USD")  # обратная пара тоже «горячая»
+    assert not budget.try_acquire("BTC_USD")
+
+
+def test_state_is_shared_between_instances(tmp_path):
+    first = RateBudget(tmp_path, capacity=2, refill_per_minute=0, reserve=0)
+    second = RateBudget(tmp_path, capacity=2, refill_per_minute=0, reserve=0)
+    assert first.try_acquire("EUR_USD")
+    assert second.try_acquire("EUR_USD")
+    assert not first.try_acquire("EUR_USD")
+
+
+def test_tokens_refill_over_time(tmp_path):
+    budget = RateBudget(tmp_path, capacity=1, refill_per_minute=600, reserve=0)
+    assert budget.try_acquire("EUR_USD")
+    assert not budget.try_acquire("EUR_USD")
+    time.sleep(0.15)
+    assert budget.try_acquire("EUR_USD")
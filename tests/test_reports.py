@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import gzip
+from datetime import datetime
+
+import pytest
+
+from valutatrade_hub.core.reports import build_report, daily_volume, find_log_files
+from valutatrade_hub.decorators import format_action
+from valutatrade_hub.infra.log_archive import compress_partition
+
+
+def line(ts, action, user, currency, amount, result="OK", extra=""):
+    return format_action(ts, action, user, currency, amount, "USD", result, extra)
+
+
+@pytest.fixture
+def logs(tmp_path):
+    archive = tmp_path / "archive"
+    archive.mkdir()
+    old = archive / "actions-2026-01-01_10.log"
+    old.write_text(
+        line("2026-01-01T10:00:00", "BUY", 1, "BTC", 0.5)
+        + "\n"
+        + line("2026-01-01T10:30:00", "SELL", 2, "BTC", 0.25)
+        + "\n",
+        encoding="utf-8",
+    )
+    compress_partition(old)
+    (tmp_path / "actions.log").write_text(
+        line("2026-01-02T09:00:00", "BUY", 1, "ETH", 2)
+        + "\n"
+        + line(
+            "2026-01-02T09:05:00",
+            "BUY",
+            1,
+            "ETH",
+            1,
+            "ERROR",
+            " error_type=InsufficientFundsError error_message='x'",
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_report_over_active_log_and_archive(logs, workers):
+    files = find_log_files(logs)
+    assert [p.name for p in files] == ["actions.log", "actions-2026-01-01_10.log.gz"]
+
+    report = build_report(files, workers=workers)
+    assert (report.total, report.errors) == (4, 1)
+    assert report.users == {"1": 3, "2": 1}
+    assert daily_volume(report) == {
+        "2026-01-01": {"BTC": (0.75, 2)},
+        "2026-01-02": {"ETH": (2.0, 1)},
+    }
+    assert report.error_rates() == [("InsufficientFundsError", 1, 0.25)]
+
+
+def test_interval_skips_archive_partitions_outside_it(logs):
+    start = datetime(2026, 1, 2)
+    files = find_log_files(logs, start=start)
+    assert [p.name for p in files] == ["actions.log"]
+    assert build_report(files, workers=1, start=start).total == 2
+
+
+def test_gzip_partition_keeps_every_line(logs):
+    with gzip.open(logs / "archive" / "actions-2026-01-01_10.log.gz", "rt") as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import marshal
+
+import pytest
+
+from valutatrade_hub.infra.serializers import BinarySnapshotSerializer, get_serializer
+
+RECORDS = [
+    {"user_id": 1, "wallets": {"USD": {"units": 100}, "BTC": {"units": 5}}},
+    {"user_id": 2, "wallets": {"BTC": {"units": 7}}},
+    {"user_id": 3, "wallets": {}},
+]
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson", "binary"])
+def test_round_trip(fmt, tmp_path):
+    serializer = get_serializer(fmt)
+    path = tmp_path / f"portfolios{serializer.suffix}"
+    serializer.dump(path, RECORDS)
+    assert serializer.load(path) == RECORDS
+    assert serializer.find(path, 2) == RECORDS[1]
+
+
+def test_binary_snapshot_stores_each_code_once(tmp_path):
+    serializer = BinarySnapshotSerializer()
+    path = tmp_path / "portfolios.bin"
+    serializer.dump(path, RECORDS)
+
+    raw = path.read_bytes()[len(serializer.MAGIC) :]
+    _, codes, records = marshal.loads(raw)
+    assert codes == ["USD", "BTC"]
+    assert records[1]["wallets"] == {1: {"units": 7}}
+
+    loaded = serializer.load(path)
+    first, second = (r["wallets"] for r in loaded[:2])
+    assert next(k for k in first if k == "BTC") is next(iter(second))
+
+
+def test_binary_snapshot_rejects_old_magic(tmp_path):
+    path = tmp_path / "portfolios.bin"
+    path.write_bytes(b"VTSNAP2\n" + marshal.dumps((marshal.version, RECORDS)))
+    with pytest.raises(ValueError):
+        BinarySnapshotSerializer().load(path)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.core.sessions import SessionStore
+
+
+@pytest.fixture
+def make_store(data_dir):
+    def make(ttl_seconds: float = 60) -> SessionStore:
+        return SessionStore(
+            data_dir / "sessions.json", data_dir / "session_secret", ttl_seconds
+        )
+
+    return make
+
+
+def test_issued_token_resolves_until_revoked(make_store):
+    store = make_store()
+    token, session = store.issue(1, "alice")
+    assert store.resolve(token) == session
+
+    store.revoke(token)
+    with pytest.raises(ValueError, match="завершена"):
+        store.resolve(token)
+
+
+def test_expired_token_is_rejected(make_store):
+    store = make_store(ttl_seconds=-1)
+    token, _ = store.issue(1, "alice")
+    with pytest.raises(ValueError, match="истекла"):
+        store.resolve(token)
+
+
+def test_tampered_token_is_rejected(make_store):
+    store = make_store()
+    token, _ = store.issue(1, "alice")
+    session_id, _, expires_at, signature = token.split(".")
+    with pytest.raises(ValueError, match="Недействительный"):
+        store.resolve(f"{session_id}.2.{expires_at}.{signature}")
+
+
+def test_revocation_is_seen_by_other_process(make_store):
+    first, second = make_store(), make_store()
+    token, _ = first.issue(1, "alice")
+    second.resolve(token)
+
+    first.revoke(token)
+    second.issue(2, "bob")  # запись другого процесса не возвращает сессию
+    with pytest.raises(ValueError):
+        first.resolve(token)
+    with pytest.raises(ValueError):
+        second.resolve(token)
+
+
+def test_concurrent_issue_and_revoke_keep_all_changes(make_store):
+    stores = [make_store() for _ in range(4)]
+    revoked = [stores[0].issue(1, "alice")[0] for _ in range(8)]
+    kept = []
+
+    def issue(store: SessionStore) -> None:
+        for _ in range(5):
+            kept.append(store.issue(2, "bob")[0])
+
+    def revoke() -> None:
+        for token in revoked:
+            stores[1].revoke(token)
+
+    threads = [threading.Thread(target=issue, args=(s,)) for s in stores[2:]]
+    threads.append(threading.Thread(target=revoke))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reader = make_store()
+    for token in revoked:
+        with pytest.raises(ValueError):
+            reader.resolve(token)
+    assert all(reader.resolve(token).user_id == 2 for token in kept)
+
+
+def test_revoke_user_drops_all_sessions(make_store):
+    store = make_store()
+    tokens = [store.issue(1, "alice")[0] for _ in range(3)]
+    other, _ = store.issue(2, "bob")
+
+    assert store.revoke_user(1) == 3
+    for token in tokens:
+        with pytest.raises(ValueError):
+            store.resolve(token)
+    store.resolve(other)
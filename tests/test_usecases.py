@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.models import Portfolio
+from valutatrade_hub.core.usecases import get_rate, show_portfolio
+from valutatrade_hub.core.utils import find_portfolio, load_rates, save_portfolio
+
+
+@pytest.fixture
+def wallets(user, write_rates):
+    write_rates({"BTC_USD": 60000.0, "ETH_USD": 3000.0, "EUR_USD": 1.1})
+    portfolio = Portfolio.from_record(find_portfolio(user.user_id))
+    for code, amount in (("EUR", 500), ("BTC", 0.01), ("ETH", 1), ("XRP", 10)):
+        portfolio.add_currency(code)
+        portfolio.get_wallet(code).deposit(amount)
+    save_portfolio(portfolio.to_record())
+    return user
+
+
+def codes(table: str) -> list[str]:
+    rows = [r for r in table.splitlines() if r.startswith("|")][1:]
+    return [r.split("|")[1].strip() for r in rows]
+
+
+def test_sort_by_value_puts_unpriced_last(wallets):
+    table, total, pages = show_portfolio(wallets.user_id, sort="value")
+    assert codes(table) == ["ETH", "BTC", "EUR", "XRP"]
+    assert total == pytest.approx(3000 + 600 + 550)
+    assert pages == 1
+
+
+def test_top_and_pages(wallets):
+    table, _, _ = show_portfolio(wallets.user_id, sort="code", top=3)
+    assert codes(table) == ["BTC", "ETH", "EUR"]
+
+    table, _, pages = show_portfolio(
+        wallets.user_id, sort="balance", page=2, per_page=3
+    )
+    assert codes(table) == ["BTC"]
+    assert pages == 2
+    with pytest.raises(ValueError):
+        show_portfolio(wallets.user_id, page=3, per_page=3)
+
+
+
+def test_concurrent_refreshes_of_different_pairs_both_survive(monkeypatch):
+    # оба потока прочитали rates.json до того, как кто-то из них записал его
+    barrier = threading.Barrier(2, timeout=5)
+
+    class Fetcher:
+        def fetch(self, from_code, to_code):
+            barrier.wait()
+            return {"USD": 0.5, "EUR": 2.0}[from_code], "test"
+
+    monkeypatch.setattr(usecases, "get_fetcher", lambda: Fetcher())
+    threads = [
+        threading.Thread(target=get_rate, args=pair)
+        for pair in (("USD", "BTC"), ("EUR", "ETH"))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    rates = load_rates()
+    assert rates["USD_BTC"]["rate"] == 0.5
+    assert rates["BTC_USD"]["rate"] == 2.0
+    assert rates["EUR_ETH"]["rate"] == 2.0
+    assert rates["ETH_EUR"]["rate"] == 0.5
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from valutatrade_hub.core.valuation import ValuationCache, rates_signature
+
+
+def test_invalidation_by_user_and_currency():
+    cache = ValuationCache()
+    cache.put((1, "USD", 0), "alice", 1, ["BTC"])
+    cache.put((2, "USD", 0), "bob", 2, ["ETH"])
+
+    cache.invalidate_currencies(["BTC"])
+    assert cache.get((1, "USD", 0)) is None
+    assert cache.get((2, "USD", 0)) == "bob"
+
+    cache.invalidate_user(2)
+    assert len(cache) == 0
+
+
+def test_lru_evicts_oldest_entry():
+    cache = ValuationCache(max_entries=2)
+    for user_id in (1, 2, 3):
+        cache.put((user_id, "USD", 0), user_id, user_id, [])
+    assert cache.get((1, "USD", 0)) is None
+    assert cache.get((3, "USD", 0)) == 3
+
+
+def test_signature_covers_direct_and_inverse_pairs():
+    rates = {"USD_BTC": {"rate": 0.00002, "updated_at": "t1"}}
+    before = rates_signature(["BTC"], "USD", rates)
+    rates["USD_BTC"] = {"rate": 0.00002, "updated_at": "t2"}
+    assert rates_signature(["BTC"], "USD", rates) != before
+    assert rates_signature(["ETH"], "USD", rates) == rates_signature(
+        ["ETH"], "USD", {}
+    )
@@ -0,0 +1,391 @@
+"""Локальный HTTP/JSON API поверх use cases (только stdlib, asyncio).
+
+Эндпоинты:
+    POST /register   {"username", "password"}
+    POST /login      {"username", "password"}      -> {"token", "user_id"}
+    POST /logout                                    (Authorization: Bearer <token>)
+    GET  /portfolio?base=USD&sort=value&top=20&page=1  (Authorization: ...)
+    POST /quote      {"currency", "base"}           (Authorization: Bearer <token>)
+    POST /buy        {"currency", "amount", "base", "quote_id"}  (Authorization)
+    POST /sell       {"currency", "amount", "base", "quote_id"}  (Authorization)
+                     повтор с заголовком Idempotency-Key не исполняется заново
+    GET  /rate?from=USD&to=BTC
+
+Соединения keep-alive (HTTP/1.1), сессии — подписанные токены из
+core/sessions.py (общие с CLI, переживают перезапуск сервера).
+Use cases блокирующие (файловое хранилище), поэтому выполняются в пуле
+потоков, а цикл событий продолжает принимать и разбирать запросы.
+Общей блокировки у сервера нет: use cases сами берут file_lock нужного
+файла (portfolios.json, users.json, quotes.json, ...), так что запросы к
+разным файлам идут параллельно, а записи одного файла упорядочены — в том
+числе с CLI в соседнем процессе. Ошибка вне перечня ожидаемых даёт 500
+и пишется в журнал, соединение при этом не рвётся.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from valutatrade_hub.core.exceptions import (
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+)
+from valutatrade_hub.core.usecases import (
+    buy_currency,
+    get_rate,
+    login_user,
+    register_user,
+    sell_currency,
+    show_portfolio,
+)
+from valutatrade_hub.core.quotes import create_quote
+from valutatrade_hub.core.sessions import session_store
+from valutatrade_hub.core.utils import start_session_cache
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.logging_config import setup_logging
+
+# максимальный размер тела запроса
+MAX_BODY = 64 * 1024
+
+logger = logging.getLogger("valutatrade.api")
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(
+        self, method: str, target: str, headers: Dict[str, str], body: bytes
+    ) -> None:
+        self.method = method
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Тело запроса должно быть JSON")
+        if not isinstance(data, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Ожидается JSON-объект")
+        return data
+
+    @property
+    def token(self) -> Optional[str]:
+        auth = self.headers.get("authorization", "")
+        if auth.lower().startswith("bearer "):
+            return auth[7:].strip()
+        return None
+
+
+class ApiServer:
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 8765, workers: int = 4
+    ) -> None:
+        self.host = host
+        self.port = port
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="api"
+        )
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._routes: Dict[Tuple[str, str], Callable[[Request], Any]] = {
+            ("POST", "/register"): self._register,
+            ("POST", "/login"): self._login,
+            ("POST", "/logout"): self._logout,
+            ("GET", "/portfolio"): self._portfolio,
+            ("POST", "/quote"): self._quote,
+            ("POST", "/buy"): self._buy,
+            ("POST", "/sell"): self._sell,
+            ("GET", "/rate"): self._rate,
+        }
+
+    # --- запуск ---
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        # при port=0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        self._pool.shutdown(wait=False)
+
+    # --- HTTP ---
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(
+                        writer, HTTPStatus.BAD_REQUEST, {"error": "Bad request"}, False
+                    )
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # границу тела не узнать — продолжать соединение нельзя
+                    await self._respond(
+                        writer,
+                        HTTPStatus.BAD_REQUEST,
+                        {"error": "Некорректный Content-Length"},
+                        False,
+                    )
+                    break
+                if length > MAX_BODY:
+                    await self._respond(
+                        writer,
+                        HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        {"error": "Too large"},
+                        False,
+                    )
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection != "close"
+                    if version == "HTTP/1.1"
+                    else connection == "keep-alive"
+                )
+
+                request = Request(method, target, headers, body)
+                status, payload = await self._dispatch(request)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: dict,
+        keep_alive: bool,
+    ) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _dispatch(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {
+                "error": f"Нет маршрута {request.method} {request.path}"
+            }
+        try:
+            return await handler(request)
+        except HttpError as exc:
+            return exc.status, {"error": exc.message}
+        except CurrencyNotFoundError as exc:
+            return HTTPStatus.NOT_FOUND, {"error": str(exc)}
+        except InsufficientFundsError as exc:
+            return HTTPStatus.CONFLICT, {"error": str(exc)}
+        except ApiRequestError as exc:
+            return HTTPStatus.BAD_GATEWAY, {"error": str(exc)}
+        except ValueError as exc:
+            return HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except Exception:
+            logger.exception(
+                "%s %s: необработанная ошибка", request.method, request.path
+            )
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {
+                "error": "Внутренняя ошибка сервера"
+            }
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        """Блокирующий use case в пуле потоков (блокировки файлов — в нём самом)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+
+    async def _user_id(self, request: Request) -> int:
+        token = request.token
+        if not token:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Требуется вход: POST /login")
+        try:
+            session = await self._call(session_store.resolve, token)
+            return session.user_id
+        except ValueError as exc:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, str(exc)) from None
+
+    # --- маршруты ---
+
+    async def _register(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        data = request.json()
+        user, msg = await self._call(
+            register_user,
+            username=str(data.get("username") or ""),
+            password=str(data.get("password") or ""),
+        )
+        return HTTPStatus.CREATED, {"user_id": user.user_id, "message": msg}
+
+    async def _login(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        data = request.json()
+        user, msg = await self._call(
+            login_user,
+            username=str(data.get("username") or ""),
+            password=str(data.get("password") or ""),
+        )
+        token, _ = await self._call(session_store.issue, user.user_id, user.username)
+        return HTTPStatus.OK, {
+            "token": token,
+            "user_id": user.user_id,
+            "message": msg,
+        }
+
+    async def _logout(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        await self._user_id(request)
+        await self._call(session_store.revoke, request.token)
+        return HTTPStatus.OK, {"message": "Сессия завершена"}
+
+    async def _portfolio(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        user_id = await self._user_id(request)
+        base = request.query.get("base", "USD").upper()
+        try:
+            top = int(request.query["top"]) if "top" in request.query else None
+            page = int(request.query["page"]) if "page" in request.query else None
+            per_page = int(request.query.get("per_page", 20))
+        except ValueError:
+            raise HttpError(
+                HTTPStatus.BAD_REQUEST, "top, page и per_page — целые числа"
+            )
+        table, total, pages = await self._call(
+            show_portfolio,
+            user_id=user_id,
+            base_currency=base,
+            sort=request.query.get("sort"),
+            top=top,
+            page=page,
+            per_page=per_page,
+        )
+        return HTTPStatus.OK, {
+            "base": base,
+            "total": total,
+            "pages": pages,
+            "table": table,
+        }
+
+    async def _trade(
+        self, request: Request, func: Callable
+    ) -> Tuple[HTTPStatus, dict]:
+        user_id = await self._user_id(request)
+        data = request.json()
+        op_msg, changes_msg = await self._call(
+            func,
+            user_id=user_id,
+            currency_code=str(data.get("currency") or ""),
+            amount=data.get("amount") or "",
+            base_currency=str(data.get("base") or "USD"),
+            quote_id=data.get("quote_id") or None,
+            idempotency_key=request.headers.get("idempotency-key")
+            or data.get("idempotency_key"),
+        )
+        return HTTPStatus.OK, {"message": op_msg, "changes": changes_msg}
+
+    async def _quote(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        user_id = await self._user_id(request)
+        data = request.json()
+        quote = await self._call(
+            create_quote,
+            user_id,
+            str(data.get("currency") or ""),
+            str(data.get("base") or "USD"),
+        )
+        return HTTPStatus.CREATED, asdict(quote)
+
+    async def _buy(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        return await self._trade(request, buy_currency)
+
+    async def _sell(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        return await self._trade(request, sell_currency)
+
+    async def _rate(self, request: Request) -> Tuple[HTTPStatus, dict]:
+        from_code = request.query.get("from", "")
+        to_code = request.query.get("to", "")
+        rate, reverse, updated_at = await self._call(get_rate, from_code, to_code)
+        return HTTPStatus.OK, {
+            "from": from_code.upper(),
+            "to": to_code.upper(),
+            "rate": rate,
+            "reverse_rate": reverse,
+            "updated_at": updated_at,
+        }
+
+
+def main() -> None:
+    settings = SettingsLoader()
+    setup_logging()
+    # сервер долгоживущий: держим разобранные файлы данных в памяти
+    start_session_cache()
+    server = ApiServer(
+        host=settings.get("api_host", "127.0.0.1"),
+        port=int(settings.get("api_port", 8765)),
+        workers=int(settings.get("api_workers", 4)),
+    )
+
+    async def run() -> None:
+        await server.start()
+        print(f"ValutaTrade Hub API: http://{server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nОстановлено.")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
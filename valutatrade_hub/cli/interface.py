@@ -1,21 +1,82 @@
 import shlex
-from valutatrade_hub.core.usecases import register_user, login_user, show_portfolio, buy_currency, sell_currency, get_rate
-from valutatrade_hub.core.models import User
+import sys
+from datetime import datetime
+from prettytable import PrettyTable
+from valutatrade_hub.core.usecases import (
+    register_user,
+    login_user,
+    show_portfolio,
+    buy_currency,
+    sell_currency,
+    get_rate,
+    list_currencies,
+)
 from valutatrade_hub.core.exceptions import InsufficientFundsError, CurrencyNotFoundError, ApiRequestError
+from valutatrade_hub.core.alerts import create_alert, cancel_alert, list_alerts
+from valutatrade_hub.core.analytics import aggregate_portfolios, usernames
+from valutatrade_hub.core.audit import KINDS, run_audit
+from valutatrade_hub.core.history import query_history
+from valutatrade_hub.core.importer import import_users
+from valutatrade_hub.core.orders import place_order, cancel_order, list_orders
+from valutatrade_hub.core.quotes import create_quote
+from valutatrade_hub.core.reports import build_report, daily_volume
+from valutatrade_hub.core.sessions import (
+    Session,
+    clear_current_token,
+    load_current_token,
+    save_current_token,
+    session_store,
+)
+from valutatrade_hub.core.utils import (
+    convert_storage,
+    start_session_cache,
+    stop_session_cache,
+)
+from valutatrade_hub.infra.providers import get_fetcher
+from valutatrade_hub.infra.rate_budget import get_rate_budget
+from valutatrade_hub.infra.serializers import available_formats
 from valutatrade_hub.logging_config import setup_logging
 
 setup_logging()
 
-CURRENT_USER: User | None = None
+CURRENT_USER: Session | None = None
+
+
+def resume_session() -> None:
+    """Восстановить вход по сохранённому токену (без чтения users.json)."""
+    global CURRENT_USER
+
+    token = load_current_token()
+    if not token:
+        return
+    try:
+        CURRENT_USER = session_store.resolve(token)
+    except ValueError:
+        # токен истёк или отозван — нужен новый login
+        clear_current_token()
+
 
 def main() -> None:
+    resume_session()
+
+    # одиночный вызов: project buy --currency BTC --amount 0.01
+    if len(sys.argv) > 1:
+        command, *args = sys.argv[1:]
+        run_command(command, args)
+        stop_session_cache()
+        return
+
     print("ValutaTrade Hub CLI. Введите команду (help для справки, exit для выхода).")
+    if CURRENT_USER is not None:
+        start_session_cache()
+        print(f"Вы вошли как '{CURRENT_USER.username}'")
 
     while True:
         try:
             raw = input("> ")
         except (EOFError, KeyboardInterrupt):
             print("\nВыход.")
+            stop_session_cache()
             break
 
         if not raw.strip():
@@ -29,32 +90,81 @@ def main() -> None:
 
         if command in {"exit", "quit"}:
             print("Выход.")
+            stop_session_cache()
             break
 
-        if command == "register":
-            handle_register(args)
-        elif command == "login":
-            handle_login(args)
-        elif command == "show-portfolio":
-            if CURRENT_USER is None:
-                print("Сначала выполните login.")
-            else:
-                handle_show_portfolio(args)
-        elif command == "buy":
-            if CURRENT_USER is None:
-                print("Сначала выполните login.")
-            else:
-                handle_buy(args)
-        elif command == "sell":
-            if CURRENT_USER is None:
-                print("Сначала выполните login.")
-            else:
-                handle_sell(args)
-        elif command == "get-rate":
-            handle_get_rate(args)
+        run_command(command, args)
+
+
+def run_command(command: str, args: list[str]) -> None:
+    if command == "register":
+        handle_register(args)
+    elif command == "login":
+        handle_login(args)
+    elif command == "logout":
+        handle_logout(args)
+    elif command == "show-portfolio":
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        else:
+            handle_show_portfolio(args)
+    elif command == "buy":
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        else:
+            handle_buy(args)
+    elif command == "sell":
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        else:
+            handle_sell(args)
+    elif command == "get-rate":
+        handle_get_rate(args)
+    elif command == "quote":
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        else:
+            handle_quote(args)
+    elif command in {"place-order", "orders", "cancel-order"}:
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        elif command == "place-order":
+            handle_place_order(args)
+        elif command == "orders":
+            handle_orders(args)
         else:
-            print(f"Неизвестная команда: {command}")
-            
+            handle_cancel_order(args)
+    elif command in {"alert", "alerts", "cancel-alert"}:
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        elif command == "alert":
+            handle_alert(args)
+        elif command == "alerts":
+            handle_alerts(args)
+        else:
+            handle_cancel_alert(args)
+    elif command == "history":
+        if CURRENT_USER is None:
+            print("Сначала выполните login.")
+        else:
+            handle_history(args)
+    elif command == "report":
+        handle_report(args)
+    elif command == "list-currencies":
+        handle_list_currencies(args)
+    elif command == "convert-storage":
+        handle_convert_storage(args)
+    elif command == "import-users":
+        handle_import_users(args)
+    elif command == "audit":
+        handle_audit(args)
+    elif command in {"leaderboard", "aggregate"}:
+        handle_aggregate(command, args)
+    elif command == "provider-stats":
+        handle_provider_stats(args)
+    else:
+        print(f"Неизвестная команда: {command}")
+
 
 def handle_register(args: list[str]) -> None:
     username = None
@@ -94,29 +204,85 @@ def handle_login(args: list[str]) -> None:
         print(str(exc))
         return
 
-    CURRENT_USER = user
+    token, CURRENT_USER = session_store.issue(user.user_id, user.username)
+    save_current_token(token)
+    # дальше в этой сессии не перечитываем неизменённые файлы данных
+    start_session_cache()
     print(msg)
 
+
+def handle_logout(args: list[str]) -> None:
+    """Завершить сессию: logout [--all] (--all — все сессии пользователя)."""
+    global CURRENT_USER
+
+    if CURRENT_USER is None:
+        print("Вы не вошли в систему.")
+        return
+
+    if "--all" in args:
+        count = session_store.revoke_user(CURRENT_USER.user_id)
+        print(f"Завершено сессий: {count}")
+    else:
+        token = load_current_token()
+        try:
+            if token:
+                session_store.revoke(token)
+        except ValueError:
+            pass
+        print(f"Сессия '{CURRENT_USER.username}' завершена")
+
+    clear_current_token()
+    CURRENT_USER = None
+
 def handle_show_portfolio(args: list[str]) -> None:
     if CURRENT_USER is None:
         print("Сначала войдите в систему: login --username <имя> --password <пароль>")
         return
 
     base = "USD"
+    sort = None
+    top = None
+    page = None
+    per_page = "20"
 
     it = iter(args)
     for token in it:
         if token == "--base":
             base = (next(it, "") or "").upper()
+        elif token == "--sort":
+            sort = (next(it, "") or "").lower()
+        elif token == "--top":
+            top = next(it, None)
+        elif token == "--page":
+            page = next(it, None)
+        elif token == "--per-page":
+            per_page = next(it, None) or per_page
 
     try:
-        table_str, total = show_portfolio(user_id=CURRENT_USER.user_id, base_currency=base)
-    except ValueError as exc:
+        top_num = int(top) if top is not None else None
+        page_num = int(page) if page is not None else None
+        per_page_num = int(per_page)
+    except ValueError:
+        print("'--top', '--page' и '--per-page' должны быть целыми числами")
+        return
+
+    try:
+        table_str, total, pages = show_portfolio(
+            user_id=CURRENT_USER.user_id,
+            base_currency=base,
+            sort=sort,
+            top=top_num,
+            page=page_num,
+            per_page=per_page_num,
+        )
+    except (CurrencyNotFoundError, ValueError) as exc:
         print(str(exc))
         return
 
     print(table_str)
-    print(f"Итоговая стоимость портфеля в {base}: {total}")
+    if page_num is not None:
+        print(f"Страница {page_num} из {pages}.")
+    print(f"Итоговая стоимость портфеля в {base}: {total:,.2f}")
     
 def handle_buy(args: list[str]) -> None:
     global CURRENT_USER
@@ -127,6 +293,8 @@ def handle_buy(args: list[str]) -> None:
 
     currency = None
     amount = None
+    key = None
+    quote_id = None
 
     it = iter(args)
     for token in it:
@@ -134,12 +302,18 @@ def handle_buy(args: list[str]) -> None:
             currency = next(it, None)
         elif token == "--amount":
             amount = next(it, None)
+        elif token == "--key":
+            key = next(it, None)
+        elif token == "--quote":
+            quote_id = next(it, None)
 
     try:
         op_msg, changes_msg = buy_currency(
             user_id=CURRENT_USER.user_id,
             currency_code=currency or "",
             amount=amount or "",
+            idempotency_key=key,
+            quote_id=quote_id,
         )
     except CurrencyNotFoundError as exc:
         print(str(exc))
@@ -167,6 +341,8 @@ def handle_sell(args: list[str]) -> None:
 
     currency = None
     amount = None
+    key = None
+    quote_id = None
 
     it = iter(args)
     for token in it:
@@ -174,12 +350,18 @@ def handle_sell(args: list[str]) -> None:
             currency = next(it, None)
         elif token == "--amount":
             amount = next(it, None)
+        elif token == "--key":
+            key = next(it, None)
+        elif token == "--quote":
+            quote_id = next(it, None)
 
     try:
         op_msg, changes_msg = sell_currency(
             user_id=CURRENT_USER.user_id,
             currency_code=currency or "",
             amount=amount or "",
+            idempotency_key=key,
+            quote_id=quote_id,
         )
     except InsufficientFundsError as exc:
         print(str(exc))  # текст как есть
@@ -232,3 +414,531 @@ def handle_get_rate(args: list[str]) -> None:
     )
     print(f"Обратный курс {to_code.upper()}→{from_code.upper()}: {rate_rev:.2f}")
 
+
+def handle_quote(args: list[str]) -> None:
+    """Зафиксировать курс: quote --currency BTC [--base USD]."""
+    currency = None
+    base = "USD"
+
+    it = iter(args)
+    for token in it:
+        if token == "--currency":
+            currency = next(it, None)
+        elif token == "--base":
+            base = next(it, None) or "USD"
+
+    try:
+        quote = create_quote(CURRENT_USER.user_id, currency or "", base)
+    except (CurrencyNotFoundError, ValueError) as exc:
+        print(str(exc))
+        return
+
+    print(
+        f"Котировка {quote.quote_id}: "
+        f"1 {quote.currency} = {quote.rate:,.8f} {quote.base} "
+        f"(курс от {quote.rate_updated_at}), действует до {quote.expires_at}."
+    )
+    print(
+        f"Исполнить: buy --currency {quote.currency} --amount ... "
+        f"--quote {quote.quote_id}"
+    )
+
+
+def handle_place_order(args: list[str]) -> None:
+    side = None
+    currency = None
+    limit = None
+    amount = None
+    base = "USD"
+
+    it = iter(args)
+    for token in it:
+        if token == "--side":
+            side = next(it, None)
+        elif token == "--currency":
+            currency = next(it, None)
+        elif token == "--limit":
+            limit = next(it, None)
+        elif token == "--amount":
+            amount = next(it, None)
+        elif token == "--base":
+            base = (next(it, "") or "").upper()
+
+    try:
+        _, msg = place_order(
+            user_id=CURRENT_USER.user_id,
+            side=side or "",
+            currency_code=currency or "",
+            limit=limit or "",
+            amount=amount or "",
+            base_currency=base,
+        )
+    except CurrencyNotFoundError as exc:
+        print(str(exc))
+        print("Используйте 'list-currencies', чтобы посмотреть поддерживаемые валюты.")
+        return
+    except ValueError as exc:
+        print(str(exc))
+        return
+
+    print(msg)
+
+
+def handle_orders(args: list[str]) -> None:
+    include_closed = "--all" in args
+    orders = list_orders(CURRENT_USER.user_id, include_closed=include_closed)
+    if not orders:
+        print("Ордеров нет")
+        return
+
+    table = PrettyTable(["#", "Сторона", "Пара", "Лимит", "Объём", "Статус"])
+    for o in orders:
+        table.add_row(
+            [o.order_id, o.side, f"{o.currency}/{o.base}", o.limit, o.amount, o.status]
+        )
+    print(table.get_string())
+
+
+def handle_cancel_order(args: list[str]) -> None:
+    order_id = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--id":
+            order_id = next(it, None)
+
+    try:
+        msg = cancel_order(CURRENT_USER.user_id, int(order_id or ""))
+    except ValueError as exc:
+        if order_id and order_id.isdigit():
+            print(str(exc))
+        else:
+            print("'id' должен быть номером ордера")
+        return
+
+    print(msg)
+
+
+def handle_alert(args: list[str]) -> None:
+    from_code = None
+    to_code = None
+    direction = ""
+    threshold = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--from":
+            from_code = next(it, None)
+        elif token == "--to":
+            to_code = next(it, None)
+        elif token in {"--above", "--below"}:
+            direction = token[2:]
+            threshold = next(it, None)
+
+    try:
+        _, msg = create_alert(
+            user_id=CURRENT_USER.user_id,
+            from_currency=from_code or "",
+            to_currency=to_code or "",
+            direction=direction,
+            threshold=threshold or "",
+        )
+    except CurrencyNotFoundError as exc:
+        print(str(exc))
+        print("Используйте 'list-currencies', чтобы посмотреть поддерживаемые валюты.")
+        return
+    except ValueError as exc:
+        print(str(exc))
+        return
+
+    print(msg)
+
+
+def handle_alerts(args: list[str]) -> None:
+    alerts = list_alerts(CURRENT_USER.user_id, include_closed="--all" in args)
+    if not alerts:
+        print("Оповещений нет")
+        return
+
+    table = PrettyTable(["#", "Пара", "Условие", "Порог", "Статус", "Сработало"])
+    for a in alerts:
+        condition = "выше" if a.direction == "above" else "ниже"
+        fired = f"{a.fired_rate} ({a.fired_at})" if a.fired_at else ""
+        table.add_row(
+            [
+                a.alert_id,
+                a.pair.replace("_", "→"),
+                condition,
+                a.threshold,
+                a.status,
+                fired,
+            ]
+        )
+    print(table.get_string())
+
+
+def handle_cancel_alert(args: list[str]) -> None:
+    alert_id = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--id":
+            alert_id = next(it, None)
+
+    if not (alert_id and alert_id.isdigit()):
+        print("'id' должен быть номером оповещения")
+        return
+
+    try:
+        msg = cancel_alert(CURRENT_USER.user_id, int(alert_id))
+    except ValueError as exc:
+        print(str(exc))
+        return
+
+    print(msg)
+
+
+def handle_history(args: list[str]) -> None:
+    limit = "50"
+    before = None
+    currency = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--limit":
+            limit = next(it, "") or ""
+        elif token == "--before":
+            before = next(it, None)
+        elif token == "--currency":
+            currency = next(it, None)
+
+    try:
+        limit_num = int(limit)
+        before_dt = datetime.fromisoformat(before) if before else None
+    except ValueError:
+        print("'limit' должен быть целым числом, 'before' — датой в формате ISO")
+        return
+
+    try:
+        records = query_history(
+            CURRENT_USER.user_id,
+            limit=limit_num,
+            before=before_dt,
+            currency=currency,
+        )
+    except ValueError as exc:
+        print(str(exc))
+        return
+
+    if not records:
+        print("Сделок не найдено")
+        return
+
+    table = PrettyTable(
+        ["Время", "Операция", "Валюта", "Количество", "Курс", "Баланс после"]
+    )
+    for r in records:
+        table.add_row(
+            [
+                r["timestamp"].replace("T", " ")[:19],
+                r["side"],
+                r["currency"],
+                r["amount"],
+                f"{r['rate']} {r['base']}",
+                r["balance_after"],
+            ]
+        )
+    print(table.get_string())
+    if len(records) == limit_num:
+        print(f"Следующая страница: history --before {records[-1]['timestamp']}")
+
+
+def handle_report(args: list[str]) -> None:
+    top = "10"
+    start = None
+    end = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--top":
+            top = next(it, "") or ""
+        elif token == "--from":
+            start = next(it, None)
+        elif token == "--to":
+            end = next(it, None)
+
+    if not top.isdigit() or int(top) < 1:
+        print("'top' должен быть положительным целым числом")
+        return
+
+    try:
+        start_dt = datetime.fromisoformat(start) if start else None
+        end_dt = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        print("'from' и 'to' должны быть датами в формате ISO")
+        return
+
+    report = build_report(start=start_dt, end=end_dt)
+    if not report.total:
+        print("В журнале операций нет записей")
+        return
+
+    print(
+        f"Файлов журнала: {report.files}, операций: {report.total}, "
+        f"ошибок: {report.errors}"
+    )
+
+    volume_table = PrettyTable(["Дата", "Валюта", "Объём", "Сделок"])
+    for day, by_currency in daily_volume(report).items():
+        for code, (volume, trades) in sorted(by_currency.items()):
+            volume_table.add_row([day, code, f"{volume:.8g}", trades])
+    print("Дневной объём по валютам:")
+    print(volume_table.get_string())
+
+    if report.error_types:
+        errors_table = PrettyTable(["Тип ошибки", "Количество", "Доля операций"])
+        for name, count, share in report.error_rates():
+            errors_table.add_row([name, count, f"{share:.1%}"])
+        print("Ошибки:")
+        print(errors_table.get_string())
+
+    users_table = PrettyTable(["user_id", "Операций"])
+    for user_id, count in report.users.most_common(int(top)):
+        users_table.add_row([user_id, count])
+    print("Самые активные пользователи:")
+    print(users_table.get_string())
+
+
+def handle_list_currencies(args: list[str]) -> None:
+    kind = None
+    search = None
+    page = "1"
+    per_page = "20"
+
+    it = iter(args)
+    for token in it:
+        if token == "--type":
+            kind = (next(it, "") or "").lower()
+        elif token == "--search":
+            search = next(it, None)
+        elif token == "--page":
+            page = next(it, "") or ""
+        elif token == "--per-page":
+            per_page = next(it, "") or ""
+
+    try:
+        page_num, per_page_num = int(page), int(per_page)
+    except ValueError:
+        print("'page' и 'per-page' должны быть целыми числами")
+        return
+
+    try:
+        table_str, total, pages = list_currencies(
+            kind=kind,
+            search=search,
+            page=page_num,
+            per_page=per_page_num,
+        )
+    except ValueError as exc:
+        print(str(exc))
+        return
+
+    print(table_str)
+    print(f"Найдено валют: {total}. Страница {page} из {pages}.")
+
+
+def handle_convert_storage(args: list[str]) -> None:
+    """Конвертация users.json/portfolios.json в другой формат (ndjson, binary)."""
+    target = "ndjson"
+
+    it = iter(args)
+    for token in it:
+        if token == "--to":
+            target = (next(it, "") or "").lower()
+
+    if target == "json" or target not in available_formats():
+        formats = ", ".join(f for f in available_formats() if f != "json")
+        print(f"Неподдерживаемый формат: {target}. Доступно: {formats}")
+        return
+
+    try:
+        users_count, portfolios_count = convert_storage(target)
+    except (OSError, ValueError) as exc:
+        print(f"Ошибка конвертации: {exc}")
+        return
+
+    print(
+        f"Сконвертировано: пользователей {users_count}, портфелей {portfolios_count}. "
+        f'Включите формат: storage_format = "{target}" в [tool.valutatrade].'
+    )
+
+
+def handle_import_users(args: list[str]) -> None:
+    """Массовая регистрация из CSV (колонки username,password)."""
+    file_path = None
+    workers = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--file":
+            file_path = next(it, None)
+        elif token == "--workers":
+            workers = next(it, None)
+
+    if not file_path:
+        print("Укажите файл: import-users --file users.csv")
+        return
+
+    try:
+        workers_num = int(workers) if workers is not None else None
+    except ValueError:
+        print("'--workers' должен быть целым числом")
+        return
+
+    try:
+        result = import_users(file_path, workers=workers_num)
+    except (OSError, ValueError) as exc:
+        print(f"Ошибка импорта: {exc}")
+        return
+
+    if result.imported:
+        print(
+            f"Импортировано пользователей: {result.imported} "
+            f"(id {result.first_id}–{result.last_id})."
+        )
+    else:
+        print("Новых пользователей нет.")
+
+    if result.skipped:
+        print(f"Пропущено строк: {len(result.skipped)}")
+        for line, username, reason in result.skipped[:20]:
+            print(f"  строка {line}: '{username}' — {reason}")
+        if len(result.skipped) > 20:
+            print(f"  ... и ещё {len(result.skipped) - 20}")
+
+
+def handle_audit(args: list[str]) -> None:
+    """Проверка целостности данных: audit [--full]."""
+    full = "--full" in args
+
+    try:
+        report = run_audit(full=full)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"Ошибка проверки: {exc}")
+        return
+
+    if report.unchanged:
+        print("Данные не менялись с прошлой проверки.")
+    print(
+        f"Пользователей: {report.total_users}, перепроверено: {report.checked}. "
+        f"Корень хешей: {report.root[:16]}"
+    )
+    if report.previous_root and report.previous_root != report.root:
+        print(f"Предыдущий корень: {report.previous_root[:16]}")
+
+    if not report.violations:
+        print("Нарушений не найдено.")
+        return
+
+    table = PrettyTable(["Нарушение", "user_id", "Где", "Подробности"])
+    table.align = "l"
+    for v in report.violations:
+        table.add_row([KINDS.get(v.kind, v.kind), v.user_id, v.location, v.detail])
+    print(table)
+    print(f"Нарушений: {len(report.violations)}")
+
+
+def handle_aggregate(command: str, args: list[str]) -> None:
+    """leaderboard [--top N] / aggregate, оба с [--base USD] [--workers N]."""
+    base = "USD"
+    top = "10"
+    workers = None
+
+    it = iter(args)
+    for token in it:
+        if token == "--base":
+            base = next(it, None) or "USD"
+        elif token == "--top":
+            top = next(it, None) or top
+        elif token == "--workers":
+            workers = next(it, None)
+
+    try:
+        top_n = int(top)
+        workers_num = int(workers) if workers is not None else None
+    except ValueError:
+        print("'--top' и '--workers' должны быть целыми числами")
+        return
+    if top_n <= 0:
+        print("'--top' должен быть положительным")
+        return
+
+    try:
+        result = aggregate_portfolios(base=base, top_n=top_n, workers=workers_num)
+    except (OSError, ValueError) as exc:
+        print(f"Ошибка расчёта: {exc}")
+        return
+
+    base = base.upper()
+    if command == "leaderboard":
+        leaders = result.leaders()
+        names = usernames(user_id for user_id, _ in leaders)
+        table = PrettyTable(["#", "user_id", "Пользователь", f"Стоимость в {base}"])
+        for place, (user_id, value) in enumerate(leaders, start=1):
+            table.add_row([place, user_id, names.get(user_id, "—"), f"{value:,.2f}"])
+        print(table)
+    else:
+        table = PrettyTable(["Валюта", "Сумма балансов"])
+        table.align["Сумма балансов"] = "r"
+        for code, amount in sorted(result.holdings.items()):
+            table.add_row([code, f"{amount:,.8g}"])
+        print(table)
+
+        histogram = PrettyTable(["Кошельков в портфеле", "Портфелей"])
+        for wallets, count in sorted(result.wallet_histogram.items()):
+            histogram.add_row([wallets, count])
+        print(histogram)
+        print(f"Общая стоимость в {base}: {result.total_value:,.2f}")
+
+    print(f"Портфелей: {result.portfolios}")
+    if result.duplicates:
+        print(
+            f"Пропущено повторных записей user_id: {result.duplicates} "
+            "(учтена первая; подробности — audit)"
+        )
+    if result.unpriced:
+        codes = ", ".join(sorted(result.unpriced))
+        print(f"Без курса к {base} (не вошли в оценку): {codes}")
+
+
+def handle_provider_stats(args: list[str]) -> None:
+    """Состояние источников курсов: выключатель, ошибки, задержки."""
+    fetcher = get_fetcher()
+
+    def ms(value: float | None) -> str:
+        return "—" if value is None else f"{value * 1000:.0f}"
+
+    table = PrettyTable(
+        ["Источник", "Состояние", "Вызовов", "Успешно", "Ошибок", "Таймаутов",
+         "Хедж", "Пропущено", "p50, мс", "p95, мс"]
+    )
+    for row in fetcher.snapshot():
+        table.add_row(
+            [
+                row["name"],
+                row["state"],
+                row["calls"],
+                row["successes"],
+                row["failures"],
+                row["timeouts"],
+                row["hedged"],
+                row["short_circuited"],
+                ms(row["p50"]),
+                ms(row["p95"]),
+            ]
+        )
+    print(table)
+    print(f"Дедлайн запроса: {fetcher.deadline:g} с")
+
+    budget = get_rate_budget().snapshot()
+    print(f"Бюджет обновлений: {budget['tokens']:g} из {budget['capacity']:g} жетонов")
@@ -0,0 +1,398 @@
+"""Оповещения о пересечении курсом порога («BTC→USD выше 60000»).
+
+Пороги каждой пары лежат в двух отсортированных списках: на рост (above)
+и на падение (below). При смене курса old → new бинарным поиском берём
+только пороги в интервале между старым и новым значением:
+O(log n + сработавшие) на обновление курса. Сработавшие оповещения
+одноразовые: они удаляются из индекса и уходят в «приёмник» (файл или очередь).
+
+Индекс живёт в памяти процесса и не перестраивается на каждое обновление
+курса: на диске снимок alerts.json и дописываемый журнал событий
+alerts.<N>.log (см. infra/journal.py), который индекс дочитывает перед каждой
+операцией. Все чтения и записи — под file_lock(alerts.json): оповещения
+проверяет фоновый подписчик, и без общей блокировки он терял бы
+оповещения, созданные или отменённые в это же время.
+"""
+
+from __future__ import annotations
+import bisect
+import json
+import queue
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.utils import ALERTS_FILE, load_alerts, save_alerts
+from valutatrade_hub.infra.file_lock import file_lock
+from valutatrade_hub.infra.journal import Journal
+from valutatrade_hub.infra.settings import SettingsLoader
+
+DIRECTIONS = ("above", "below")
+
+# после стольких неактивных оповещений — перенос в архив и новый снимок
+COMPACT_AFTER = 256
+
+
+def _journal() -> Journal:
+    return Journal(ALERTS_FILE, load_alerts, save_alerts)
+
+
+@dataclass
+class Alert:
+    alert_id: int
+    user_id: int
+    pair: str
+    direction: str
+    threshold: float
+    created_at: str
+    status: str = "active"  # active | fired | cancelled
+    fired_at: str = ""
+    fired_rate: float = 0.0
+
+
+class _SortedThresholds:
+    """Параллельные отсортированные списки порогов и id оповещений."""
+
+    def __init__(self, entries: list[tuple[float, int]] | None = None) -> None:
+        # начальная загрузка — одна сортировка, а не n вставок
+        entries = sorted(entries or [])
+        self.levels: list[float] = [level for level, _ in entries]
+        self.ids: list[int] = [alert_id for _, alert_id in entries]
+
+    def add(self, level: float, alert_id: int) -> None:
+        pos = bisect.bisect_right(self.levels, level)
+        self.levels.insert(pos, level)
+        self.ids.insert(pos, alert_id)
+
+    def remove(self, level: float, alert_id: int) -> None:
+        lo = bisect.bisect_left(self.levels, level)
+        hi = bisect.bisect_right(self.levels, level)
+        for pos in range(lo, hi):
+            if self.ids[pos] == alert_id:
+                del self.levels[pos]
+                del self.ids[pos]
+                return
+
+    def take(self, lo: int, hi: int) -> list[int]:
+        taken = self.ids[lo:hi]
+        del self.levels[lo:hi]
+        del self.ids[lo:hi]
+        return taken
+
+
+class AlertIndex:
+    """Активные оповещения по парам: пороги на рост и на падение."""
+
+    def __init__(
+        self,
+        alerts: List[Alert] | None = None,
+        next_id: int = 1,
+        journal: Optional[Journal] = None,
+    ) -> None:
+        self.alerts: Dict[int, Alert] = {}
+        self.next_id = next_id
+        self.journal = journal or _journal()
+        self.closed = 0
+        entries: Dict[tuple[str, str], list[tuple[float, int]]] = {}
+        for alert in alerts or []:
+            self.alerts[alert.alert_id] = alert
+            if alert.status == "active":
+                key = (alert.direction, alert.pair)
+                entries.setdefault(key, []).append((alert.threshold, alert.alert_id))
+            else:
+                self.closed += 1
+        self._above: Dict[str, _SortedThresholds] = {}
+        self._below: Dict[str, _SortedThresholds] = {}
+        for (direction, pair), pairs in entries.items():
+            sides = self._above if direction == "above" else self._below
+            sides[pair] = _SortedThresholds(pairs)
+
+    @classmethod
+    def load(cls) -> "AlertIndex":
+        journal = _journal()
+        raw = journal.load_snapshot()
+        alerts = [Alert(**item) for item in raw.get("alerts", [])]
+        index = cls(alerts, next_id=raw.get("next_id", 1), journal=journal)
+        index.replay()
+        return index
+
+    # --- журнал ---
+
+    def replay(self) -> None:
+        """Применить события, дописанные в журнал после прошлого чтения."""
+        for entry in self.journal.read_new():
+            self._apply(entry)
+
+    def _apply(self, entry: dict) -> None:
+        if entry["op"] == "add":
+            alert = Alert(**entry["alert"])
+            if alert.alert_id not in self.alerts:
+                self.add(alert)
+            self.next_id = max(self.next_id, alert.alert_id + 1)
+        elif entry["op"] == "close":
+            alert = self.alerts.get(entry["alert_id"])
+            if alert is not None and alert.status == "active":
+                # у сработавшего здесь же оповещения порога в списке уже нет
+                self._side(alert.direction, alert.pair).remove(
+                    alert.threshold, alert.alert_id
+                )
+                alert.status = entry["status"]
+                alert.fired_at = entry.get("fired_at", "")
+                alert.fired_rate = entry.get("fired_rate", 0.0)
+                self.closed += 1
+
+    def append(self, entries: List[dict]) -> None:
+        """Дописать события в журнал и применить их к индексу."""
+        self.journal.append(entries)
+        for entry in entries:
+            self._apply(entry)
+
+    def compact(self) -> None:
+        """Неактивные оповещения — в архив; новый снимок и пустой журнал."""
+        closed = [a for a in self.alerts.values() if a.status != "active"]
+        for alert in closed:
+            del self.alerts[alert.alert_id]
+        self.journal.compact(
+            {
+                "next_id": self.next_id,
+                "alerts": [asdict(a) for a in self.alerts.values()],
+            },
+            [asdict(a) for a in closed],
+        )
+        self.closed = 0
+
+    def _side(self, direction: str, pair: str) -> _SortedThresholds:
+        sides = self._above if direction == "above" else self._below
+        return sides.setdefault(pair, _SortedThresholds())
+
+    def add(self, alert: Alert) -> None:
+        self.alerts[alert.alert_id] = alert
+        if alert.status == "active":
+            self._side(alert.direction, alert.pair).add(
+                alert.threshold, alert.alert_id
+            )
+        else:
+            self.closed += 1
+
+    def crossed(self, pair: str, old_rate: float, new_rate: float) -> List[Alert]:
+        """Снимает оповещения, пороги которых лежат между old_rate и new_rate."""
+        if new_rate > old_rate:
+            # рост: сработали пороги в (old, new]
+            side = self._above.get(pair)
+            if side is None:
+                return []
+            lo = bisect.bisect_right(side.levels, old_rate)
+            hi = bisect.bisect_right(side.levels, new_rate)
+        elif new_rate < old_rate:
+            # падение: сработали пороги в [new, old)
+            side = self._below.get(pair)
+            if side is None:
+                return []
+            lo = bisect.bisect_left(side.levels, new_rate)
+            hi = bisect.bisect_left(side.levels, old_rate)
+        else:
+            return []
+        return [self.alerts[alert_id] for alert_id in side.take(lo, hi)]
+
+
+_index: Optional[AlertIndex] = None
+
+
+def _current_index() -> AlertIndex:
+    """Индекс процесса, догнанный до файлов (вызывать под file_lock)."""
+    global _index
+    if _index is None or _index.journal.stale():
+        # первый вызов или другой процесс сделал компактизацию
+        _index = AlertIndex.load()
+    else:
+        _index.replay()
+    return _index
+
+
+def _maybe_compact(index: AlertIndex) -> None:
+    if index.closed >= COMPACT_AFTER:
+        index.compact()
+
+
+def reset_alert_index() -> None:
+    """Забыть индекс в памяти (следующий вызов перечитает файлы)."""
+    global _index
+    _index = None
+
+
+# --- приёмники сработавших оповещений ---
+
+
+class FileAlertSink:
+    """Пишет сработавшие оповещения строками JSON в файл (logs/alerts.log)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def deliver(self, alert: Alert, message: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        record = {**asdict(alert), "message": message}
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class QueueAlertSink:
+    """Кладёт (оповещение, сообщение) в очередь для потребителей в том же процессе."""
+
+    def __init__(self, q: Optional[queue.Queue] = None) -> None:
+        self.queue: queue.Queue = q if q is not None else queue.Queue()
+
+    def deliver(self, alert: Alert, message: str) -> None:
+        self.queue.put((alert, message))
+
+
+def _default_sink() -> FileAlertSink:
+    settings = SettingsLoader()
+    root = Path(settings.get("project_root", "."))
+    logs_dir = root / settings.get("logs_dir", "logs")
+    return FileAlertSink(logs_dir / "alerts.log")
+
+
+_SINK = None
+
+
+def set_alert_sink(sink) -> None:
+    """Подменить приёмник оповещений (например, на QueueAlertSink)."""
+    global _SINK
+    _SINK = sink
+
+
+def get_alert_sink():
+    global _SINK
+    if _SINK is None:
+        _SINK = _default_sink()
+    return _SINK
+
+
+# --- use cases ---
+
+
+def create_alert(
+    user_id: int,
+    from_currency: str,
+    to_currency: str,
+    direction: str,
+    threshold: float,
+) -> Tuple[Alert, str]:
+    """Подписка на пересечение курса. Возвращает (оповещение, сообщение)."""
+    if direction not in DIRECTIONS:
+        raise ValueError("Укажите порог: --above <курс> или --below <курс>")
+
+    from_cur = get_currency(from_currency)
+    to_cur = get_currency(to_currency)
+    if from_cur.code == to_cur.code:
+        raise ValueError("Коды валют должны отличаться")
+
+    try:
+        threshold_value = float(threshold)
+    except (TypeError, ValueError):
+        raise ValueError("Порог должен быть положительным числом")
+    if threshold_value <= 0:
+        raise ValueError("Порог должен быть положительным числом")
+
+    with file_lock(ALERTS_FILE):
+        index = _current_index()
+        alert = Alert(
+            alert_id=index.next_id,
+            user_id=user_id,
+            pair=f"{from_cur.code}_{to_cur.code}",
+            direction=direction,
+            threshold=threshold_value,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        index.append([{"op": "add", "alert": asdict(alert)}])
+
+    sign = "выше" if direction == "above" else "ниже"
+    msg = (
+        f"Оповещение #{alert.alert_id}: курс {from_cur.code}→{to_cur.code} "
+        f"{sign} {threshold_value:,.8g}"
+    )
+    return alert, msg
+
+
+def cancel_alert(user_id: int, alert_id: int) -> str:
+    with file_lock(ALERTS_FILE):
+        index = _current_index()
+        alert = index.alerts.get(alert_id)
+        if alert is None:
+            alert = next(
+                (
+                    Alert(**record)
+                    for record in index.journal.iter_archive()
+                    if record["alert_id"] == alert_id
+                ),
+                None,
+            )
+        if alert is None or alert.user_id != user_id:
+            raise ValueError(f"Оповещение #{alert_id} не найдено")
+        if alert.status != "active":
+            raise ValueError(
+                f"Оповещение #{alert_id} уже неактивно (статус: {alert.status})"
+            )
+        index.append([{"op": "close", "alert_id": alert_id, "status": "cancelled"}])
+        _maybe_compact(index)
+    return f"Оповещение #{alert_id} отменено"
+
+
+def list_alerts(user_id: int, include_closed: bool = False) -> List[Alert]:
+    with file_lock(ALERTS_FILE):
+        index = _current_index()
+        alerts = [
+            a
+            for a in index.alerts.values()
+            if a.user_id == user_id and (include_closed or a.status == "active")
+        ]
+        if include_closed:
+            alerts.extend(
+                Alert(**record)
+                for record in index.journal.iter_archive()
+                if record["user_id"] == user_id
+            )
+            alerts.sort(key=lambda a: a.alert_id)
+    return alerts
+
+
+def process_rate_change(
+    changes: Dict[str, Tuple[float, float]],
+) -> List[Alert]:
+    """Проверяет оповещения для изменений курсов {"BTC_USD": (старый, новый)}.
+
+    Сработавшие оповещения отправляются в приёмник; возвращается их список.
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    fired: List[Alert] = []
+    with file_lock(ALERTS_FILE):
+        index = _current_index()
+        for pair, (old_rate, new_rate) in changes.items():
+            for alert in index.crossed(pair, old_rate, new_rate):
+                fired.append(alert)
+                index.append(
+                    [
+                        {
+                            "op": "close",
+                            "alert_id": alert.alert_id,
+                            "status": "fired",
+                            "fired_at": now,
+                            "fired_rate": new_rate,
+                        }
+                    ]
+                )
+        if fired:
+            _maybe_compact(index)
+
+    sink = get_alert_sink()
+    for alert in fired:
+        base, quote = alert.pair.split("_", 1)
+        sign = "выше" if alert.direction == "above" else "ниже"
+        message = (
+            f"Курс {base}→{quote} {sign} {alert.threshold:,.8g}: "
+            f"текущий {alert.fired_rate:,.8g}"
+        )
+        sink.deliver(alert, message)
+    return fired
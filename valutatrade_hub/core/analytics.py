@@ -0,0 +1,252 @@
+"""Сводные показатели по всем портфелям (leaderboard, aggregate).
+
+Портфели делятся на части, каждая часть обрабатывается в пуле процессов:
+воркер за один проход считает оценку портфелей, держит в куче (heapq)
+только N лучших, суммирует балансы по валютам и строит гистограмму числа
+кошельков. Частичные итоги складываются в родительском процессе.
+
+В формате ndjson части — байтовые диапазоны файла, и воркеры читают
+и разбирают их сами; в остальных форматах родитель читает записи и
+отправляет их воркерам пачками. В работе одновременно не больше
+2 × workers частей, так что родитель не читает файл быстрее, чем воркеры
+его обрабатывают.
+
+Из повторных записей одного user_id учитывается первая — как в
+find_portfolio и show-portfolio; остальные пропускаются и только
+подсчитываются (сами нарушения перечисляет audit). В json/binary повторы
+отсеивает родитель, который и так читает все записи; в ndjson каждой
+части передаётся множество смещений первых вхождений из индекса файла,
+так что результат не зависит от числа воркеров и границ частей.
+
+Оценка берётся по кэшу курсов (rates.json), как и у сделок. Валюты без
+курса к базовой в оценку не входят и перечисляются отдельно.
+"""
+
+from __future__ import annotations
+import heapq
+import os
+from bisect import bisect_right
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from valutatrade_hub.infra.ndjson import (
+    iter_range_with_offsets,
+    load_index,
+    split_ranges,
+)
+from .models import wallet_balance
+from .utils import iter_portfolios, iter_user_records, load_rates, storage_paths
+
+# портфелей в одной пачке (форматы json/binary)
+CHUNK_SIZE = 5000
+
+
+@dataclass
+class Aggregate:
+    top_n: int
+    portfolios: int = 0
+    # min-куча (оценка, user_id) размером не больше top_n
+    top: List[Tuple[float, int]] = field(default_factory=list)
+    holdings: Counter = field(default_factory=Counter)
+    # число кошельков -> число портфелей
+    wallet_histogram: Counter = field(default_factory=Counter)
+    total_value: float = 0.0
+    # валюты без курса к базовой -> число кошельков
+    unpriced: Counter = field(default_factory=Counter)
+    # пропущенные повторные записи user_id
+    duplicates: int = 0
+
+    def push(self, value: float, user_id: int) -> None:
+        if len(self.top) < self.top_n:
+            heapq.heappush(self.top, (value, user_id))
+        elif value > self.top[0][0]:
+            heapq.heapreplace(self.top, (value, user_id))
+
+    def merge(self, other: "Aggregate") -> None:
+        self.portfolios += other.portfolios
+        for value, user_id in other.top:
+            self.push(value, user_id)
+        self.holdings.update(other.holdings)
+        self.wallet_histogram.update(other.wallet_histogram)
+        self.total_value += other.total_value
+        self.unpriced.update(other.unpriced)
+        self.duplicates += other.duplicates
+
+    def leaders(self) -> List[Tuple[int, float]]:
+        """[(user_id, оценка)] по убыванию оценки."""
+        return [(user_id, value) for value, user_id in sorted(self.top, reverse=True)]
+
+
+def rates_to_base(base: str, rates: Optional[dict] = None) -> Dict[str, float]:
+    """{валюта: курс к base} из кэша курсов (прямые и обратные пары)."""
+    rates = load_rates() if rates is None else rates
+    table: Dict[str, float] = {base: 1.0}
+    inverse: Dict[str, float] = {}
+    for key, entry in rates.items():
+        if not isinstance(entry, dict) or not entry.get("rate") or "_" not in key:
+            continue
+        src, dst = key.split("_", 1)
+        if dst == base:
+            table[src] = float(entry["rate"])
+        elif src == base:
+            inverse[dst] = 1.0 / float(entry["rate"])
+    for code, rate in inverse.items():
+        table.setdefault(code, rate)
+    return table
+
+
+def _aggregate(
+    portfolios: Iterable[dict], rates: Dict[str, float], top_n: int
+) -> Aggregate:
+    result = Aggregate(top_n=top_n)
+    for portfolio in portfolios:
+        wallets = portfolio.get("wallets") or {}
+        result.portfolios += 1
+        result.wallet_histogram[len(wallets)] += 1
+        value = 0.0
+        for code, wallet in wallets.items():
+            balance = wallet_balance(code, wallet)
+            result.holdings[code] += balance
+            rate = rates.get(code)
+            if rate is None:
+                result.unpriced[code] += 1
+            else:
+                value += balance * rate
+        result.total_value += value
+        result.push(value, int(portfolio["user_id"]))
+    return result
+
+
+def _aggregate_chunk(
+    chunk: List[dict], rates: Dict[str, float], top_n: int
+) -> Aggregate:
+    return _aggregate(chunk, rates, top_n)
+
+
+def _aggregate_range(
+    task: Tuple[Tuple[int, int], Set[int]],
+    path: str,
+    rates: Dict[str, float],
+    top_n: int,
+) -> Aggregate:
+    """Часть ndjson-файла; firsts — смещения первых вхождений user_id в ней."""
+    (start, end), firsts = task
+    skipped = 0
+
+    def first_records() -> Iterator[dict]:
+        nonlocal skipped
+        for offset, record in iter_range_with_offsets(Path(path), start, end):
+            if offset in firsts:
+                yield record
+            else:
+                skipped += 1
+
+    result = _aggregate(first_records(), rates, top_n)
+    result.duplicates = skipped
+    return result
+
+
+def _range_tasks(
+    path: Path, ranges: List[Tuple[int, int]]
+) -> List[Tuple[Tuple[int, int], Set[int]]]:
+    """Диапазоны вместе со смещениями первых вхождений, попавшими в каждый."""
+    starts = [start for start, _ in ranges]
+    firsts: List[Set[int]] = [set() for _ in ranges]
+    for offset in load_index(path).values():
+        pos = bisect_right(starts, offset) - 1
+        if pos >= 0:
+            firsts[pos].add(offset)
+    return list(zip(ranges, firsts))
+
+
+class _FirstRecords:
+    """Записи без повторов user_id (первая выигрывает) со счётчиком пропущенных."""
+
+    def __init__(self, records: Iterable[dict]) -> None:
+        self._records = records
+        self.skipped = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        seen: Set[int] = set()
+        for record in self._records:
+            user_id = int(record["user_id"])
+            if user_id in seen:
+                self.skipped += 1
+                continue
+            seen.add(user_id)
+            yield record
+
+
+def _chunks(records: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bounded_map(
+    pool: Executor, func: Callable, items: Iterable, window: int
+) -> Iterator:
+    """Как pool.map, но следующий элемент берётся, только когда готов один из window."""
+    pending: deque = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def aggregate_portfolios(
+    base: str = "USD",
+    top_n: int = 10,
+    workers: Optional[int] = None,
+) -> Aggregate:
+    base = base.upper()
+    rates = rates_to_base(base)
+    workers = workers or os.cpu_count() or 1
+    result = Aggregate(top_n=top_n)
+
+    _, portfolios_path = storage_paths()
+    if workers <= 1:
+        records = _FirstRecords(iter_portfolios())
+        result.merge(_aggregate(records, rates, top_n))
+        result.duplicates = records.skipped
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if portfolios_path.suffix == ".ndjson":
+            # несколько диапазонов на воркер сглаживают неравные части
+            ranges = split_ranges(portfolios_path, workers * 4)
+            scan = partial(
+                _aggregate_range, path=str(portfolios_path), rates=rates, top_n=top_n
+            )
+            tasks = _range_tasks(portfolios_path, ranges)
+            partials = _bounded_map(pool, scan, tasks, workers * 2)
+            for partial_result in partials:
+                result.merge(partial_result)
+        else:
+            scan = partial(_aggregate_chunk, rates=rates, top_n=top_n)
+            records = _FirstRecords(iter_portfolios())
+            chunks = _chunks(iter(records), CHUNK_SIZE)
+            for partial_result in _bounded_map(pool, scan, chunks, workers * 2):
+                result.merge(partial_result)
+            result.duplicates = records.skipped
+    return result
+
+
+def usernames(user_ids: Iterable[int]) -> Dict[int, str]:
+    """Имена только для нужных user_id (один проход по users)."""
+    wanted = set(user_ids)
+    names: Dict[int, str] = {}
+    for record in iter_user_records():
+        if record["user_id"] in wanted:
+            names[record["user_id"]] = record["username"]
+            if len(names) == len(wanted):
+                break
+    return names
@@ -0,0 +1,408 @@
+"""Инкрементальная проверка целостности users/portfolios (команда audit).
+
+Проверки:
+- отрицательный баланс кошелька;
+- повторный портфель одного user_id;
+- портфель пользователя, которого нет в users.
+
+Для каждого user_id считается хеш содержимого (его запись в users и все его
+портфели), хеши листьев сворачиваются в корень дерева Меркла. Все уровни
+дерева и хеши листьев хранятся в data/audit_state.json.
+
+Какие пользователи изменились, audit узнаёт не сравнением данных, а из
+журнала data/audit_dirty.log: подписчик событий TradeExecuted и
+UserRegistered дописывает туда user_id (mark_dirty). Прогон забирает журнал,
+одним проходом по файлам выбирает записи только этих пользователей (в
+ndjson чужие строки даже не разбираются), пересчитывает их листья и пути
+от листьев к корню — O(d log n) хешей на d изменившихся пользователей
+вместо хеширования всей базы.
+
+Полная проверка (все листья и всё дерево) выполняется с --full, при первом
+запуске и когда файлы данных изменились, а журнал пуст: значит, их изменили
+в обход use cases, и доверять журналу нельзя. Если файлы не менялись вовсе
+(та же подпись inode/размер/mtime), прогон сразу возвращает прошлый результат.
+"""
+
+from __future__ import annotations
+import bisect
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from valutatrade_hub.infra.file_cache import file_signature
+from valutatrade_hub.infra.file_lock import file_lock
+from .models import wallet_balance
+from .utils import (
+    DATA_DIR,
+    iter_portfolios,
+    iter_user_records,
+    select_portfolios,
+    select_user_records,
+    storage_paths,
+)
+
+AUDIT_STATE_FILE = DATA_DIR / "audit_state.json"
+AUDIT_DIRTY_FILE = DATA_DIR / "audit_dirty.log"
+STATE_VERSION = 3
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+KINDS = {
+    "negative_balance": "отрицательный баланс",
+    "duplicate_portfolio": "повторный портфель",
+    "orphan_portfolio": "портфель без пользователя",
+}
+
+
+@dataclass
+class Violation:
+    kind: str
+    user_id: int
+    # номер записи в файле портфелей (с нуля)
+    record: int
+    location: str
+    detail: str
+
+
+@dataclass
+class AuditReport:
+    root: str
+    previous_root: Optional[str]
+    total_users: int
+    # пользователи, проверенные в этом прогоне (изменившиеся или все при --full)
+    checked: int
+    audited_at: str
+    violations: List[Violation] = field(default_factory=list)
+    # файлы не менялись с прошлого прогона
+    unchanged: bool = False
+    # проверялись все пользователи
+    full: bool = False
+
+
+def _leaf_hash(users: List[dict], portfolios: List[dict]) -> str:
+    payload = json.dumps(
+        {"users": users, "portfolios": portfolios},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _node(left: str, right: str) -> str:
+    return hashlib.sha256((left + right).encode("ascii")).hexdigest()
+
+
+def update_tree(levels: List[List[str]], changed: Iterable[int]) -> str:
+    """Пересчитать пути от изменённых листьев levels[0] к корню.
+
+    levels — уровни дерева снизу вверх; листья можно заменять и дописывать
+    в конец. Нечётный последний узел уровня идёт в пару сам с собой.
+    Возвращает корень; O(len(changed) * log n) хешей.
+    """
+    positions = set(changed)
+    depth = 0
+    while len(levels[depth]) > 1:
+        current = levels[depth]
+        if depth + 1 == len(levels):
+            levels.append([])
+        parent = levels[depth + 1]
+        size = (len(current) + 1) // 2
+        del parent[size:]
+        parent.extend([""] * (size - len(parent)))
+        next_positions = set()
+        for pos in positions:
+            p = pos // 2
+            left = current[2 * p]
+            right = current[2 * p + 1] if 2 * p + 1 < len(current) else left
+            parent[p] = _node(left, right)
+            next_positions.add(p)
+        positions = next_positions
+        depth += 1
+    del levels[depth + 1 :]
+    return levels[depth][0] if levels[depth] else EMPTY_ROOT
+
+
+def merkle_root(leaves: List[str]) -> str:
+    """Корень дерева Меркла над хешами листьев (в порядке user_id)."""
+    return update_tree([list(leaves)], range(len(leaves)))
+
+
+def _check_user(user_id: int, users: List[dict], portfolios: List[dict]) -> List[dict]:
+    """Нарушения одного user_id; портфели адресуются порядковым номером k."""
+    found: List[dict] = []
+    for k, portfolio in enumerate(portfolios):
+        if not users:
+            found.append({"kind": "orphan_portfolio", "user_id": user_id, "k": k})
+        if k > 0:
+            found.append({"kind": "duplicate_portfolio", "user_id": user_id, "k": k})
+        for code, wallet in (portfolio.get("wallets") or {}).items():
+            balance = wallet_balance(code, wallet)
+            if balance < 0:
+                found.append(
+                    {
+                        "kind": "negative_balance",
+                        "user_id": user_id,
+                        "k": k,
+                        "currency": code,
+                        # поле записи как есть: units или старое balance
+                        "field": "units" if "units" in wallet else "balance",
+                        "balance": balance,
+                    }
+                )
+    return found
+
+
+def _render(raw: dict, positions: List[int], file_name: str) -> Violation:
+    index = positions[raw["k"]]
+    location = f"{file_name}, запись #{index}"
+    if raw["kind"] == "negative_balance":
+        location += f", wallets.{raw['currency']}.{raw['field']}"
+        detail = f"баланс {raw['balance']}"
+    elif raw["kind"] == "duplicate_portfolio":
+        detail = f"первый портфель — запись #{positions[0]}"
+    else:
+        detail = f"user_id={raw['user_id']} отсутствует в users"
+    return Violation(
+        kind=raw["kind"],
+        user_id=raw["user_id"],
+        record=index,
+        location=location,
+        detail=detail,
+    )
+
+
+def mark_dirty(user_ids: Iterable[int]) -> None:
+    """Отметить пользователей, чьи данные изменились (для следующего audit)."""
+    payload = "".join(f"{int(user_id)}\n" for user_id in user_ids)
+    if not payload:
+        return
+    with file_lock(AUDIT_DIRTY_FILE):
+        with AUDIT_DIRTY_FILE.open("a", encoding="utf-8") as f:
+            f.write(payload)
+
+
+def _claim_dirty() -> Tuple[Set[int], List[Path]]:
+    """Забрать журнал изменившихся user_id.
+
+    Журнал переименовывается, новые отметки пишутся в свежий файл; забранные
+    файлы удаляются только после сохранения состояния (см. run_audit), поэтому
+    после сбоя посреди прогона они будут прочитаны снова.
+    """
+    with file_lock(AUDIT_DIRTY_FILE):
+        if AUDIT_DIRTY_FILE.exists():
+            claimed = AUDIT_DIRTY_FILE.with_name(
+                f"audit_dirty.{os.getpid()}.{time.time_ns()}.processing"
+            )
+            os.replace(AUDIT_DIRTY_FILE, claimed)
+    files = sorted(DATA_DIR.glob("audit_dirty.*.processing"))
+    user_ids: Set[int] = set()
+    for path in files:
+        with path.open("r", encoding="utf-8") as f:
+            user_ids.update(int(line) for line in f if line.strip())
+    return user_ids, files
+
+
+def _load_state() -> dict:
+    if not AUDIT_STATE_FILE.exists():
+        return {}
+    with AUDIT_STATE_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(state: dict) -> None:
+    tmp = AUDIT_STATE_FILE.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, AUDIT_STATE_FILE)
+
+
+def _files_signature(paths: Tuple[Path, Path]) -> List[Optional[list]]:
+    return [list(sig) if sig else None for sig in map(file_signature, paths)]
+
+
+def _collect(
+    only: Optional[Set[int]] = None,
+) -> Tuple[Dict[int, List[dict]], Dict[int, List[dict]], Dict[int, List[int]]]:
+    """Записи users и портфели (с номерами записей) по user_id.
+
+    only — собрать только этих пользователей: записи остальных отсеиваются
+    по user_id, в ndjson — ещё до разбора строки (см. Serializer.select).
+    """
+    if only is None:
+        user_rows = enumerate(iter_user_records())
+        portfolio_rows = enumerate(iter_portfolios())
+    else:
+        user_rows = select_user_records(only)
+        portfolio_rows = select_portfolios(only)
+
+    users: Dict[int, List[dict]] = {}
+    for _, record in user_rows:
+        users.setdefault(int(record["user_id"]), []).append(record)
+
+    portfolios: Dict[int, List[dict]] = {}
+    positions: Dict[int, List[int]] = {}
+    for index, record in portfolio_rows:
+        user_id = int(record["user_id"])
+        portfolios.setdefault(user_id, []).append(record)
+        positions.setdefault(user_id, []).append(index)
+    return users, portfolios, positions
+
+
+def _entry(
+    user_id: int,
+    users: Dict[int, List[dict]],
+    portfolios: Dict[int, List[dict]],
+    positions: Dict[int, List[int]],
+) -> dict:
+    user_records = users.get(user_id, [])
+    user_portfolios = portfolios.get(user_id, [])
+    entry = {
+        "hash": _leaf_hash(user_records, user_portfolios),
+        "violations": _check_user(user_id, user_records, user_portfolios),
+    }
+    if entry["violations"]:
+        # номера записей нужны только для вывода нарушений
+        entry["positions"] = positions.get(user_id, [])
+    return entry
+
+
+def _full_state(paths: Tuple[Path, Path]) -> dict:
+    users, portfolios, positions = _collect()
+    order = sorted(users.keys() | portfolios.keys())
+    entries = {
+        str(user_id): _entry(user_id, users, portfolios, positions)
+        for user_id in order
+    }
+    levels = [[entries[str(user_id)]["hash"] for user_id in order]]
+    root = update_tree(levels, range(len(order)))
+    return {"order": order, "users": entries, "levels": levels, "root": root}
+
+
+def _apply_dirty(state: dict, dirty: Set[int]) -> None:
+    """Пересчитать листья изменившихся пользователей и их пути к корню."""
+    users, portfolios, positions = _collect(only=dirty)
+    order: List[int] = state["order"]
+    entries: Dict[str, dict] = state["users"]
+    leaves: List[str] = state["levels"][0]
+    changed: Set[int] = set()
+    rebuild = False
+
+    for user_id in sorted(dirty):
+        pos = bisect.bisect_left(order, user_id)
+        present = pos < len(order) and order[pos] == user_id
+        if user_id not in users and user_id not in portfolios:
+            if present:
+                # записи пропали: позиции всех листьев правее сдвигаются
+                del order[pos], leaves[pos]
+                entries.pop(str(user_id), None)
+                rebuild = True
+            continue
+
+        entry = _entry(user_id, users, portfolios, positions)
+        entries[str(user_id)] = entry
+        if present:
+            leaves[pos] = entry["hash"]
+            changed.add(pos)
+        elif pos == len(order):
+            order.append(user_id)
+            leaves.append(entry["hash"])
+            changed.add(pos)
+        else:
+            order.insert(pos, user_id)
+            leaves.insert(pos, entry["hash"])
+            rebuild = True
+
+    if rebuild:
+        state["levels"] = [leaves]
+        changed = set(range(len(leaves)))
+    state["root"] = update_tree(state["levels"], changed)
+
+
+def _report_violations(state: dict, file_name: str) -> List[Violation]:
+    violations: List[Violation] = []
+    for user_id in state["violators"]:
+        entry = state["users"][str(user_id)]
+        violations.extend(
+            _render(raw, entry["positions"], file_name) for raw in entry["violations"]
+        )
+    violations.sort(key=lambda v: (v.record, v.location))
+    return violations
+
+
+def run_audit(full: bool = False) -> AuditReport:
+    """Проверка целостности; full=True — перепроверить всех пользователей."""
+    with file_lock(AUDIT_STATE_FILE):
+        return _run_audit(full)
+
+
+def _run_audit(full: bool) -> AuditReport:
+    paths = storage_paths()
+    dirty, claimed = _claim_dirty()
+    # подпись — после забора журнала: изменения, сделанные позже, попадут
+    # в новый журнал и в следующий прогон
+    signature = _files_signature(paths)
+    state = _load_state()
+    previous_root = state.get("root")
+    now = datetime.now().isoformat(timespec="seconds")
+    file_name = paths[1].name
+
+    usable = (
+        state.get("version") == STATE_VERSION
+        and state.get("paths") == [str(p) for p in paths]
+    )
+    if not full and usable and state.get("files") == signature:
+        for path in claimed:
+            path.unlink(missing_ok=True)
+        return AuditReport(
+            root=state["root"],
+            previous_root=previous_root,
+            total_users=len(state["order"]),
+            checked=0,
+            audited_at=now,
+            violations=_report_violations(state, file_name),
+            unchanged=True,
+        )
+
+    incremental = not full and usable and bool(dirty)
+    if incremental:
+        _apply_dirty(state, dirty)
+        checked = len(dirty)
+        violators = set(state.get("violators", [])) - dirty
+        candidates: Iterable[int] = dirty
+    else:
+        state = _full_state(paths)
+        checked = len(state["order"])
+        violators = set()
+        candidates = state["order"]
+    violators.update(
+        user_id
+        for user_id in candidates
+        if state["users"].get(str(user_id), {}).get("violations")
+    )
+
+    state.update(
+        version=STATE_VERSION,
+        audited_at=now,
+        paths=[str(p) for p in paths],
+        files=signature,
+        violators=sorted(violators),
+    )
+    _save_state(state)
+    for path in claimed:
+        path.unlink(missing_ok=True)
+
+    return AuditReport(
+        root=state["root"],
+        previous_root=previous_root,
+        total_users=len(state["order"]),
+        checked=checked,
+        audited_at=now,
+        violations=_report_violations(state, file_name),
+        full=not incremental,
+    )
+
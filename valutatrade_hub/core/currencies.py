@@ -1,8 +1,16 @@
 from __future__ import annotations
+import json
+import sys
 from abc import ABC, abstractmethod  
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from pathlib import Path
 from typing import Dict
 from .exceptions import CurrencyNotFoundError
+from valutatrade_hub.infra.settings import SettingsLoader
+
+# точность (число знаков после запятой) для валют, которых нет в реестре
+DEFAULT_PRECISION = 8
 
 def _validate_code(code: str) -> str:
     code = (code or "").upper()
@@ -21,6 +29,8 @@ class Currency(ABC):
     """Абстрактная базовая валюта."""
     name: str
     code: str
+    # число знаков после запятой: баланс хранится в целых «минимальных единицах»
+    precision: int = field(default=2, kw_only=True)
 
     def __post_init__(self) -> None:
         # Общая валидация для всех валют
@@ -43,19 +53,81 @@ class FiatCurrency(Currency):
 class CryptoCurrency(Currency):
     algorithm: str
     market_cap: float
+    precision: int = field(default=8, kw_only=True)
 
     def get_display_info(self) -> str:
         # Краткая форма капитализации в научной нотации
         return f"[CRYPTO] {self.code} — {self.name} (Algo: {self.algorithm}, MCAP: {self.market_cap:.2e})"
 
 
-_CURRENCY_REGISTRY: Dict[str, Currency] = {
-    "USD": FiatCurrency(name="US Dollar", code="USD", issuing_country="United States"),
-    "EUR": FiatCurrency(name="Euro", code="EUR", issuing_country="Eurozone"),
-    "RUB": FiatCurrency(name="Russian Ruble", code="RUB", issuing_country="Russia"),
-    "BTC": CryptoCurrency(name="Bitcoin", code="BTC", algorithm="SHA-256", market_cap=1.12e12),
-    "ETH": CryptoCurrency(name="Ethereum", code="ETH", algorithm="Ethash", market_cap=4.50e11),
-}
+# Запасной набор на случай отсутствия файла каталога
+_BUILTIN_CURRENCIES: list[Currency] = [
+    FiatCurrency(name="US Dollar", code="USD", issuing_country="United States"),
+    FiatCurrency(name="Euro", code="EUR", issuing_country="Eurozone"),
+    FiatCurrency(name="Russian Ruble", code="RUB", issuing_country="Russia"),
+    CryptoCurrency(name="Bitcoin", code="BTC", algorithm="SHA-256", market_cap=1.12e12),
+    CryptoCurrency(name="Ethereum", code="ETH", algorithm="Ethash", market_cap=4.50e11),
+]
+
+
+def _currency_from_record(item: dict) -> Currency:
+    kind = item.get("type", "fiat")
+    common = {"name": item["name"], "code": item["code"]}
+    if "precision" in item:
+        common["precision"] = int(item["precision"])
+    if kind == "crypto":
+        return CryptoCurrency(
+            **common,
+            algorithm=item.get("algorithm", ""),
+            market_cap=float(item.get("market_cap", 0.0)),
+        )
+    if kind == "fiat":
+        return FiatCurrency(**common, issuing_country=item.get("issuing_country", ""))
+    raise ValueError(f"Неизвестный тип валюты '{kind}' для кода {item['code']}")
+
+
+def _catalog_path() -> Path:
+    settings = SettingsLoader()
+    root = Path(settings.get("project_root", "."))
+    data_dir = root / settings.get("data_dir", "data")
+    return data_dir / settings.get("currencies_file", "currencies.json")
+
+
+def _load_catalog(path: Path | None = None) -> list[Currency]:
+    path = path or _catalog_path()
+    if not path.exists():
+        return list(_BUILTIN_CURRENCIES)
+    with path.open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return [_currency_from_record(item) for item in raw.get("currencies", [])]
+
+
+def _build_lookup(
+    currencies: list[Currency],
+) -> tuple[Dict[str, Currency], Dict[str, Currency]]:
+    """Реестр по нормализованному коду и таблица быстрых ключей.
+
+    В таблицу поиска сразу кладём и «BTC», и «btc», поэтому get_currency
+    для типичного ввода обходится одним обращением к dict без валидации.
+    """
+    registry: Dict[str, Currency] = {}
+    lookup: Dict[str, Currency] = {}
+    for currency in currencies:
+        currency.code = sys.intern(currency.code)
+        registry[currency.code] = currency
+        lookup[currency.code] = currency
+        lookup[sys.intern(currency.code.lower())] = currency
+    return registry, lookup
+
+
+_CURRENCY_REGISTRY, _CURRENCY_LOOKUP = _build_lookup(_load_catalog())
+
+
+def reload_currencies(path: Path | None = None) -> int:
+    """Перечитать каталог валют из файла. Возвращает число валют."""
+    global _CURRENCY_REGISTRY, _CURRENCY_LOOKUP
+    _CURRENCY_REGISTRY, _CURRENCY_LOOKUP = _build_lookup(_load_catalog(path))
+    return len(_CURRENCY_REGISTRY)
 
 
 """def get_currency(code: str) -> Currency:
@@ -68,9 +140,60 @@ _CURRENCY_REGISTRY: Dict[str, Currency] = {
     return currency"""
     
 def get_currency(code: str) -> Currency:
+    # быстрый путь: уже нормализованный (или строчный) код
+    currency = _CURRENCY_LOOKUP.get(code)
+    if currency is not None:
+        return currency
     norm_code = _validate_code(code)
     currency = _CURRENCY_REGISTRY.get(norm_code)
     if currency is None:
         raise CurrencyNotFoundError(norm_code)
     return currency
 
+
+def list_currencies(
+    kind: str | None = None, search: str | None = None
+) -> list[Currency]:
+    """Валюты каталога (по коду), с фильтром по типу и подстроке кода/названия."""
+    result = list(_CURRENCY_REGISTRY.values())
+    if kind == "fiat":
+        result = [c for c in result if isinstance(c, FiatCurrency)]
+    elif kind == "crypto":
+        result = [c for c in result if isinstance(c, CryptoCurrency)]
+    if search:
+        needle = search.lower()
+        result = [
+            c for c in result if needle in c.code.lower() or needle in c.name.lower()
+        ]
+    return sorted(result, key=lambda c: c.code)
+
+
+def get_precision(code: str) -> int:
+    """Точность валюты из реестра; для неизвестных кодов — DEFAULT_PRECISION."""
+    currency = _CURRENCY_LOOKUP.get(code) or _CURRENCY_REGISTRY.get(code.upper())
+    return currency.precision if currency is not None else DEFAULT_PRECISION
+
+
+def to_minor_units(amount: float | int | str, code: str) -> int:
+    """Переводит сумму в целые минимальные единицы валюты (сатоши, центы и т.п.).
+
+    Через Decimal(str(...)), чтобы 0.1 превращалось ровно в 10_000_000 сатоши,
+    а не в 9_999_999 из-за двоичного представления float.
+    """
+    if isinstance(amount, bool):
+        raise TypeError("Сумма должна быть числом")
+    if isinstance(amount, int):
+        return amount * 10 ** get_precision(code)
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        raise TypeError("Сумма должна быть числом") from None
+    if not value.is_finite():
+        raise ValueError("Сумма должна быть конечным числом")
+    scaled = value.scaleb(get_precision(code))
+    return int(scaled.to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_minor_units(units: int, code: str) -> float:
+    """Обратное преобразование: минимальные единицы → float для вывода и JSON."""
+    return units / 10 ** get_precision(code)
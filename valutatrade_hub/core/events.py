@@ -0,0 +1,247 @@
+"""Доменные события и шина для их доставки внутри процесса.
+
+Use cases фиксируют изменения и публикуют событие; побочные действия
+(журнал операций, история сделок, лимитные ордера, оповещения, кэш оценок)
+подписаны на события и сами решают, где выполняться:
+
+- ``inline`` — сразу в потоке публикатора (нужен порядок или результат
+  до возврата из use case);
+- ``thread`` — в фоновом потоке через ограниченную очередь; при
+  переполнении публикатор ждёт (backpressure), события не теряются;
+- ``async`` — корутина в заданном цикле asyncio; число незавершённых
+  корутин ограничено семафором с тем же смыслом.
+
+Ошибка подписчика пишется в журнал и не прерывает ни публикатора,
+ни других подписчиков.
+
+Общая шина event_bus подключает стандартных подписчиков (subscribers.py)
+сама, перед первой публикацией: любой вызывающий use cases — CLI, HTTP API,
+скрипт или тест — получает историю сделок, журнал и отметки для audit.
+"""
+
+from __future__ import annotations
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger("valutatrade.events")
+
+MODES = ("inline", "thread", "async")
+DEFAULT_QUEUE_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class TradeExecuted:
+    user_id: int
+    side: str  # buy | sell
+    currency: str
+    base: str
+    amount: float
+    rate: float
+    balance_after: float
+    details: str = ""
+    timestamp: datetime = field(default_factory=datetime.now)
+
+
+@dataclass(frozen=True)
+class RateUpdated:
+    # новые курсы {"BTC_USD": 59000.0}
+    rates: Dict[str, float]
+    # изменения уже известных курсов {"BTC_USD": (старый, новый)}
+    changes: Dict[str, Tuple[float, float]]
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    @property
+    def currencies(self) -> set[str]:
+        return {code for pair in self.rates for code in pair.split("_")}
+
+
+@dataclass(frozen=True)
+class UserRegistered:
+    user_id: int
+    username: str
+    timestamp: datetime = field(default_factory=datetime.now)
+
+
+_STOP = object()
+
+
+class _ThreadWorker:
+    """Фоновый поток подписчика с ограниченной очередью."""
+
+    def __init__(self, bus: "EventBus", handler: Callable, maxsize: int) -> None:
+        self.bus = bus
+        self.handler = handler
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(
+            target=self._run,
+            name=f"events-{getattr(handler, '__name__', 'handler')}",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            event = self.queue.get()
+            try:
+                if event is _STOP:
+                    return
+                self.bus._deliver(self.handler, event)  # noqa: SLF001
+            finally:
+                self.queue.task_done()
+
+    def submit(self, event: Any) -> None:
+        # блокирующий put: быстрый публикатор ждёт медленного подписчика
+        self.queue.put(event)
+
+    def stop(self) -> None:
+        self.queue.put(_STOP)
+        self.thread.join()
+
+
+class _AsyncDispatcher:
+    """Запуск корутин-подписчиков в чужом цикле asyncio."""
+
+    def __init__(
+        self,
+        bus: "EventBus",
+        handler: Callable,
+        loop: asyncio.AbstractEventLoop,
+        limit: int,
+    ) -> None:
+        self.bus = bus
+        self.handler = handler
+        self.loop = loop
+        self.slots = threading.BoundedSemaphore(limit)
+
+    async def _run(self, event: Any) -> None:
+        try:
+            await self.handler(event)
+            self.bus.count("delivered")
+        except Exception:  # noqa: BLE001
+            self.bus.count("failed")
+            logger.exception("Подписчик %s упал на %r", self.handler, event)
+        finally:
+            self.slots.release()
+
+    def submit(self, event: Any) -> None:
+        self.slots.acquire()
+        asyncio.run_coroutine_threadsafe(self._run(event), self.loop)
+
+
+class EventBus:
+    def __init__(
+        self,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        setup: Optional[Callable[["EventBus"], None]] = None,
+    ) -> None:
+        """setup(bus) вызывается один раз перед первой публикацией."""
+        self.queue_size = queue_size
+        self._subscribers: Dict[Type, List[Tuple[str, Callable, Any]]] = {}
+        self._workers: List[_ThreadWorker] = []
+        self._lock = threading.Lock()
+        self._setup = setup
+        self._setup_lock = threading.Lock()
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        # счётчики обновляют и публикатор, и фоновые потоки
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _ensure_setup(self) -> None:
+        if self._setup is None:
+            return
+        with self._setup_lock:
+            if self._setup is not None:
+                self._setup(self)
+                self._setup = None
+
+    def subscribe(
+        self,
+        event_type: Type,
+        handler: Callable,
+        mode: str = "inline",
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        """Подписать handler на события event_type (и его подклассов)."""
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим подписчика: {mode}")
+
+        target: Any = None
+        if mode == "thread":
+            target = _ThreadWorker(self, handler, self.queue_size)
+            self._workers.append(target)
+        elif mode == "async":
+            if loop is None:
+                raise ValueError("Для режима async нужен цикл asyncio (loop=...)")
+            target = _AsyncDispatcher(self, handler, loop, self.queue_size)
+
+        with self._lock:
+            self._subscribers.setdefault(event_type, []).append((mode, handler, target))
+
+    def unsubscribe(self, event_type: Type, handler: Callable) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(event_type, [])
+            for entry in [e for e in subscribers if e[1] is handler]:
+                subscribers.remove(entry)
+                if isinstance(entry[2], _ThreadWorker):
+                    entry[2].stop()
+                    self._workers.remove(entry[2])
+
+    def publish(self, event: Any) -> None:
+        self._ensure_setup()
+        self.count("published")
+        with self._lock:
+            subscribers = [
+                entry
+                for event_type, entries in self._subscribers.items()
+                if isinstance(event, event_type)
+                for entry in entries
+            ]
+        for mode, handler, target in subscribers:
+            if mode == "inline":
+                self._deliver(handler, event)
+            else:
+                target.submit(event)
+
+    def _deliver(self, handler: Callable, event: Any) -> None:
+        try:
+            handler(event)
+            self.count("delivered")
+        except Exception:  # noqa: BLE001
+            self.count("failed")
+            logger.exception("Подписчик %s упал на %r", handler, event)
+
+    def flush(self) -> None:
+        """Дождаться обработки уже опубликованных событий фоновыми потоками."""
+        for worker in list(self._workers):
+            worker.queue.join()
+
+    def shutdown(self) -> None:
+        for worker in list(self._workers):
+            worker.stop()
+        self._workers.clear()
+        with self._lock:
+            self._subscribers.clear()
+
+
+def _install_standard_subscribers(bus: EventBus) -> None:
+    # импорт при первой публикации: подписчики зависят от use cases,
+    # которые сами импортируют эту шину
+    from valutatrade_hub.core.subscribers import install_subscribers
+
+    install_subscribers(bus)
+
+
+event_bus = EventBus(setup=_install_standard_subscribers)
+
+# фоновые подписчики дописывают журнал и после выхода из REPL
+atexit.register(event_bus.flush)
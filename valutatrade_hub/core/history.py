@@ -0,0 +1,135 @@
+"""Журнал сделок пользователя с постраничными запросами.
+
+Для каждого пользователя два файла в ``data/history``:
+- ``user_<id>.ndjson`` — сделки строками JSON (только дозапись);
+- ``user_<id>.idx`` — индекс фиксированной ширины: (время, смещение, валюта).
+
+Границу ``--before`` находим бинарным поиском прямо по файлу индекса,
+затем идём назад по индексу блоками до заполнения страницы и читаем из
+журнала только нужные строки. Стоимость запроса зависит от размера
+страницы, а не от длины журнала.
+"""
+
+from __future__ import annotations
+import json
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from valutatrade_hub.core.utils import HISTORY_DIR
+
+# время (unix, float64), смещение строки в журнале (uint64), код валюты (8 байт)
+_ENTRY = struct.Struct("<dQ8s")
+# сколько записей индекса читать за один seek при обратном проходе
+_BLOCK = 256
+
+
+def _paths(user_id: int) -> Tuple[Path, Path]:
+    return (
+        HISTORY_DIR / f"user_{user_id}.ndjson",
+        HISTORY_DIR / f"user_{user_id}.idx",
+    )
+
+
+def record_trade(
+    user_id: int,
+    side: str,
+    currency: str,
+    amount: float,
+    rate: float,
+    balance_after: float,
+    base: str,
+    timestamp: Optional[datetime] = None,
+) -> dict:
+    """Дописывает сделку в журнал пользователя и в индекс."""
+    HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+    log_path, idx_path = _paths(user_id)
+
+    now = timestamp or datetime.now()
+    record = {
+        "timestamp": now.isoformat(timespec="microseconds"),
+        "side": side,
+        "currency": currency,
+        "amount": amount,
+        "rate": rate,
+        "base": base,
+        "balance_after": balance_after,
+    }
+    line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    with log_path.open("ab") as log:
+        offset = log.seek(0, 2)
+        log.write(line)
+    with idx_path.open("ab") as idx:
+        idx.write(_ENTRY.pack(now.timestamp(), offset, currency.encode("ascii")))
+    return record
+
+
+def _entry_at(idx: BinaryIO, pos: int) -> Tuple[float, int, str]:
+    idx.seek(pos * _ENTRY.size)
+    ts, offset, code = _ENTRY.unpack(idx.read(_ENTRY.size))
+    return ts, offset, code.rstrip(b"\0").decode("ascii")
+
+
+def _bisect_before(idx: BinaryIO, count: int, before_ts: float) -> int:
+    """Число записей индекса со временем строго меньше before_ts."""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _entry_at(idx, mid)[0] < before_ts:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _iter_backwards(idx: BinaryIO, end: int) -> Iterator[Tuple[float, int, str]]:
+    """Записи индекса [0, end) от новых к старым, чтение блоками."""
+    while end > 0:
+        start = max(0, end - _BLOCK)
+        idx.seek(start * _ENTRY.size)
+        block = idx.read((end - start) * _ENTRY.size)
+        entries = list(_ENTRY.iter_unpack(block))
+        for ts, offset, code in reversed(entries):
+            yield ts, offset, code.rstrip(b"\0").decode("ascii")
+        end = start
+
+
+def query_history(
+    user_id: int,
+    limit: int = 50,
+    before: Optional[datetime] = None,
+    currency: Optional[str] = None,
+) -> List[dict]:
+    """Страница сделок от новых к старым.
+
+    before — вернуть только сделки раньше этого момента (курсор страницы);
+    currency — только сделки по этой валюте.
+    """
+    if limit < 1:
+        raise ValueError("'limit' должен быть положительным числом")
+
+    log_path, idx_path = _paths(user_id)
+    if not idx_path.exists():
+        return []
+
+    code = currency.upper() if currency else None
+    offsets: List[int] = []
+    with idx_path.open("rb") as idx:
+        count = idx_path.stat().st_size // _ENTRY.size
+        if before is None:
+            end = count
+        else:
+            end = _bisect_before(idx, count, before.timestamp())
+        for _, offset, entry_code in _iter_backwards(idx, end):
+            if code is None or entry_code == code:
+                offsets.append(offset)
+                if len(offsets) >= limit:
+                    break
+
+    records: List[dict] = []
+    with log_path.open("rb") as log:
+        for offset in offsets:
+            log.seek(offset)
+            records.append(json.loads(log.readline()))
+    return records
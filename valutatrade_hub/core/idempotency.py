@@ -0,0 +1,237 @@
+"""Ключи идемпотентности для buy/sell.
+
+Клиент, повторяющий запрос после таймаута, передаёт тот же ключ — и получает
+исходный результат без повторного исполнения сделки. Недавние ключи хранятся
+в OrderedDict (поиск O(1), порядок вставки = порядок истечения), размер
+ограничен, у записей есть срок жизни.
+
+На диске — снимок data/idempotency.json и дописываемый журнал
+idempotency.<N>.log (см. infra/journal.py): новый ключ стоит одной строки
+в журнале, а не перезаписи файла. Когда в журнале набирается max_keys
+записей, истёкшие и вытесненные ключи отбрасываются и пишется новый снимок.
+
+Сделка с ключом идёт под claim(): на всё её время берётся блокировка
+пользователя (файл idempotency.user_<id>.lock), поэтому повтор с тем же
+ключом из другого процесса дождётся первого и получит его результат, а
+сделки разных пользователей друг друга не ждут. Общая блокировка
+idempotency.json берётся только на проверку ключа и запись результата.
+
+Ключ действует в пределах пользователя и операции. Повтор с тем же ключом,
+но другими параметрами — ошибка, а не молчаливая подмена результата.
+"""
+
+from __future__ import annotations
+import functools
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from valutatrade_hub.infra.file_lock import file_lock
+from valutatrade_hub.infra.journal import Journal
+from valutatrade_hub.infra.settings import SettingsLoader
+from .utils import DATA_DIR
+
+IDEMPOTENCY_FILE = DATA_DIR / "idempotency.json"
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_KEYS = 1000
+
+# компактизация не чаще, чем раз в столько записей журнала
+COMPACT_AFTER = 256
+
+Scope = Tuple[int, str, str]
+
+
+def _scope_to_str(scope: Scope) -> str:
+    return f"{scope[0]}:{scope[1]}:{scope[2]}"
+
+
+def _scope_from_str(value: str) -> Scope:
+    user_id, action, key = value.split(":", 2)
+    return int(user_id), action, key
+
+
+def _to_item(scope: Scope, entry: Tuple[float, str, list]) -> dict:
+    expires_at, fingerprint, result = entry
+    return {
+        "key": _scope_to_str(scope),
+        "expires_at": expires_at,
+        "fingerprint": fingerprint,
+        "result": result,
+    }
+
+
+class Claim:
+    """Результат проверки ключа внутри IdempotencyStore.claim()."""
+
+    def __init__(
+        self, store: "IdempotencyStore", scope: Scope, fingerprint: str
+    ) -> None:
+        self._store = store
+        self._scope = scope
+        self._fingerprint = fingerprint
+        self.result: Optional[list] = store.get(scope, fingerprint)
+
+    @property
+    def done(self) -> bool:
+        """Ключ уже исполнен: вернуть result вместо повторной сделки."""
+        return self.result is not None
+
+    def commit(self, result: list) -> None:
+        """Сохранить результат исполненной сделки."""
+        self._store.put(self._scope, self._fingerprint, result)
+        self.result = result
+
+
+class IdempotencyStore:
+    def __init__(self, path: Path, ttl_seconds: float, max_keys: int) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        # scope -> (истекает_в, отпечаток_параметров, результат)
+        self._entries: "OrderedDict[Scope, Tuple[float, str, list]]" = OrderedDict()
+        self.journal = Journal(path, self._load_file, self._save_file)
+        self._loaded = False
+        self._logged = 0  # записей в журнале текущего поколения
+        self._lock = file_lock(path)
+
+    def _load_file(self) -> dict:
+        if not self.path.exists():
+            return {}
+        with self.path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_file(self, payload: dict) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _sync(self) -> None:
+        """Догнать файлы: снимок после чужой компактизации, затем хвост журнала."""
+        if not self._loaded or self.journal.stale():
+            raw = self.journal.load_snapshot()
+            self._entries.clear()
+            for item in raw.get("entries", []):
+                self._apply(item)
+            self._loaded = True
+            self._logged = 0
+        for item in self.journal.read_new():
+            self._apply(item)
+            self._logged += 1
+
+    def _apply(self, item: dict) -> None:
+        scope = _scope_from_str(item["key"])
+        self._entries[scope] = (
+            float(item["expires_at"]),
+            item["fingerprint"],
+            item["result"],
+        )
+        self._entries.move_to_end(scope)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def _expire(self, now: float) -> None:
+        # записи добавляются с одинаковым TTL, поэтому старейшие — в начале
+        while self._entries:
+            scope, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[scope]
+
+    def _compact(self) -> None:
+        """Новый снимок только из живых ключей и пустой журнал."""
+        self._expire(time.time())
+        entries = [_to_item(scope, entry) for scope, entry in self._entries.items()]
+        self.journal.compact({"entries": entries}, [])
+        self._logged = 0
+
+    @contextmanager
+    def claim(self, scope: Scope, fingerprint: str) -> Iterator[Claim]:
+        """Проверка ключа и исполнение под блокировкой пользователя scope.
+
+        Повтор того же ключа (в любом процессе) ждёт выхода из with и видит
+        результат, сохранённый через Claim.commit.
+        """
+        user_lock = self.path.with_name(f"{self.path.stem}.user_{scope[0]}")
+        with file_lock(user_lock):
+            yield Claim(self, scope, fingerprint)
+
+    def get(self, scope: Scope, fingerprint: str) -> Optional[list]:
+        with self._lock:
+            self._sync()
+            self._expire(time.time())
+            entry = self._entries.get(scope)
+            if entry is None:
+                return None
+            if entry[1] != fingerprint:
+                raise ValueError(
+                    f"Ключ идемпотентности '{scope[2]}' уже использован "
+                    "с другими параметрами"
+                )
+            return entry[2]
+
+    def put(self, scope: Scope, fingerprint: str, result: list) -> None:
+        with self._lock:
+            self._sync()
+            expires_at = time.time() + self.ttl_seconds
+            item = _to_item(scope, (expires_at, fingerprint, result))
+            self.journal.append([item])
+            self._apply(item)
+            self._logged += 1
+            if self._logged >= max(COMPACT_AFTER, self.max_keys):
+                self._compact()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _make_store() -> IdempotencyStore:
+    settings = SettingsLoader()
+    return IdempotencyStore(
+        IDEMPOTENCY_FILE,
+        ttl_seconds=float(settings.get("idempotency_ttl_seconds", DEFAULT_TTL_SECONDS)),
+        max_keys=int(settings.get("idempotency_max_keys", DEFAULT_MAX_KEYS)),
+    )
+
+
+idempotency_store = _make_store()
+
+
+def idempotent(action: str):
+    """Декоратор use case: необязательный kwarg ``idempotency_key``.
+
+    Ставится над @log_action, чтобы повтор не попадал в журнал как новая сделка.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, idempotency_key: Optional[str] = None, **kwargs):
+            if not idempotency_key:
+                return func(*args, **kwargs)
+
+            # позиционные и именованные аргументы — в один набор с умолчаниями,
+            # чтобы buy(1, "BTC", 0.1) и buy(user_id=1, ...) давали один ключ
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            scope = (int(arguments.get("user_id") or 0), action, str(idempotency_key))
+            fingerprint = json.dumps(
+                {k: str(v) for k, v in arguments.items()}, sort_keys=True
+            )
+            with idempotency_store.claim(scope, fingerprint) as claim:
+                if claim.done:
+                    return tuple(claim.result)
+                result = func(*args, **kwargs)
+                claim.commit(list(result))
+                return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,164 @@
+"""Массовый импорт пользователей из CSV (import-users).
+
+Файл читается потоково (csv.DictReader), строки проверяются по мере чтения:
+уникальность имени — по множеству уже занятых имён, а не перебором списка.
+Пароли хешируются пачками в пуле процессов. Идентификаторы выдаются подряд
+от текущего максимума, а users и portfolios записываются по одному разу
+в конце, вместо чтения и перезаписи обоих файлов на каждого пользователя.
+"""
+
+from __future__ import annotations
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Tuple
+from .events import UserRegistered, event_bus
+from .models import User
+from .utils import (
+    load_portfolios,
+    load_users,
+    portfolios_lock,
+    save_portfolios,
+    save_users,
+    users_lock,
+)
+
+# та же соль, что и при register_user
+DEFAULT_SALT = "static_salt_for_now"
+
+# строк в одной задаче пула: меньше накладных расходов на передачу
+HASH_BATCH = 2000
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    first_id: int | None = None
+    last_id: int | None = None
+    # (номер_строки, имя, причина)
+    skipped: List[Tuple[int, str, str]] = field(default_factory=list)
+
+
+def _hash_batch(passwords: List[str], salt: str = DEFAULT_SALT) -> List[str]:
+    """Хеши паролей пачки (выполняется в процессе-воркере)."""
+    hash_password = User._hash_password  # noqa: SLF001
+    return [hash_password(password, salt) for password in passwords]
+
+
+def _iter_rows(path: Path) -> Iterator[Tuple[int, str, str]]:
+    with path.open("r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        fields = set(reader.fieldnames or [])
+        if not {"username", "password"} <= fields:
+            raise ValueError("CSV должен содержать колонки username и password")
+        for row in reader:
+            yield (
+                reader.line_num,
+                (row.get("username") or "").strip(),
+                row.get("password") or "",
+            )
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_users(path: str | Path, workers: int | None = None) -> ImportResult:
+    """Импортирует пользователей из CSV с колонками username,password.
+
+    Строки с пустым именем, коротким паролем или занятым именем пропускаются
+    и перечисляются в ImportResult.skipped.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise ValueError(f"Файл не найден: {path}")
+
+    result = ImportResult()
+    # users.json заблокирован до записи: id выдаются от его текущего максимума
+    with users_lock():
+        new_users = _import(path, result, workers)
+    if not new_users:
+        return result
+
+    for user in new_users:
+        event_bus.publish(UserRegistered(user_id=user.user_id, username=user.username))
+
+    result.imported = len(new_users)
+    result.first_id = new_users[0].user_id
+    result.last_id = new_users[-1].user_id
+    return result
+
+
+def _import(path: Path, result: ImportResult, workers: int | None) -> List[User]:
+    """Проверка строк, хеширование и запись users/portfolios (под users_lock)."""
+    users = load_users()
+    taken = {u.username for u in users}
+    next_id = max((u.user_id for u in users), default=0) + 1
+
+    def valid_rows() -> Iterator[Tuple[str, str]]:
+        for line, username, password in _iter_rows(path):
+            if not username:
+                result.skipped.append((line, username, "пустое имя пользователя"))
+            elif len(password) < 4:
+                result.skipped.append((line, username, "пароль короче 4 символов"))
+            elif username in taken:
+                result.skipped.append((line, username, "имя уже занято"))
+            else:
+                taken.add(username)
+                yield username, password
+
+    new_users: List[User] = []
+    registered = datetime.now()
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # пачки отправляются в пул по мере чтения файла; порядок результатов
+        # совпадает с порядком пачек, поэтому id идут в порядке строк CSV
+        batches = _batches(valid_rows(), HASH_BATCH)
+        pending = []
+        for batch in batches:
+            names = [username for username, _ in batch]
+            future = pool.submit(_hash_batch, [password for _, password in batch])
+            pending.append((names, future))
+            # не держим в очереди больше двух пачек на воркер
+            while len(pending) > workers * 2:
+                next_id = _collect(pending.pop(0), next_id, registered, new_users)
+        for item in pending:
+            next_id = _collect(item, next_id, registered, new_users)
+
+    if not new_users:
+        return new_users
+    users.extend(new_users)
+    save_users(users)
+    with portfolios_lock():
+        portfolios = load_portfolios()
+        portfolios.extend(
+            {"user_id": u.user_id, "wallets": {}, "version": 0} for u in new_users
+        )
+        save_portfolios(portfolios)
+    return new_users
+
+
+def _collect(item, next_id: int, registered: datetime, out: List[User]) -> int:
+    names, future = item
+    for username, hashed in zip(names, future.result()):
+        user = User.__new__(User)
+        # пароль уже захеширован воркером: заполняем поля без повторного хеширования
+        user._user_id = next_id  # noqa: SLF001
+        user._username = username  # noqa: SLF001
+        user._hashed_password = hashed  # noqa: SLF001
+        user._salt = DEFAULT_SALT  # noqa: SLF001
+        user._registration_date = registered  # noqa: SLF001
+        out.append(user)
+        next_id += 1
+    return next_id
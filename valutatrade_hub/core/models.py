@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 import hashlib
+from .currencies import from_minor_units, get_precision, to_minor_units
 
 """Класс User (пользователь системы)   """
 class User:
@@ -97,66 +98,171 @@ class User:
 
 """Класс Wallet (кошелёк пользователя для одной конкретной валюты)  """
 
+
+def _stored_units(code: str, data: dict) -> Optional[int]:
+    """units записи кошелька с проверкой точности, с которой они записаны.
+
+    Кошелёк хранится как {"units": целое, "scale": знаков}. Если точность
+    валюты в каталоге с тех пор поменялась, units нельзя молча перечитать
+    в новом масштабе — баланс изменился бы в 10**k раз, поэтому ошибка.
+    Записи без "scale" писались до его появления, в текущей точности.
+    """
+    units = data.get("units")
+    if units is None:
+        return None
+    precision = get_precision(code)
+    scale = data.get("scale", precision)
+    if int(scale) != precision:
+        raise ValueError(
+            f"Кошелёк {code} записан с точностью {scale} знаков, "
+            f"а в каталоге валют — {precision}"
+        )
+    return int(units)
+
+
+def wallet_units(code: str, data: Optional[dict]) -> int:
+    """Баланс записи кошелька в минимальных единицах валюты.
+
+    Старые записи {"balance": float} переводятся при чтении и переписываются
+    целыми при следующей сделке.
+    """
+    data = data or {}
+    units = _stored_units(code, data)
+    if units is not None:
+        return units
+    return to_minor_units(data.get("balance", 0.0), code)
+
+
+def wallet_balance(code: str, data: Optional[dict]) -> float:
+    """Баланс записи кошелька для вывода и оценок (без Decimal на горячем пути)."""
+    data = data or {}
+    units = _stored_units(code, data)
+    if units is not None:
+        return from_minor_units(units, code)
+    return float(data.get("balance", 0.0))
+
+
 class Wallet:
-    def __init__(self, currency_code: str, balance: float = 0.0) -> None:
+    """Баланс хранится целым числом минимальных единиц валюты (см. precision).
+
+    __slots__ вместо __dict__: при загрузке большого числа кошельков
+    экономит память, а целочисленная арифметика не накапливает ошибок float.
+    """
+
+    __slots__ = ("currency_code", "_units", "_precision", "_scale")
+
+    def __init__(
+        self,
+        currency_code: str,
+        balance: float = 0.0,
+        *,
+        units: int | None = None,
+    ) -> None:
         self.currency_code = currency_code
-        self._balance = 0.0
-        self.balance = balance
+        self._precision = get_precision(currency_code)
+        self._scale = 10 ** self._precision
+        self._units = 0
+        if units is not None:
+            self.units = units
+        else:
+            self.balance = balance
+
+    @classmethod
+    def from_record(cls, currency_code: str, data: Optional[dict]) -> "Wallet":
+        return cls(currency_code, units=wallet_units(currency_code, data))
+
+    def to_record(self) -> dict:
+        return {"units": self._units, "scale": self._precision}
 
     def deposit(self, amount: float) -> None:
         """Пополнение баланса."""
-        if not isinstance(amount, (int, float)):
-            raise TypeError("Сумма должна быть числом")
-        if amount <= 0:
-            raise ValueError("Сумма пополнения должна быть положительной")
-        self._balance += float(amount)
+        self.deposit_units(to_minor_units(amount, self.currency_code))
 
     def withdraw(self, amount: float) -> None:
         """Снятие средств, если хватает баланса."""
-        if not isinstance(amount, (int, float)):
-            raise TypeError("Сумма должна быть числом")
-        if amount <= 0:
+        self.withdraw_units(to_minor_units(amount, self.currency_code))
+
+    # --- быстрый путь для торговых циклов: только int, без конвертаций ---
+
+    def deposit_units(self, units: int) -> None:
+        if units <= 0:
+            raise ValueError("Сумма пополнения должна быть положительной")
+        self._units += units
+
+    def withdraw_units(self, units: int) -> None:
+        if units <= 0:
             raise ValueError("Сумма снятия должна быть положительной")
-        if amount > self._balance:
+        if units > self._units:
             raise ValueError("Недостаточно средств на балансе")
-        self._balance -= float(amount)
+        self._units -= units
 
     def get_balance_info(self) -> dict:
         """Информация о текущем балансе."""
         return {
             "currency_code": self.currency_code,
-            "balance": self._balance,
+            "balance": self.balance,
         }
 
+    @property
+    def units(self) -> int:
+        return self._units
+
+    @units.setter
+    def units(self, value: int) -> None:
+        if value < 0:
+            raise ValueError("Баланс не может быть отрицательным")
+        self._units = int(value)
+
     @property
     def balance(self) -> float:
-        return self._balance
+        return self._units / self._scale
 
     @balance.setter
     def balance(self, value: float) -> None:
-        if not isinstance(value, (int, float)):
-            raise TypeError("Баланс должен быть числом")
-        if value < 0:
+        units = to_minor_units(value, self.currency_code)
+        if units < 0:
             raise ValueError("Баланс не может быть отрицательным")
-        self._balance = float(value)
+        self._units = units
 
 """Класс Portfolio (управление всеми кошельками одного пользователя)  """
 
 class Portfolio:
+    """Кошельки пользователя; запись в portfolios — to_record()/from_record()."""
+
+    __slots__ = ("_user", "_user_id", "_wallets", "version")
+
     def __init__(
         self,
-        user: User,
+        user: User | int,
         wallets: Dict[str, Wallet] | None = None,
+        version: int = 0,
     ) -> None:
-        self._user = user
-        self._user_id = user.user_id
+        # use cases знают только user_id, объект User не обязателен
+        self._user = user if isinstance(user, User) else None
+        self._user_id = user.user_id if isinstance(user, User) else int(user)
         self._wallets: Dict[str, Wallet] = wallets or {}
+        self.version = version
+
+    @classmethod
+    def from_record(cls, record: dict) -> "Portfolio":
+        wallets = {
+            code: Wallet.from_record(code, data)
+            for code, data in (record.get("wallets") or {}).items()
+        }
+        return cls(record["user_id"], wallets, int(record.get("version", 0)))
+
+    def to_record(self) -> dict:
+        return {
+            "user_id": self._user_id,
+            "wallets": {code: w.to_record() for code, w in self._wallets.items()},
+            "version": self.version,
+        }
 
     # --- свойства ---
 
     @property
-    def user(self) -> User:
-        """Объект пользователя (без возможности перезаписи)."""
+    def user(self) -> Optional[User]:
+        """Объект пользователя (без возможности перезаписи), если он передан."""
         return self._user
 
     @property
@@ -166,8 +272,8 @@ class Portfolio:
     @property
     def wallets(self) -> Dict[str, Wallet]:
         """Копия словаря кошельков, чтобы снаружи не ломали внутреннее состояние."""
-        return self._wallets.copy()  
-        
+        return self._wallets.copy()
+
     # --- работа с кошельками ---
 
     def add_currency(self, currency_code: str) -> Wallet:
@@ -186,34 +292,15 @@ class Portfolio:
             raise KeyError(f"Кошелёк для валюты {code} не найден")
         return self._wallets[code]
 
-    def get_total_value(self, base_currency: str = "USD") -> float:
-        """Общая стоимость всех валют в указанной базовой валюте.
+    def get_total_value(self, rates: Dict[str, float]) -> float:
+        """Общая стоимость всех валют в базовой валюте.
 
-        Для учебных целей используем фиксированные курсы в словаре exchange_rates.
+        rates — {код: курс к базовой валюте}, например rates_to_base(base)
+        из analytics. Валюты без курса в сумму не входят.
         """
-        base = base_currency.upper()
-        
-        
-        # фиктивные курсы
-        exchange_rates: Dict[str, float] = {
-            "USD": 1.0,       
-            "EUR": 1.1,       
-            "BTC": 60000.0,   
-            "ETH": 3000.0,    
-        }
-
-        if base not in exchange_rates:
-            raise ValueError(f"Нет курса для базовой валюты {base}")
-
-        total_in_base = 0.0
+        total = 0.0
         for code, wallet in self._wallets.items():
-            rate_to_usd = exchange_rates.get(code)
-            if rate_to_usd is None:
-                # валюты без курса можно пропустить или обработать отдельно
-                continue
-            value_in_usd = wallet.balance * rate_to_usd
-            # если base != USD, конвертируем из USD в base
-            total_in_base += value_in_usd / exchange_rates[base]
-
-        return total_in_base
-
+            rate = rates.get(code)
+            if rate is not None:
+                total += wallet.balance * rate
+        return total
@@ -0,0 +1,351 @@
+"""Лимитные ордера: хранение в кучах по валютной паре и исполнение по курсу.
+
+Для каждой пары (например, BTC_USD) держим две кучи:
+- покупки — max-куча по лимиту (исполняются, когда курс опустился до лимита);
+- продажи — min-куча по лимиту (исполняются, когда курс поднялся до лимита).
+При обновлении курса снимаем с вершин только пересечённые ордера:
+O(k log n) на k исполненных ордеров вместо обхода всех открытых.
+Отменённые ордера из куч не удаляются, а пропускаются при снятии (lazy delete).
+
+Книга ордеров живёт в памяти процесса между вызовами. На диске:
+- orders.json — снимок открытых ордеров и номер текущего журнала;
+- orders.<N>.log — журнал изменений после снимка (строка JSON на событие:
+  размещение или закрытие ордера), изменения только дописываются;
+- orders_closed.ndjson — архив закрытых ордеров.
+Перед каждой операцией книга дочитывает хвост журнала, дописанный другими
+процессами, поэтому обновление курса стоит O(k log n + новые записи), а не
+разбор и перезапись всего файла. Когда закрытых ордеров накапливается
+COMPACT_AFTER, они уходят в архив, а снимок и журнал начинаются заново.
+Все изменения — под межпроцессной блокировкой file_lock(orders.json).
+"""
+
+from __future__ import annotations
+import heapq
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.exceptions import (
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+)
+from valutatrade_hub.core.usecases import buy_currency, sell_currency
+from valutatrade_hub.core.utils import ORDERS_FILE, load_orders, save_orders
+from valutatrade_hub.infra.file_lock import file_lock
+from valutatrade_hub.infra.journal import Journal
+
+SIDES = ("buy", "sell")
+TERMINAL = ("filled", "cancelled", "failed")
+
+# после стольких закрытых ордеров в памяти — перенос в архив и новый снимок
+COMPACT_AFTER = 256
+
+
+def _journal() -> Journal:
+    return Journal(ORDERS_FILE, load_orders, save_orders)
+
+
+@dataclass
+class LimitOrder:
+    order_id: int
+    user_id: int
+    side: str
+    currency: str
+    base: str
+    limit: float
+    amount: float
+    created_at: str
+    status: str = "open"  # open | filled | cancelled | failed
+    result: str = ""
+
+    @property
+    def pair(self) -> str:
+        return f"{self.currency}_{self.base}"
+
+
+class OrderBook:
+    """Открытые ордера в кучах по парам + ордера по id (до компактизации)."""
+
+    def __init__(
+        self,
+        orders: List[LimitOrder] | None = None,
+        next_id: int = 1,
+        journal: Optional[Journal] = None,
+    ) -> None:
+        self.orders: Dict[int, LimitOrder] = {}
+        self.next_id = next_id
+        self.journal = journal or _journal()
+        self.closed = 0
+        self._buys: Dict[str, list[tuple[float, int]]] = {}
+        self._sells: Dict[str, list[tuple[float, int]]] = {}
+        for order in orders or []:
+            self.orders[order.order_id] = order
+            if order.status == "open":
+                self._heap_for(order).append(self._heap_key(order))
+            else:
+                self.closed += 1
+        self._heapify()
+
+    @classmethod
+    def load(cls) -> "OrderBook":
+        journal = _journal()
+        raw = journal.load_snapshot()
+        orders = [LimitOrder(**item) for item in raw.get("orders", [])]
+        book = cls(orders, next_id=raw.get("next_id", 1), journal=journal)
+        book.replay()
+        return book
+
+    # --- журнал ---
+
+    def replay(self) -> None:
+        """Применить события, дописанные в журнал после прошлого чтения."""
+        for entry in self.journal.read_new():
+            self._apply(entry)
+
+    def _apply(self, entry: dict) -> None:
+        if entry["op"] == "place":
+            order = LimitOrder(**entry["order"])
+            if order.order_id not in self.orders:
+                self.add(order)
+            self.next_id = max(self.next_id, order.order_id + 1)
+        elif entry["op"] == "close":
+            order = self.orders.get(entry["order_id"])
+            if order is not None and order.status == "open":
+                order.status = entry["status"]
+                order.result = entry.get("result", "")
+                self.closed += 1
+
+    def append(self, entries: List[dict]) -> None:
+        """Дописать события в журнал и применить их к книге."""
+        self.journal.append(entries)
+        for entry in entries:
+            self._apply(entry)
+
+    def close(self, order: LimitOrder, status: str, result: str = "") -> None:
+        self.append(
+            [
+                {
+                    "op": "close",
+                    "order_id": order.order_id,
+                    "status": status,
+                    "result": result,
+                }
+            ]
+        )
+
+    def compact(self) -> None:
+        """Закрытые ордера — в архив; новый снимок открытых и пустой журнал."""
+        closed = [o for o in self.orders.values() if o.status in TERMINAL]
+        for order in closed:
+            del self.orders[order.order_id]
+        self.journal.compact(
+            {
+                "next_id": self.next_id,
+                "orders": [asdict(o) for o in self.orders.values()],
+            },
+            [asdict(o) for o in closed],
+        )
+        self.closed = 0
+        # убрать из куч ссылки на удалённые ордера
+        for heaps in (self._buys, self._sells):
+            for pair, heap in list(heaps.items()):
+                heaps[pair] = [key for key in heap if key[1] in self.orders]
+        self._heapify()
+
+    # --- кучи ---
+
+    def _heapify(self) -> None:
+        for heap in (*self._buys.values(), *self._sells.values()):
+            heapq.heapify(heap)
+
+    def _heap_for(self, order: LimitOrder) -> list[tuple[float, int]]:
+        heaps = self._buys if order.side == "buy" else self._sells
+        return heaps.setdefault(order.pair, [])
+
+    @staticmethod
+    def _heap_key(order: LimitOrder) -> tuple[float, int]:
+        # heapq — min-куча, поэтому для покупок лимит со знаком минус;
+        # order_id вторым ключом — при равных лимитах раньше исполняется старый
+        limit = -order.limit if order.side == "buy" else order.limit
+        return limit, order.order_id
+
+    def add(self, order: LimitOrder) -> None:
+        self.orders[order.order_id] = order
+        if order.status == "open":
+            heapq.heappush(self._heap_for(order), self._heap_key(order))
+        else:
+            self.closed += 1
+
+    def _pop_open(self, heap: list[tuple[float, int]]) -> Optional[LimitOrder]:
+        order = self.orders.get(heapq.heappop(heap)[1])
+        return order if order is not None and order.status == "open" else None
+
+    def pop_crossed(self, pair: str, rate: float) -> List[LimitOrder]:
+        """Снимает открытые ордера пары, лимит которых пересечён курсом."""
+        crossed: List[LimitOrder] = []
+
+        buys = self._buys.get(pair, [])
+        while buys and -buys[0][0] >= rate:
+            order = self._pop_open(buys)
+            if order is not None:
+                crossed.append(order)
+
+        sells = self._sells.get(pair, [])
+        while sells and sells[0][0] <= rate:
+            order = self._pop_open(sells)
+            if order is not None:
+                crossed.append(order)
+
+        crossed.sort(key=lambda o: o.order_id)
+        return crossed
+
+
+_book: Optional[OrderBook] = None
+
+
+def _current_book() -> OrderBook:
+    """Книга процесса, догнанная до файлов (вызывать под file_lock)."""
+    global _book
+    if _book is None or _book.journal.stale():
+        # первый вызов или другой процесс сделал компактизацию
+        _book = OrderBook.load()
+    else:
+        _book.replay()
+    return _book
+
+
+def _maybe_compact(book: OrderBook) -> None:
+    if book.closed >= COMPACT_AFTER:
+        book.compact()
+
+
+def reset_order_book() -> None:
+    """Забыть книгу в памяти (следующий вызов перечитает файлы)."""
+    global _book
+    _book = None
+
+
+def _iter_archive() -> Iterator[LimitOrder]:
+    for record in _journal().iter_archive():
+        yield LimitOrder(**record)
+
+
+def place_order(
+    user_id: int,
+    side: str,
+    currency_code: str,
+    limit: float,
+    amount: float,
+    base_currency: str = "USD",
+) -> Tuple[LimitOrder, str]:
+    """Размещение лимитного ордера. Возвращает (ордер, сообщение)."""
+    side = (side or "").lower()
+    if side not in SIDES:
+        raise ValueError("'side' должен быть buy или sell")
+
+    currency = get_currency(currency_code)
+    base = get_currency(base_currency or "USD")
+    if currency.code == base.code:
+        raise ValueError("Валюта ордера и базовая валюта должны отличаться")
+
+    try:
+        limit_value = float(limit)
+        amount_value = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' и 'amount' должны быть положительными числами")
+    if limit_value <= 0 or amount_value <= 0:
+        raise ValueError("'limit' и 'amount' должны быть положительными числами")
+
+    with file_lock(ORDERS_FILE):
+        book = _current_book()
+        order = LimitOrder(
+            order_id=book.next_id,
+            user_id=user_id,
+            side=side,
+            currency=currency.code,
+            base=base.code,
+            limit=limit_value,
+            amount=amount_value,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        book.append([{"op": "place", "order": asdict(order)}])
+
+    action = "покупку" if side == "buy" else "продажу"
+    msg = (
+        f"Ордер #{order.order_id} на {action} {amount_value:.4f} {currency.code} "
+        f"по лимиту {limit_value:,.2f} {base.code} размещён"
+    )
+    return order, msg
+
+
+def cancel_order(user_id: int, order_id: int) -> str:
+    with file_lock(ORDERS_FILE):
+        book = _current_book()
+        order = book.orders.get(order_id)
+        if order is None:
+            archived = next(
+                (o for o in _iter_archive() if o.order_id == order_id), None
+            )
+            if archived is not None and archived.user_id == user_id:
+                raise ValueError(
+                    f"Ордер #{order_id} уже закрыт (статус: {archived.status})"
+                )
+        if order is None or order.user_id != user_id:
+            raise ValueError(f"Ордер #{order_id} не найден")
+        if order.status != "open":
+            raise ValueError(
+                f"Ордер #{order_id} уже закрыт (статус: {order.status})"
+            )
+        book.close(order, "cancelled")
+        _maybe_compact(book)
+    return f"Ордер #{order_id} отменён"
+
+
+def list_orders(user_id: int, include_closed: bool = False) -> List[LimitOrder]:
+    with file_lock(ORDERS_FILE):
+        book = _current_book()
+        orders = [
+            o
+            for o in book.orders.values()
+            if o.user_id == user_id and (include_closed or o.status == "open")
+        ]
+    if include_closed:
+        orders.extend(o for o in _iter_archive() if o.user_id == user_id)
+        orders.sort(key=lambda o: o.order_id)
+    return orders
+
+
+def process_rate_update(rates: Dict[str, float]) -> List[Tuple[LimitOrder, str]]:
+    """Исполняет ордера, пересечённые новыми курсами вида {"BTC_USD": 59000.0}.
+
+    Сделки проходят через обычные buy_currency/sell_currency.
+    Возвращает [(ордер, сообщение_об_исполнении_или_ошибке)].
+    """
+    executed: List[Tuple[LimitOrder, str]] = []
+    # блокировка на всё исполнение: другой процесс, получивший тот же курс,
+    # дочитает журнал и увидит ордера уже закрытыми
+    with file_lock(ORDERS_FILE):
+        book = _current_book()
+        for pair, rate in rates.items():
+            for order in book.pop_crossed(pair, rate):
+                trade = buy_currency if order.side == "buy" else sell_currency
+                try:
+                    op_msg, _ = trade(
+                        user_id=order.user_id,
+                        currency_code=order.currency,
+                        amount=order.amount,
+                        base_currency=order.base,
+                    )
+                except (
+                    ValueError,
+                    InsufficientFundsError,
+                    CurrencyNotFoundError,
+                    ApiRequestError,
+                ) as exc:
+                    book.close(order, "failed", str(exc))
+                else:
+                    book.close(order, "filled", op_msg)
+                executed.append((order, order.result))
+        _maybe_compact(book)
+    return executed
@@ -0,0 +1,179 @@
+"""Цена сделок: курс из кэша rates.json и фиксированные котировки.
+
+Сделки никогда не обращаются к источнику курсов синхронно: цена берётся из
+кэша, который поддерживает get_rate (прямая пара или обратная к ней).
+Котировка фиксирует такой курс на quote_ttl_seconds секунд: клиент получает
+её id командой quote и исполняет по нему buy/sell — по той цене, которую
+видел. Котировка одноразовая и привязана к пользователю, валюте и базе.
+
+Курс из кэша старше rates_ttl_seconds для сделки не годится: его нужно
+обновить через get-rate. Котировка проверяется и гасится под
+file_lock(quotes.json) до записи портфеля (priced_trade), поэтому два
+параллельных buy с одной котировкой не исполнятся оба; если сделка
+не состоялась, котировка возвращается.
+"""
+
+from __future__ import annotations
+import secrets
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.utils import (
+    QUOTES_FILE,
+    is_rate_fresh,
+    load_quotes,
+    load_rates,
+    save_quotes,
+)
+from valutatrade_hub.infra.file_lock import file_lock
+from valutatrade_hub.infra.settings import SettingsLoader
+
+DEFAULT_QUOTE_TTL_SECONDS = 30
+
+
+@dataclass
+class Quote:
+    quote_id: str
+    user_id: int
+    currency: str
+    base: str
+    rate: float
+    rate_updated_at: str
+    created_at: str
+    expires_at: str
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return (now or datetime.now()) >= datetime.fromisoformat(self.expires_at)
+
+
+def cached_rate(currency_code: str, base: str) -> Tuple[float, str]:
+    """Курс currency→base из кэша: (курс, время_обновления).
+
+    Бросает ValueError, если в кэше нет ни пары, ни обратной к ней,
+    или курс старше rates_ttl_seconds.
+    """
+    if currency_code == base:
+        return 1.0, datetime.now().isoformat(timespec="seconds")
+
+    rates = load_rates()
+    found: Optional[Tuple[float, str]] = None
+    pair = rates.get(f"{currency_code}_{base}")
+    reverse = rates.get(f"{base}_{currency_code}")
+    if pair and pair.get("rate"):
+        found = float(pair["rate"]), pair.get("updated_at", "")
+    elif reverse and reverse.get("rate"):
+        found = 1.0 / float(reverse["rate"]), reverse.get("updated_at", "")
+
+    refresh = f"get-rate --from {currency_code} --to {base}"
+    if found is None:
+        raise ValueError(
+            f"Нет курса {currency_code}→{base} в кэше. Обновите его: {refresh}"
+        )
+    if not is_rate_fresh(found[1], max_age_minutes=_rates_ttl() // 60):
+        raise ValueError(
+            f"Курс {currency_code}→{base} устарел (обновлён {found[1] or '—'}). "
+            f"Обновите его: {refresh}"
+        )
+    return found
+
+
+def _rates_ttl() -> int:
+    settings = SettingsLoader()
+    return int(settings.get("rates_ttl_seconds", 300))
+
+
+def _quote_ttl() -> int:
+    settings = SettingsLoader()
+    return int(settings.get("quote_ttl_seconds", DEFAULT_QUOTE_TTL_SECONDS))
+
+
+def _load_active(now: datetime) -> dict:
+    """Неистёкшие котировки {id: dict}; истёкшие отбрасываются."""
+    raw = load_quotes().get("quotes", {})
+    return {
+        qid: item
+        for qid, item in raw.items()
+        if datetime.fromisoformat(item["expires_at"]) > now
+    }
+
+
+def create_quote(user_id: int, currency_code: str, base_currency: str = "USD") -> Quote:
+    currency = get_currency(currency_code)
+    base = get_currency(base_currency).code
+    rate, updated_at = cached_rate(currency.code, base)
+
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=_quote_ttl())
+    quote = Quote(
+        quote_id=secrets.token_hex(6),
+        user_id=user_id,
+        currency=currency.code,
+        base=base,
+        rate=rate,
+        rate_updated_at=updated_at,
+        created_at=now.isoformat(timespec="seconds"),
+        expires_at=expires_at.isoformat(timespec="seconds"),
+    )
+
+    with file_lock(QUOTES_FILE):
+        quotes = _load_active(now)
+        quotes[quote.quote_id] = asdict(quote)
+        save_quotes({"quotes": quotes})
+    return quote
+
+
+def get_quote(quote_id: str, user_id: int, currency_code: str, base: str) -> Quote:
+    """Действующая котировка пользователя для пары currency/base."""
+    item = load_quotes().get("quotes", {}).get(quote_id)
+    if item is None:
+        raise ValueError(f"Котировка '{quote_id}' не найдена или уже использована")
+
+    quote = Quote(**item)
+    if quote.user_id != user_id:
+        raise ValueError(f"Котировка '{quote_id}' не найдена или уже использована")
+    if quote.currency != currency_code or quote.base != base:
+        raise ValueError(
+            f"Котировка '{quote_id}' выдана для {quote.currency}/{quote.base}, "
+            f"а не для {currency_code}/{base}"
+        )
+    if quote.is_expired():
+        raise ValueError(
+            f"Котировка '{quote_id}' истекла в {quote.expires_at}. "
+            "Запросите новую: quote"
+        )
+    return quote
+
+
+@contextmanager
+def priced_trade(
+    user_id: int,
+    currency_code: str,
+    base: str,
+    quote_id: Optional[str] = None,
+) -> Iterator[float]:
+    """Курс сделки: из котировки, если она указана, иначе из кэша курсов.
+
+    Котировка проверяется и гасится под блокировкой quotes.json, которая
+    держится до конца блока with (записи портфеля). Исключение в блоке —
+    котировка возвращается и её можно использовать повторно.
+    """
+    if not quote_id:
+        rate, _ = cached_rate(currency_code, base)
+        yield rate
+        return
+
+    with file_lock(QUOTES_FILE):
+        quote = get_quote(quote_id, user_id, currency_code, base)
+        now = datetime.now()
+        quotes = _load_active(now)
+        quotes.pop(quote_id, None)
+        save_quotes({"quotes": quotes})
+        try:
+            yield quote.rate
+        except BaseException:
+            quotes = _load_active(now)
+            quotes[quote_id] = asdict(quote)
+            save_quotes({"quotes": quotes})
+            raise
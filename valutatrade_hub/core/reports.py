@@ -0,0 +1,181 @@
+"""Отчёт по журналу операций (actions.log и архивные партиции).
+
+Каждый несжатый файл отображается в память (mmap), и заранее
+скомпилированное регулярное выражение проходит по нему через finditer —
+строки не копируются в список и файл не читается целиком в память процесса.
+Сжатые партиции архива читаются потоково через gzip. Для интервала
+времени по индексу архива открываются только пересекающиеся партиции.
+Файлы обрабатываются параллельно в пуле процессов, частичные итоги
+складываются в один отчёт.
+"""
+
+from __future__ import annotations
+import gzip
+import mmap
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from valutatrade_hub.infra.log_archive import ARCHIVE_DIRNAME, select_partitions
+from valutatrade_hub.infra.settings import SettingsLoader
+
+# строка, которую пишет @log_action (см. decorators.py)
+_ACTION_RE = re.compile(
+    rb"^(?P<ts>(?P<date>\d{4}-\d{2}-\d{2})T\d{2}:\d{2}:\d{2})[^\n]*?"
+    rb" action=(?P<action>\w+)"
+    rb" user_id=(?P<user>\S+)"
+    rb" currency='(?P<currency>[^'\n]*)'"
+    rb" amount=(?P<amount>\S*)"
+    rb" base='[^'\n]*'"
+    rb" result=(?P<result>\w+)"
+    rb"(?: error_type=(?P<error>\w+))?",
+    re.MULTILINE,
+)
+
+
+@dataclass
+class ActionReport:
+    total: int = 0
+    errors: int = 0
+    # (дата, валюта) -> суммарный объём успешных операций
+    volume: Counter = field(default_factory=Counter)
+    trades: Counter = field(default_factory=Counter)
+    error_types: Counter = field(default_factory=Counter)
+    users: Counter = field(default_factory=Counter)
+    files: int = 0
+
+    def merge(self, other: "ActionReport") -> None:
+        self.total += other.total
+        self.errors += other.errors
+        self.volume.update(other.volume)
+        self.trades.update(other.trades)
+        self.error_types.update(other.error_types)
+        self.users.update(other.users)
+        self.files += other.files
+
+    def error_rates(self) -> List[Tuple[str, int, float]]:
+        """[(тип_ошибки, количество, доля_от_всех_операций)] по убыванию."""
+        if not self.total:
+            return []
+        return [
+            (name, count, count / self.total)
+            for name, count in self.error_types.most_common()
+        ]
+
+
+def _decode(value: bytes) -> str:
+    return value.decode("utf-8", errors="replace")
+
+
+def _iter_matches(path: str) -> Iterator[re.Match]:
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                m = _ACTION_RE.match(line)
+                if m:
+                    yield m
+        return
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _ACTION_RE.finditer(mm)
+
+
+def scan_log_file(
+    path: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> ActionReport:
+    """Однопроходная агрегация одного файла журнала (выполняется в воркере).
+
+    start/end — границы времени в ISO-формате (включительно).
+    """
+    report = ActionReport(files=1)
+    lo = start.encode() if start else None
+    hi = end.encode() if end else None
+    try:
+        for m in _iter_matches(path):
+            if (lo is not None and m["ts"] < lo) or (hi is not None and m["ts"] > hi):
+                continue
+            report.total += 1
+            report.users[_decode(m["user"])] += 1
+            if m["result"] != b"OK":
+                report.errors += 1
+                report.error_types[_decode(m["error"] or b"Unknown")] += 1
+                continue
+            try:
+                amount = float(m["amount"])
+            except ValueError:
+                continue
+            key = (_decode(m["date"]), _decode(m["currency"]))
+            report.volume[key] += amount
+            report.trades[key] += 1
+    except FileNotFoundError:
+        # партицию успели сжать и удалить между выбором файлов и чтением
+        report.files = 0
+    return report
+
+
+def _logs_dir() -> Path:
+    settings = SettingsLoader()
+    project_root = Path(settings.get("project_root", "."))
+    return project_root / settings.get("logs_dir", "logs")
+
+
+def find_log_files(
+    logs_dir: Path | None = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Path]:
+    """Активный actions.log (и копии actions.log.N) + подходящие партиции архива."""
+    logs_dir = logs_dir or _logs_dir()
+    files = sorted(p for p in logs_dir.glob("actions.log*") if p.is_file())
+    archive_dir = logs_dir / ARCHIVE_DIRNAME
+    if archive_dir.exists():
+        files.extend(select_partitions(archive_dir, start, end))
+    return files
+
+
+def build_report(
+    files: List[Path] | None = None,
+    workers: int | None = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> ActionReport:
+    """Сводный отчёт по файлам журнала за интервал [start, end]."""
+    files = find_log_files(start=start, end=end) if files is None else files
+    report = ActionReport()
+    if not files:
+        return report
+
+    paths = [str(p) for p in files]
+    scan = partial(
+        scan_log_file,
+        start=start.isoformat(timespec="seconds") if start else None,
+        end=end.isoformat(timespec="seconds") if end else None,
+    )
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        for path in paths:
+            report.merge(scan(path))
+        return report
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial_report in pool.map(scan, paths):
+            report.merge(partial_report)
+    return report
+
+
+def daily_volume(report: ActionReport) -> Dict[str, Dict[str, Tuple[float, int]]]:
+    """{дата: {валюта: (объём, число_сделок)}} в хронологическом порядке."""
+    result: Dict[str, Dict[str, Tuple[float, int]]] = {}
+    for (day, currency), volume in sorted(report.volume.items()):
+        result.setdefault(day, {})[currency] = (volume, report.trades[(day, currency)])
+    return result
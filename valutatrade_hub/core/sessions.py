@@ -0,0 +1,202 @@
+"""Сессии входа: подписанные токены с ограниченным сроком жизни.
+
+Токен имеет вид ``<session_id>.<user_id>.<истекает_unix>.<подпись>``, где
+подпись — HMAC-SHA256 первых трёх частей на секретном ключе из
+data/session_secret (создаётся при первом входе, права 0600). Проверка токена
+не читает users.json и не хеширует пароль: подпись, срок и поиск session_id
+в словаре активных сессий — O(1).
+
+Активные сессии хранятся в data/sessions.json; отзыв (logout) удаляет сессию
+оттуда, и токен перестаёт действовать во всех процессах — изменения файла
+подхватываются по его подписи (inode, размер, mtime), как у ключей
+идемпотентности. Чтение → изменение → запись sessions.json идёт под
+file_lock(sessions.json): иначе процесс, открывающий сессию, мог бы записать
+поверх чужого logout и «воскресить» отозванный токен. Ключ подписи создаётся
+под file_lock(session_secret), чтобы два процесса при первом запуске
+не записали разные ключи.
+
+Токен текущей сессии CLI лежит в data/current_session (или передаётся
+в переменной окружения VALUTATRADE_SESSION), поэтому одиночные вызовы
+``project <команда>`` не требуют повторного login.
+"""
+
+from __future__ import annotations
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from valutatrade_hub.infra.file_cache import file_signature
+from valutatrade_hub.infra.file_lock import file_lock
+from valutatrade_hub.infra.settings import SettingsLoader
+from .utils import DATA_DIR
+
+SESSIONS_FILE = DATA_DIR / "sessions.json"
+SESSION_SECRET_FILE = DATA_DIR / "session_secret"
+CURRENT_SESSION_FILE = DATA_DIR / "current_session"
+SESSION_ENV = "VALUTATRADE_SESSION"
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class Session:
+    session_id: str
+    user_id: int
+    username: str
+    expires_at: float
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) >= self.expires_at
+
+
+def _write_private(path: Path, text: str) -> None:
+    """Записать файл с правами 0600 (секрет, токен)."""
+    tmp = path.with_suffix(".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class SessionStore:
+    def __init__(self, path: Path, secret_path: Path, ttl_seconds: float) -> None:
+        self.path = path
+        self.secret_path = secret_path
+        self.ttl_seconds = ttl_seconds
+        self._sessions: Dict[str, Session] = {}
+        self._signature: Any = object()
+        self._secret: Optional[bytes] = None
+        self._lock = file_lock(path)
+
+    def _key(self) -> bytes:
+        if self._secret is None:
+            with file_lock(self.secret_path):
+                if not self.secret_path.exists():
+                    _write_private(self.secret_path, secrets.token_hex(32))
+                self._secret = bytes.fromhex(
+                    self.secret_path.read_text(encoding="utf-8").strip()
+                )
+        return self._secret
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._key(), payload.encode("ascii"), hashlib.sha256)
+        return digest.hexdigest()
+
+    def _sync(self) -> None:
+        """Перечитать файл, если его изменил другой процесс."""
+        signature = file_signature(self.path)
+        if signature == self._signature:
+            return
+        self._sessions.clear()
+        if signature is not None:
+            with self.path.open("r", encoding="utf-8") as f:
+                raw = json.load(f)
+            for item in raw.get("sessions", []):
+                session = Session(**item)
+                self._sessions[session.session_id] = session
+        self._signature = signature
+
+    def _save(self) -> None:
+        now = time.time()
+        payload = {
+            "sessions": [
+                asdict(s) for s in self._sessions.values() if not s.is_expired(now)
+            ]
+        }
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._signature = file_signature(self.path)
+
+    def issue(self, user_id: int, username: str) -> Tuple[str, Session]:
+        """Открыть сессию: (токен, сессия)."""
+        with self._lock:
+            self._sync()
+            session = Session(
+                session_id=secrets.token_urlsafe(12),
+                user_id=int(user_id),
+                username=username,
+                expires_at=float(int(time.time() + self.ttl_seconds)),
+            )
+            self._sessions[session.session_id] = session
+            self._save()
+        payload = f"{session.session_id}.{session.user_id}.{int(session.expires_at)}"
+        return f"{payload}.{self._sign(payload)}", session
+
+    def resolve(self, token: str) -> Session:
+        """Сессия по токену; ValueError — токен подделан, истёк или отозван."""
+        try:
+            session_id, user_id, expires_at, signature = token.split(".")
+            payload_user, payload_expires = int(user_id), float(expires_at)
+        except ValueError:
+            raise ValueError("Недействительный токен сессии") from None
+
+        expected = self._sign(f"{session_id}.{user_id}.{expires_at}")
+        if not hmac.compare_digest(expected, signature):
+            raise ValueError("Недействительный токен сессии")
+        if time.time() >= payload_expires:
+            raise ValueError("Сессия истекла, выполните login")
+
+        with self._lock:
+            self._sync()
+            session = self._sessions.get(session_id)
+        if session is None or session.user_id != payload_user:
+            raise ValueError("Сессия завершена, выполните login")
+        return session
+
+    def revoke(self, token: str) -> Session:
+        """Отозвать сессию по токену; возвращает отозванную сессию."""
+        with self._lock:
+            session = self.resolve(token)
+            self._sessions.pop(session.session_id, None)
+            self._save()
+        return session
+
+    def revoke_user(self, user_id: int) -> int:
+        """Отозвать все сессии пользователя; возвращает их число."""
+        with self._lock:
+            self._sync()
+            revoked = [
+                sid for sid, s in self._sessions.items() if s.user_id == user_id
+            ]
+            for sid in revoked:
+                del self._sessions[sid]
+            self._save()
+        return len(revoked)
+
+
+def _make_store() -> SessionStore:
+    settings = SettingsLoader()
+    return SessionStore(
+        SESSIONS_FILE,
+        SESSION_SECRET_FILE,
+        ttl_seconds=float(settings.get("session_ttl_seconds", DEFAULT_TTL_SECONDS)),
+    )
+
+
+session_store = _make_store()
+
+
+def load_current_token() -> Optional[str]:
+    """Токен текущей сессии CLI: из окружения или data/current_session."""
+    token = os.environ.get(SESSION_ENV)
+    if token:
+        return token.strip()
+    try:
+        return CURRENT_SESSION_FILE.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_current_token(token: str) -> None:
+    _write_private(CURRENT_SESSION_FILE, token)
+
+
+def clear_current_token() -> None:
+    CURRENT_SESSION_FILE.unlink(missing_ok=True)
@@ -0,0 +1,149 @@
+"""Стандартные подписчики доменных событий (см. events.py).
+
+Общая шина event_bus подключает их сама перед первой публикацией;
+install_subscribers(bus) нужен только для собственных шин. Синхронно
+остаются действия, от которых зависит следующий шаг пользователя или
+порядок записей: история сделок, исполнение лимитных ордеров, отметки
+изменившихся пользователей для audit и журнал операций (строки ошибок
+@log_action пишутся синхронно, и успешные сделки должны попадать в
+actions.log в том же порядке). Метрики, оповещения, очистка кэша оценок
+и приоритет торгуемых пар в бюджете обновлений курсов работают в фоновых
+потоках.
+
+Фоновые подписчики, которые пишут файлы, берут блокировку своего файла
+сами (alerts.json — file_lock, rate_budget.json — flock в RateBudget),
+поэтому не зависят от блокировок вызывающего кода.
+"""
+
+from __future__ import annotations
+import logging
+import threading
+from collections import Counter
+from valutatrade_hub.core.alerts import process_rate_change
+from valutatrade_hub.core.audit import mark_dirty
+from valutatrade_hub.core.events import (
+    EventBus,
+    RateUpdated,
+    TradeExecuted,
+    UserRegistered,
+    event_bus,
+)
+from valutatrade_hub.core.history import record_trade
+from valutatrade_hub.core.orders import process_rate_update
+from valutatrade_hub.core.valuation import valuation_cache
+from valutatrade_hub.decorators import format_action
+from valutatrade_hub.infra.rate_budget import get_rate_budget
+
+actions_logger = logging.getLogger("valutatrade.actions")
+
+# счётчики: trades.buy, volume.BTC, users.registered, rates.updated
+metrics: Counter = Counter()
+_metrics_lock = threading.Lock()
+
+_installed: set[int] = set()
+_install_lock = threading.Lock()
+
+
+# --- сделки ---
+
+def log_trade(event: TradeExecuted) -> None:
+    extra = f" details='{event.details}'" if event.details else ""
+    actions_logger.info(
+        format_action(
+            event.timestamp.isoformat(timespec="seconds"),
+            event.side.upper(),
+            event.user_id,
+            event.currency,
+            event.amount,
+            event.base,
+            "OK",
+            extra,
+        )
+    )
+
+
+def record_trade_history(event: TradeExecuted) -> None:
+    record_trade(
+        user_id=event.user_id,
+        side=event.side,
+        currency=event.currency,
+        amount=event.amount,
+        rate=event.rate,
+        balance_after=event.balance_after,
+        base=event.base,
+        timestamp=event.timestamp,
+    )
+
+
+def invalidate_user_valuations(event: TradeExecuted) -> None:
+    valuation_cache.invalidate_user(event.user_id)
+
+
+def prioritize_traded_pair(event: TradeExecuted) -> None:
+    get_rate_budget().mark_traded(f"{event.currency}_{event.base}")
+
+
+def mark_trader_dirty(event: TradeExecuted) -> None:
+    mark_dirty([event.user_id])
+
+
+def _count(key: str, amount: float = 1) -> None:
+    with _metrics_lock:
+        metrics[key] += amount
+
+
+def count_trade(event: TradeExecuted) -> None:
+    _count(f"trades.{event.side}")
+    _count(f"volume.{event.currency}", event.amount)
+
+
+# --- курсы ---
+
+def execute_limit_orders(event: RateUpdated) -> None:
+    process_rate_update(event.rates)
+
+
+def fire_alerts(event: RateUpdated) -> None:
+    process_rate_change(event.changes)
+
+
+def invalidate_rate_valuations(event: RateUpdated) -> None:
+    valuation_cache.invalidate_currencies(event.currencies)
+
+
+def count_rate_update(event: RateUpdated) -> None:
+    _count("rates.updated", len(event.rates))
+
+
+# --- пользователи ---
+
+def mark_registered_dirty(event: UserRegistered) -> None:
+    mark_dirty([event.user_id])
+
+
+def count_registration(event: UserRegistered) -> None:
+    _count("users.registered")
+
+
+def install_subscribers(bus: EventBus = event_bus) -> None:
+    """Подписать стандартные обработчики (повторный вызов ничего не делает)."""
+    with _install_lock:
+        if id(bus) in _installed:
+            return
+        _installed.add(id(bus))
+
+    bus.subscribe(TradeExecuted, record_trade_history, mode="inline")
+    # журнал audit должен быть полным к моменту следующей проверки
+    bus.subscribe(TradeExecuted, mark_trader_dirty, mode="inline")
+    bus.subscribe(TradeExecuted, log_trade, mode="inline")
+    bus.subscribe(TradeExecuted, invalidate_user_valuations, mode="thread")
+    bus.subscribe(TradeExecuted, count_trade, mode="thread")
+    bus.subscribe(TradeExecuted, prioritize_traded_pair, mode="thread")
+
+    bus.subscribe(RateUpdated, execute_limit_orders, mode="inline")
+    bus.subscribe(RateUpdated, fire_alerts, mode="thread")
+    bus.subscribe(RateUpdated, invalidate_rate_valuations, mode="thread")
+    bus.subscribe(RateUpdated, count_rate_update, mode="thread")
+
+    bus.subscribe(UserRegistered, mark_registered_dirty, mode="inline")
+    bus.subscribe(UserRegistered, count_registration, mode="thread")
@@ -1,23 +1,54 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import Tuple, Optional
+import heapq
+import logging
+from itertools import islice
+from typing import Iterator, Tuple, Optional
 from prettytable import PrettyTable
-from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.currencies import (
+    CryptoCurrency,
+    get_currency,
+    list_currencies as list_catalog,
+    to_minor_units,
+    from_minor_units,
+)
+from valutatrade_hub.core.events import (
+    RateUpdated,
+    TradeExecuted,
+    UserRegistered,
+    event_bus,
+)
+from valutatrade_hub.core.idempotency import idempotent
+from valutatrade_hub.core.quotes import priced_trade
 from valutatrade_hub.core.exceptions import (InsufficientFundsError, ApiRequestError)
-from valutatrade_hub.core.models import User, Portfolio, Wallet
+from valutatrade_hub.core.analytics import rates_to_base
+from valutatrade_hub.core.models import Portfolio, User, wallet_balance
 from valutatrade_hub.core.utils import (
     load_users,
+    iter_users,
     save_users,
-    load_portfolios,
-    save_portfolios,
+    find_portfolio,
+    save_portfolio,
+    portfolios_lock,
+    users_lock,
     load_rates,
+    rates_lock,
     save_rates,
     is_rate_fresh,
 )
+from valutatrade_hub.core.valuation import (
+    bump_portfolio_version,
+    portfolio_version,
+    rates_signature,
+    valuation_cache,
+)
+from valutatrade_hub.infra.providers import get_fetcher
+from valutatrade_hub.infra.rate_budget import get_rate_budget
 from valutatrade_hub.infra.settings import SettingsLoader
 from valutatrade_hub.decorators import log_action
 
 settings = SettingsLoader()
+logger = logging.getLogger("valutatrade.rates")
 
 
 def register_user(username: str, password: str) -> Tuple[User, str]:
@@ -31,40 +62,35 @@ def register_user(username: str, password: str) -> Tuple[User, str]:
     if len(password) < 4:
         raise ValueError("Пароль должен быть не короче 4 символов")
 
-    users = load_users()
-
-    # 1. Проверить уникальность username
-    for u in users:
-        if u.username == username:
-            raise ValueError(f"Имя пользователя '{username}' уже занято")
-
-    # 2. Сгенерировать user_id (автоинкремент)
-    next_id = 1
-    if users:
-        next_id = max(u.user_id for u in users) + 1
-
-    # 3. Создать пользователя
-    salt = "static_salt_for_now"
-    user = User(
-        user_id=next_id,
-        username=username,
-        password=password,
-        salt=salt,
-        registration_date=datetime.now(),
-    )
+    with users_lock():
+        users = load_users()
+
+        # 1. Проверить уникальность username
+        for u in users:
+            if u.username == username:
+                raise ValueError(f"Имя пользователя '{username}' уже занято")
+
+        # 2. Сгенерировать user_id (автоинкремент)
+        next_id = 1
+        if users:
+            next_id = max(u.user_id for u in users) + 1
+
+        # 3. Создать пользователя
+        salt = "static_salt_for_now"
+        user = User(
+            user_id=next_id,
+            username=username,
+            password=password,
+            salt=salt,
+            registration_date=datetime.now(),
+        )
 
-    users.append(user)
-    save_users(users)
+        users.append(user)
+        save_users(users)
 
     # 5. Создать пустой портфель
-    portfolios = load_portfolios()
-    portfolios.append(
-        {
-            "user_id": user.user_id,
-            "wallets": {},
-        }
-    )
-    save_portfolios(portfolios)
+    save_portfolio({"user_id": user.user_id, "wallets": {}, "version": 0})
+    event_bus.publish(UserRegistered(user_id=user.user_id, username=username))
 
     message = (
         f"Пользователь '{username}' зарегистрирован (id={user.user_id}). "
@@ -79,10 +105,8 @@ def login_user(username: str, password: str) -> Tuple[User, str]:
     if not password:
         raise ValueError("Пароль не может быть пустым")
 
-    users = load_users()
-
     found: Optional[User] = None
-    for u in users:
+    for u in iter_users():
         if u.username == username:
             found = u
             break
@@ -97,15 +121,32 @@ def login_user(username: str, password: str) -> Tuple[User, str]:
     return found, msg
 
 
-def show_portfolio(user_id: int, base_currency: str = "USD") -> Tuple[str, float]:
-    """Возвращает текст таблицы портфеля и итоговую стоимость в базовой валюте."""
-    base = base_currency.upper()
+SORT_KEYS = ("value", "balance", "code")
 
-    portfolios = load_portfolios()
-    portfolio_dict = next(
-        (p for p in portfolios if p["user_id"] == user_id),
-        None,
-    )
+
+def show_portfolio(
+    user_id: int,
+    base_currency: str = "USD",
+    sort: str | None = None,
+    top: int | None = None,
+    page: int | None = None,
+    per_page: int = 20,
+) -> Tuple[str, float, int]:
+    """Таблица портфеля, итоговая стоимость в базовой валюте и число страниц.
+
+    sort: value | balance (по убыванию) или code; без sort — порядок кошельков.
+    top: только top лучших строк; page: страница по per_page строк.
+    Без top и page выводятся все кошельки.
+    """
+    base = get_currency(base_currency).code
+    if sort is not None and sort not in SORT_KEYS:
+        raise ValueError(f"Сортировка: {', '.join(SORT_KEYS)}")
+    if (top is not None and top <= 0) or per_page <= 0:
+        raise ValueError("'--top' и '--per-page' должны быть положительными")
+    if page is not None and page <= 0:
+        raise ValueError("'--page' должен быть положительным")
+
+    portfolio_dict = find_portfolio(user_id)
     if portfolio_dict is None:
         raise ValueError("Портфель пользователя не найден")
 
@@ -113,38 +154,128 @@ def show_portfolio(user_id: int, base_currency: str = "USD") -> Tuple[str, float
     if not wallets_data:
         raise ValueError("У пользователя пока нет ни одного кошелька")
 
-    # временно формируем объект Portfolio с фиктивным User (нужен только user_id)
-    dummy_user = type("DummyUser", (), {"user_id": user_id})
-    portfolio = Portfolio(user=dummy_user, wallets={})
-
-    # создаём Wallet-ы из json
-    for code, data in wallets_data.items():
-        wallet = Wallet(currency_code=code, balance=float(data.get("balance", 0.0)))
-        portfolio._wallets[code] = wallet  # noqa: SLF001
+    rates = load_rates()
+    # Оценка не менялась, если не было сделок и не обновлялись нужные курсы
+    cache_key = (
+        user_id,
+        base,
+        portfolio_version(portfolio_dict),
+        rates_signature(wallets_data, base, rates),
+        sort,
+        top,
+        page,
+        per_page,
+    )
+    cached = valuation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    to_base = rates_to_base(base, rates)
+    total = 0.0
+
+    def rows() -> Iterator[Tuple[str, float, Optional[float]]]:
+        # один проход: строки отдаются выборке, итог копится попутно
+        nonlocal total
+        for code, data in wallets_data.items():
+            balance = wallet_balance(code, data)
+            rate = to_base.get(code)
+            value = balance * rate if rate is not None else None
+            if value is not None:
+                total += value
+            yield code, balance, value
+
+    count = len(wallets_data)
+    limit = min(top, count) if top is not None else count
+    pages = max(1, -(-limit // per_page)) if page is not None else 1
+    if page is not None and page > pages:
+        raise ValueError(f"Страница {page} вне диапазона (всего страниц: {pages})")
+    # строк до конца нужной страницы включительно
+    needed = min(limit, page * per_page) if page is not None else limit
+
+    if sort == "value":
+        selected = heapq.nlargest(
+            needed, rows(), key=lambda r: r[2] if r[2] is not None else float("-inf")
+        )
+    elif sort == "balance":
+        selected = heapq.nlargest(needed, rows(), key=lambda r: r[1])
+    elif sort == "code":
+        selected = heapq.nsmallest(needed, rows(), key=lambda r: r[0])
+    else:
+        iterator = rows()
+        selected = list(islice(iterator, needed))
+        for _ in iterator:  # дочитываем ради итога
+            pass
 
-    total = portfolio.get_total_value(base_currency=base)
+    if page is not None:
+        selected = selected[(page - 1) * per_page :]
 
     table = PrettyTable(["Валюта", "Баланс", f"Стоимость в {base}"])
+    for code, balance, value in selected:
+        table.add_row([code, balance, "—" if value is None else round(value, 2)])
+
+    result = (table.get_string(), total, pages)
+    valuation_cache.put(cache_key, result, user_id=user_id, codes=wallets_data)
+    return result
+
+
+def list_currencies(
+    kind: str | None = None,
+    search: str | None = None,
+    page: int = 1,
+    per_page: int = 20,
+) -> Tuple[str, int, int]:
+    """Страница каталога валют.
+
+    Возвращает (текст_таблицы, всего_найдено, всего_страниц).
+    """
+    if kind not in (None, "fiat", "crypto"):
+        raise ValueError("'type' должен быть fiat или crypto")
+    if page < 1 or per_page < 1:
+        raise ValueError("'page' и 'per-page' должны быть положительными числами")
+
+    found = list_catalog(kind=kind, search=search)
+    total = len(found)
+    pages = max(1, -(-total // per_page))
+    if page > pages:
+        raise ValueError(f"Страница {page} вне диапазона (всего страниц: {pages})")
+
+    table = PrettyTable(["Код", "Тип", "Название", "Точность", "Детали"])
+    table.align["Название"] = "l"
+    table.align["Детали"] = "l"
+    start = (page - 1) * per_page
+    for currency in found[start : start + per_page]:
+        if isinstance(currency, CryptoCurrency):
+            kind_label = "crypto"
+            details = f"{currency.algorithm}, MCAP {currency.market_cap:.2e}"
+        else:
+            kind_label = "fiat"
+            details = currency.issuing_country
+        table.add_row(
+            [currency.code, kind_label, currency.name, currency.precision, details]
+        )
+
+    return table.get_string(), total, pages
 
-    # здесь для упрощения считаем, что base = USD и курс 1:1
-    for code, wallet in portfolio.wallets.items():
-        balance = wallet.balance
-        value_in_base = balance  # позже заменится расчётом по реальным курсам
-        table.add_row([code, balance, value_in_base])
 
-    return table.get_string(), total
+def _format_rate(rate: float) -> str:
+    # курсы вида 0.0000168 не должны печататься как 0.00
+    return f"{rate:,.2f}" if rate >= 1 else f"{rate:.8f}"
 
 
-@log_action("BUY", verbose=True)
+@idempotent("BUY")
+@log_action("BUY", verbose=True, log_success=False)
 def buy_currency(
     user_id: int,
     currency_code: str,
     amount: float,
     base_currency: str = "USD",
+    quote_id: Optional[str] = None,
 ) -> Tuple[str, str]:
     """Покупка валюты.
 
     Возвращает (сообщение_об_операции, сообщение_об_изменениях_портфеля).
+    С idempotency_key=... повтор запроса возвращает исходный результат.
+    Цена — из кэша курсов или из котировки quote_id (см. quotes.py).
     """
     # валюта через реестр (бросает CurrencyNotFoundError при неизвестном коде)
     currency = get_currency(currency_code)
@@ -158,38 +289,46 @@ def buy_currency(
     if amount_value <= 0:
         raise ValueError("'amount' должен быть положительным числом")
 
+    # Сумма в минимальных единицах валюты: дальше считаем только целыми
+    amount_units = to_minor_units(amount, currency.code)
+    if amount_units <= 0:
+        raise ValueError(
+            f"'amount' меньше минимальной единицы {currency.code} "
+            f"(точность {currency.precision} знаков)"
+        )
+
     base = (base_currency or settings.get("base_currency", "USD")).upper()
 
-    # Безопасное чтение→модификация→запись портфелей
-    portfolios = load_portfolios()
-    portfolio_dict = next(
-        (p for p in portfolios if p["user_id"] == user_id),
-        None,
-    )
-    if portfolio_dict is None:
-        raise ValueError("Портфель пользователя не найден")
+    # Курс из кэша/котировки, без синхронного обращения к источнику курсов;
+    # котировка гасится в том же блоке, что и запись портфеля
+    price = priced_trade(user_id, currency.code, base, quote_id)
 
-    wallets = portfolio_dict.setdefault("wallets", {})
+    # Безопасное чтение→модификация→запись портфелей
+    with portfolios_lock(), price as rate:
+        # find_portfolio отдаёт копию: без save_portfolio изменения не видны
+        record = find_portfolio(user_id)
+        if record is None:
+            raise ValueError("Портфель пользователя не найден")
+        portfolio = Portfolio.from_record(record)
 
-    # Автосоздание кошелька при отсутствии
-    wallet_data = wallets.get(currency.code)
-    if wallet_data is None:
-        wallets[currency.code] = {"balance": 0.0}
-        wallet_data = wallets[currency.code]
+        # Автосоздание кошелька при отсутствии
+        if currency.code not in portfolio.wallets:
+            portfolio.add_currency(currency.code)
+        wallet = portfolio.get_wallet(currency.code)
 
-    old_balance = float(wallet_data.get("balance", 0.0))
-    new_balance = old_balance + amount_value
-    wallet_data["balance"] = new_balance
+        old_balance = wallet.balance
+        wallet.deposit_units(amount_units)
+        new_balance = wallet.balance
 
-    # Пока заглушка курса: 1:1 к базовой валюте
-    rate = 1.0
-    estimated_cost = amount_value * rate
+        estimated_cost = amount_value * rate
 
-    save_portfolios(portfolios)
+        record = portfolio.to_record()
+        bump_portfolio_version(record)
+        save_portfolio(record)
 
     operation_msg = (
         f"Покупка выполнена: {amount_value:.4f} {currency.code} "
-        f"({currency.name}) по курсу {rate:.2f} {base}/{currency.code}"
+        f"({currency.name}) по курсу {_format_rate(rate)} {base}/{currency.code}"
     )
     changes_msg = (
         "Изменения в портфеле:\n"
@@ -197,19 +336,37 @@ def buy_currency(
         f"Оценочная стоимость покупки: {estimated_cost:,.2f} {base}"
     )
 
+    # история, журнал, кэш оценок — подписчики события (см. subscribers.py)
+    event_bus.publish(
+        TradeExecuted(
+            user_id=user_id,
+            side="buy",
+            currency=currency.code,
+            base=base,
+            amount=from_minor_units(amount_units, currency.code),
+            rate=rate,
+            balance_after=new_balance,
+            details=changes_msg,
+        )
+    )
+
     return operation_msg, changes_msg
 
 
-@log_action("SELL", verbose=True)
+@idempotent("SELL")
+@log_action("SELL", verbose=True, log_success=False)
 def sell_currency(
     user_id: int,
     currency_code: str,
     amount: float,
     base_currency: str = "USD",
+    quote_id: Optional[str] = None,
 ) -> Tuple[str, str]:
     """Продажа валюты.
 
     Возвращает (сообщение_об_операции, сообщение_об_изменениях_портфеля).
+    С idempotency_key=... повтор запроса возвращает исходный результат.
+    Цена — из кэша курсов или из котировки quote_id (см. quotes.py).
     """
     # Валидация валюты через реестр
     currency = get_currency(currency_code)
@@ -223,49 +380,56 @@ def sell_currency(
     if amount_value <= 0:
         raise ValueError("'amount' должен быть положительным числом")
 
-    base = (base_currency or settings.get("base_currency", "USD")).upper()
-
-    # Безопасное чтение→модификация→запись портфелей
-    portfolios = load_portfolios()
-    portfolio_dict = next(
-        (p for p in portfolios if p["user_id"] == user_id),
-        None,
-    )
-    if portfolio_dict is None:
-        raise ValueError("Портфель пользователя не найден")
-
-    wallets = portfolio_dict.get("wallets") or {}
-
-    wallet_data = wallets.get(currency.code)
-    if wallet_data is None:
-        # кошелёк отсутствует — сообщаем пользователю
+    amount_units = to_minor_units(amount, currency.code)
+    if amount_units <= 0:
         raise ValueError(
-            f"У вас нет кошелька '{currency.code}'. "
-            "Добавьте валюту: она создаётся автоматически при первой покупке."
-        )
-
-    old_balance = float(wallet_data.get("balance", 0.0))
-
-    # Проверка средств — иначе InsufficientFundsError
-    if amount_value > old_balance:
-        raise InsufficientFundsError(
-            available=old_balance,
-            required=amount_value,
-            code=currency.code,
+            f"'amount' меньше минимальной единицы {currency.code} "
+            f"(точность {currency.precision} знаков)"
         )
 
-    new_balance = old_balance - amount_value
-    wallet_data["balance"] = new_balance
+    base = (base_currency or settings.get("base_currency", "USD")).upper()
 
-    # Заглушка курса: 1:1 к базовой валюте 
-    rate = 1.0
-    estimated_income = amount_value * rate
+    # Курс из кэша/котировки, без синхронного обращения к источнику курсов;
+    # котировка гасится в том же блоке, что и запись портфеля
+    price = priced_trade(user_id, currency.code, base, quote_id)
 
-    save_portfolios(portfolios)
+    # Безопасное чтение→модификация→запись портфелей
+    with portfolios_lock(), price as rate:
+        # find_portfolio отдаёт копию: без save_portfolio изменения не видны
+        record = find_portfolio(user_id)
+        if record is None:
+            raise ValueError("Портфель пользователя не найден")
+        portfolio = Portfolio.from_record(record)
+
+        if currency.code not in portfolio.wallets:
+            # кошелёк отсутствует — сообщаем пользователю
+            raise ValueError(
+                f"У вас нет кошелька '{currency.code}'. "
+                "Добавьте валюту: она создаётся автоматически при первой покупке."
+            )
+        wallet = portfolio.get_wallet(currency.code)
+        old_balance = wallet.balance
+
+        # Проверка средств — иначе InsufficientFundsError
+        if amount_units > wallet.units:
+            raise InsufficientFundsError(
+                available=old_balance,
+                required=amount_value,
+                code=currency.code,
+            )
+
+        wallet.withdraw_units(amount_units)
+        new_balance = wallet.balance
+
+        estimated_income = amount_value * rate
+
+        record = portfolio.to_record()
+        bump_portfolio_version(record)
+        save_portfolio(record)
 
     operation_msg = (
         f"Продажа выполнена: {amount_value:.4f} {currency.code} "
-        f"({currency.name}) по курсу {rate:.2f} {base}/{currency.code}"
+        f"({currency.name}) по курсу {_format_rate(rate)} {base}/{currency.code}"
     )
     changes_msg = (
         "Изменения в портфеле:\n"
@@ -273,9 +437,39 @@ def sell_currency(
         f"Оценочная выручка: {estimated_income:,.2f} {base}"
     )
 
+    # история, журнал, кэш оценок — подписчики события (см. subscribers.py)
+    event_bus.publish(
+        TradeExecuted(
+            user_id=user_id,
+            side="sell",
+            currency=currency.code,
+            base=base,
+            amount=from_minor_units(amount_units, currency.code),
+            rate=rate,
+            balance_after=new_balance,
+            details=changes_msg,
+        )
+    )
+
     return operation_msg, changes_msg
 
 
+def _cached_pair(
+    rates: dict, pair_key: str, reverse_key: str
+) -> Optional[Tuple[float, float, str]]:
+    """Курс пары из кэша без проверки свежести; None — пары в кэше нет."""
+    pair = rates.get(pair_key)
+    if not (pair and "rate" in pair and "updated_at" in pair):
+        return None
+    rate_forward = float(pair["rate"])
+    rev = rates.get(reverse_key)
+    if rev and "rate" in rev:
+        rate_reverse = float(rev["rate"])
+    else:
+        rate_reverse = 1.0 / rate_forward if rate_forward != 0 else 0.0
+    return rate_forward, rate_reverse, pair["updated_at"]
+
+
 def get_rate(from_currency: str, to_currency: str) -> Tuple[float, float, str]:
     """Получить курс from→to и обратный курс to→from.
 
@@ -299,39 +493,69 @@ def get_rate(from_currency: str, to_currency: str) -> Tuple[float, float, str]:
     # Используем TTL из SettingsLoader
     ttl_sec = int(settings.get("rates_ttl_seconds", 300))
 
-    pair = rates.get(pair_key)
-    if pair and "rate" in pair and "updated_at" in pair:
-        # если курс свежий — отдаем из кеша
-        if is_rate_fresh(pair["updated_at"], max_age_minutes=ttl_sec // 60):
-            rate_forward = float(pair["rate"])
-            updated_at = pair["updated_at"]
-            rev = rates.get(reverse_key)
-            if rev and "rate" in rev:
-                rate_reverse = float(rev["rate"])
-            else:
-                rate_reverse = 1.0 / rate_forward if rate_forward != 0 else 0.0
-            return rate_forward, rate_reverse, updated_at
-
-    # Кеш устарел или отсутствует — «обновляем» через заглушку Parser Service
-    now = datetime.now().isoformat(timespec="seconds")
-    if from_code == "USD" and to_code == "BTC":
-        rate_forward = 0.00001685
-    elif from_code == "BTC" and to_code == "USD":
-        rate_forward = 59337.21
-    else:
-        # данных нет — считаем, что API недоступно/не даёт нужную пару
+    cached = _cached_pair(rates, pair_key, reverse_key)
+    # если курс свежий — отдаем из кеша
+    if cached is not None and is_rate_fresh(cached[2], max_age_minutes=ttl_sec // 60):
+        return cached
+
+    # Общий для всех процессов бюджет обращений к источнику; при исчерпании —
+    # устаревший курс из кэша, если он есть
+    if not get_rate_budget().try_acquire(pair_key):
+        if cached is not None:
+            logger.warning(
+                "Бюджет обновлений курсов исчерпан: %s отдан из кэша от %s",
+                pair_key,
+                cached[2],
+            )
+            return cached
         raise ApiRequestError(
-            f"Курс {from_code}→{to_code} недоступен. Повторите попытку позже."
+            f"лимит обновлений курсов исчерпан, а курса {from_code}→{to_code} "
+            "в кэше нет. Повторите попытку позже."
         )
 
-    rate_reverse = 1.0 / rate_forward if rate_forward != 0 else 0.0
+    # Кеш устарел или отсутствует — запрос к источникам с дедлайном и
+    # хеджированием; если ни один не ответил — устаревший курс из кэша
+    try:
+        rate_forward, source = get_fetcher().fetch(from_code, to_code)
+    except ApiRequestError as exc:
+        if cached is None:
+            raise
+        logger.warning(
+            "Источники курсов недоступны (%s): %s отдан из кэша от %s",
+            exc.reason,
+            pair_key,
+            cached[2],
+        )
+        return cached
 
-    rates[pair_key] = {"rate": rate_forward, "updated_at": now}
-    rates[reverse_key] = {"rate": rate_reverse, "updated_at": now}
-    rates["source"] = "ParserService"
-    rates["last_refresh"] = now
+    now = datetime.now().isoformat(timespec="seconds")
+    rate_reverse = 1.0 / rate_forward if rate_forward != 0 else 0.0
 
-    save_rates(rates)
+    # запрос к источникам шёл без блокировки: пока он длился, другой поток
+    # или процесс мог обновить другие пары, поэтому файл перечитывается
+    # под блокировкой и в него вливается только своя пара
+    with rates_lock():
+        rates = load_rates()
+        # старые значения нужны оповещениям: срабатывают пороги между old и new
+        changes = {}
+        for key, new_rate in ((pair_key, rate_forward), (reverse_key, rate_reverse)):
+            old = rates.get(key)
+            if old and "rate" in old:
+                changes[key] = (float(old["rate"]), new_rate)
+
+        rates[pair_key] = {"rate": rate_forward, "updated_at": now}
+        rates[reverse_key] = {"rate": rate_reverse, "updated_at": now}
+        rates["source"] = source
+        rates["last_refresh"] = now
+        save_rates(rates)
+
+    # лимитные ордера, оповещения и кэш оценок — подписчики события
+    event_bus.publish(
+        RateUpdated(
+            rates={pair_key: rate_forward, reverse_key: rate_reverse},
+            changes=changes,
+        )
+    )
 
     return rate_forward, rate_reverse, now
 
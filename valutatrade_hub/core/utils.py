@@ -1,82 +1,278 @@
 from __future__ import annotations
 import json
+import os
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional
 from .models import User
+from valutatrade_hub.infra.file_cache import session_cache
+from valutatrade_hub.infra.file_lock import FileLock, file_lock
+from valutatrade_hub.infra.serializers import Serializer, get_serializer
 from valutatrade_hub.infra.settings import SettingsLoader
 
 settings = SettingsLoader()
 
 BASE_DIR = Path(__file__).resolve().parents[2]
-DATA_DIR = BASE_DIR / "data"
+PROJECT_ROOT = Path(settings.get("project_root", BASE_DIR))
+DATA_DIR = PROJECT_ROOT / settings.get("data_dir", "data")
 USERS_FILE = DATA_DIR / "users.json"
 PORTFOLIOS_FILE = DATA_DIR / "portfolios.json"
 RATES_FILE = DATA_DIR / "rates.json"
-PROJECT_ROOT = Path(settings.get("project_root"))
-DATA_DIR = PROJECT_ROOT / settings.get("data_dir", "data")
+ORDERS_FILE = DATA_DIR / "orders.json"
+ALERTS_FILE = DATA_DIR / "alerts.json"
+QUOTES_FILE = DATA_DIR / "quotes.json"
+HISTORY_DIR = DATA_DIR / "history"
+
+
+def _serializer() -> Serializer:
+    return get_serializer(settings.get("storage_format", "json"))
+
+
+def _users_path(serializer: Serializer) -> Path:
+    return DATA_DIR / f"users{serializer.suffix}"
+
+
+def _portfolios_path(serializer: Serializer) -> Path:
+    return DATA_DIR / f"portfolios{serializer.suffix}"
+
+
+def _user_from_record(item: dict) -> User:
+    user = User(
+        user_id=item["user_id"],
+        username=item["username"],
+        password="stub",
+        salt=item["salt"],
+        registration_date=datetime.fromisoformat(item["registration_date"]),
+    )
+    user._hashed_password = item["hashed_password"]  # noqa: SLF001
+    return user
+
+
+def _user_to_record(u: User) -> dict:
+    info = u.get_user_info()
+    return {
+        "user_id": info["user_id"],
+        "username": info["username"],
+        "hashed_password": u._hashed_password,  # noqa: SLF001
+        "salt": u.salt,
+        "registration_date": info["registration_date"],
+    }
+
+
+def users_lock() -> FileLock:
+    """Межпроцессная блокировка файла users (чтение → изменение → запись)."""
+    return file_lock(_users_path(_serializer()))
+
+
+def portfolios_lock() -> FileLock:
+    """Межпроцессная блокировка файла portfolios (чтение → изменение → запись)."""
+    return file_lock(_portfolios_path(_serializer()))
+
+
+def rates_lock() -> FileLock:
+    """Межпроцессная блокировка rates.json (чтение → слияние пары → запись)."""
+    return file_lock(RATES_FILE)
+
+
+def iter_users() -> Iterator[User]:
+    """Пользователи по одному; в формате ndjson — с постоянным расходом памяти."""
+    serializer = _serializer()
+    for item in serializer.iter(_users_path(serializer)):
+        yield _user_from_record(item)
+
+
+def iter_user_records() -> Iterator[dict]:
+    """Записи users как есть (без построения User и хеширования пароля)."""
+    serializer = _serializer()
+    yield from serializer.iter(_users_path(serializer))
+
+
+def select_user_records(user_ids: set[int]) -> Iterator[tuple[int, dict]]:
+    """(номер записи, запись) users только для этих user_id."""
+    serializer = _serializer()
+    yield from serializer.select(_users_path(serializer), user_ids)
+
+
+def storage_paths() -> tuple[Path, Path]:
+    """Файлы users и portfolios в текущем формате хранения."""
+    serializer = _serializer()
+    return _users_path(serializer), _portfolios_path(serializer)
+
 
 def load_users() -> List[User]:
-    if not USERS_FILE.exists():
-        return []
-
-    with USERS_FILE.open("r", encoding="utf-8") as f:
-        raw = json.load(f)
-
-    users: List[User] = []
-    for item in raw:
-        user = User(
-            user_id=item["user_id"],
-            username=item["username"],
-            password="stub",
-            salt=item["salt"],
-            registration_date=datetime.fromisoformat(item["registration_date"]),
-        )
-        user._hashed_password = item["hashed_password"]  # noqa: SLF001
-        users.append(user)
-    return users
+    serializer = _serializer()
+    path = _users_path(serializer)
+    return [_user_from_record(item) for item in serializer.iter(path)]
+
+
+def find_user(user_id: int) -> Optional[User]:
+    """Пользователь по id (в ndjson — seek по индексу); копия из рабочего набора."""
+    serializer = _serializer()
+    path = _users_path(serializer)
+
+    def load() -> Optional[User]:
+        item = serializer.find(path, user_id)
+        return _user_from_record(item) if item is not None else None
+
+    return session_cache.get(path, load, key=user_id)
 
 
 def save_users(users: List[User]) -> None:
-    data = []
-    for u in users:
-        info = u.get_user_info()
-        data.append(
-            {
-                "user_id": info["user_id"],
-                "username": info["username"],
-                "hashed_password": u._hashed_password,  # noqa: SLF001
-                "salt": u.salt,
-                "registration_date": info["registration_date"],
-            }
-        )
+    serializer = _serializer()
+    path = _users_path(serializer)
+    records = [_user_to_record(u) for u in users]
+    with file_lock(path):
+        session_cache.write(path, lambda: serializer.dump(path, records))
+
 
-    with USERS_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+def iter_portfolios() -> Iterator[dict]:
+    """Портфели по одному (для проходов по всей базе)."""
+    serializer = _serializer()
+    yield from serializer.iter(_portfolios_path(serializer))
+
+
+def select_portfolios(user_ids: set[int]) -> Iterator[tuple[int, dict]]:
+    """(номер записи, портфель) только для этих user_id."""
+    serializer = _serializer()
+    yield from serializer.select(_portfolios_path(serializer), user_ids)
 
 
 def load_portfolios() -> list[dict]:
-    if not PORTFOLIOS_FILE.exists():
-        return []
-    with PORTFOLIOS_FILE.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    serializer = _serializer()
+    return serializer.load(_portfolios_path(serializer))
+
+
+def find_portfolio(user_id: int) -> Optional[dict]:
+    """Копия портфеля пользователя (первое вхождение).
+
+    В ndjson не разбирает весь файл; в сессии берётся из рабочего набора.
+    Изменённый портфель сохраняется через save_portfolio.
+    """
+    serializer = _serializer()
+    path = _portfolios_path(serializer)
+    return session_cache.get(path, lambda: serializer.find(path, user_id), key=user_id)
+
+
+def save_portfolio(portfolio: dict) -> None:
+    """Записать портфель одного пользователя (заменить первое вхождение или добавить).
+
+    Портфели остальных пользователей в рабочем наборе остаются действительными.
+    """
+    serializer = _serializer()
+    path = _portfolios_path(serializer)
+    user_id = portfolio["user_id"]
+    with file_lock(path):
+        records: list[dict] = []
+        replaced = False
+        for record in serializer.iter(path):
+            if not replaced and record.get("user_id") == user_id:
+                record = portfolio
+                replaced = True
+            records.append(record)
+        if not replaced:
+            records.append(portfolio)
+        session_cache.write(
+            path,
+            lambda: serializer.dump(path, records),
+            updates={user_id: portfolio},
+            changed=[user_id],
+        )
 
 
 def save_portfolios(portfolios: list[dict]) -> None:
-    with PORTFOLIOS_FILE.open("w", encoding="utf-8") as f:
-        json.dump(portfolios, f, ensure_ascii=False, indent=4)
-        
-        
-def load_rates() -> dict:
+    serializer = _serializer()
+    path = _portfolios_path(serializer)
+    with file_lock(path):
+        session_cache.write(path, lambda: serializer.dump(path, portfolios))
+
+
+def convert_storage(target_format: str) -> tuple[int, int]:
+    """Конвертирует users.json и portfolios.json в другой формат хранения.
+
+    Возвращает (число_пользователей, число_портфелей).
+    """
+    source = get_serializer("json")
+    target = get_serializer(target_format)
+    users = source.load(_users_path(source))
+    portfolios = source.load(_portfolios_path(source))
+    target.dump(_users_path(target), users)
+    target.dump(_portfolios_path(target), portfolios)
+    return len(users), len(portfolios)
+
+
+def _read_rates() -> dict:
     if not RATES_FILE.exists():
         return {}
     with RATES_FILE.open("r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def load_rates() -> dict:
+    return session_cache.get(RATES_FILE, _read_rates)
+
+
 def save_rates(rates: dict) -> None:
-    with RATES_FILE.open("w", encoding="utf-8") as f:
-        json.dump(rates, f, ensure_ascii=False, indent=4)
+    def write() -> None:
+        tmp = RATES_FILE.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(rates, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, RATES_FILE)
+
+    with rates_lock():
+        session_cache.write(RATES_FILE, write, updates={"all": rates})
+
+
+def start_session_cache() -> None:
+    """Держать рабочий набор сессии в памяти: запись пользователя, портфель, rates."""
+    session_cache.enable()
+
+
+def stop_session_cache() -> None:
+    session_cache.disable()
+
+
+def load_orders() -> dict:
+    if not ORDERS_FILE.exists():
+        return {}
+    with ORDERS_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_orders(orders: dict) -> None:
+    # атомарная замена: снимок читают другие процессы (см. core/orders.py)
+    tmp = ORDERS_FILE.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(orders, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, ORDERS_FILE)
+
+
+def load_alerts() -> dict:
+    if not ALERTS_FILE.exists():
+        return {}
+    with ALERTS_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_alerts(alerts: dict) -> None:
+    # атомарная замена: снимок читают другие процессы (см. core/alerts.py)
+    tmp = ALERTS_FILE.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(alerts, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, ALERTS_FILE)
+
+
+def load_quotes() -> dict:
+    if not QUOTES_FILE.exists():
+        return {}
+    with QUOTES_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_quotes(quotes: dict) -> None:
+    tmp = QUOTES_FILE.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(quotes, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, QUOTES_FILE)
 
 
 def is_rate_fresh(updated_at: str, max_age_minutes: int = 5) -> bool:
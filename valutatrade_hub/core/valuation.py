@@ -0,0 +1,115 @@
+"""Кэш оценок портфеля для show-portfolio.
+
+Ключ записи — (user_id, базовая валюта, версия портфеля, версия курсов,
+параметры вывода: сортировка, top, страница).
+Версия портфеля — счётчик ``version`` в записи портфеля, его увеличивает
+каждая сделка. Версия курсов — (курс, время обновления) для пар
+«валюта кошелька → базовая», то есть только тех курсов, что пользователь
+держит. Поэтому устаревшая запись просто не находится, даже если данные
+поменял другой процесс.
+
+Дополнительно кэш точечно очищается: сделка удаляет записи своего
+пользователя, обновление курса — записи держателей этой валюты.
+"""
+
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Set, Tuple
+
+# сколько оценок держать в памяти (LRU)
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def portfolio_version(portfolio: dict) -> int:
+    return int(portfolio.get("version", 0))
+
+
+def bump_portfolio_version(portfolio: dict) -> None:
+    """Вызывается при каждом изменении кошельков портфеля."""
+    portfolio["version"] = portfolio_version(portfolio) + 1
+
+
+def rates_signature(codes: Iterable[str], base: str, rates: dict) -> Tuple:
+    """Версия курсов, от которых зависит оценка портфеля в base."""
+    signature = []
+    for code in sorted(codes):
+        # прямая пара и обратная (по ней оценивается, если прямой нет)
+        for key in (f"{code}_{base}", f"{base}_{code}"):
+            entry = rates.get(key) or {}
+            signature.append((key, entry.get("rate"), entry.get("updated_at")))
+    return tuple(signature)
+
+
+class ValuationCache:
+    """LRU-кэш оценок с обратными индексами по пользователям и валютам."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Tuple[str, ...]]]" = (
+            OrderedDict()
+        )
+        self._by_user: Dict[int, Set[Hashable]] = {}
+        self._holders: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(
+        self, key: Hashable, value: Any, user_id: int, codes: Iterable[str]
+    ) -> None:
+        codes = tuple(codes)
+        with self._lock:
+            self._entries[key] = (value, user_id, codes)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            for code in codes:
+                self._holders.setdefault(code, set()).add(user_id)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget_key(old_key)
+
+    def _forget_key(self, key: Hashable) -> None:
+        # user_id — первый элемент ключа
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Сделка пользователя: его оценки устарели."""
+        with self._lock:
+            for key in self._by_user.pop(user_id, set()):
+                self._entries.pop(key, None)
+
+    def invalidate_currencies(self, codes: Iterable[str]) -> None:
+        """Обновились курсы: сбрасываем оценки всех, кто держит эти валюты."""
+        users: Set[int] = set()
+        with self._lock:
+            for code in codes:
+                users |= self._holders.pop(code, set())
+        for user_id in users:
+            self.invalidate_user(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._holders.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+valuation_cache = ValuationCache()
@@ -5,7 +5,27 @@ from datetime import datetime
 logger = logging.getLogger("valutatrade.actions")
 
 
-def log_action(action: str, verbose: bool = False):
+def format_action(
+    ts: str,
+    action: str,
+    user_id,
+    currency_code,
+    amount,
+    base_currency,
+    result: str,
+    extra: str = "",
+) -> str:
+    """Строка журнала операций (её разбирает core/reports.py)."""
+    return (
+        f"{ts} action={action} user_id={user_id} "
+        f"currency='{currency_code}' amount={amount} base='{base_currency}' "
+        f"result={result}{extra}"
+    )
+
+
+def log_action(action: str, verbose: bool = False, log_success: bool = True):
+    """log_success=False — успешный результат журналирует подписчик события."""
+
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -21,19 +41,24 @@ def log_action(action: str, verbose: bool = False):
                 result = func(*args, **kwargs)
             except Exception as exc:
                 logger.info(
-                    f"{ts} action={action} user_id={user_id} "
-                    f"currency='{currency_code}' amount={amount} base='{base_currency}' "
-                    f"result=ERROR error_type={type(exc).__name__} error_message='{exc}'"
+                    format_action(
+                        ts, action, user_id, currency_code, amount, base_currency,
+                        "ERROR",
+                        f" error_type={type(exc).__name__} error_message='{exc}'",
+                    )
                 )
                 raise
             else:
+                if not log_success:
+                    return result
                 extra = ""
                 if verbose and isinstance(result, tuple) and len(result) == 2:
                     extra = f" details='{result[1]}'"
                 logger.info(
-                    f"{ts} action={action} user_id={user_id} "
-                    f"currency='{currency_code}' amount={amount} base='{base_currency}' "
-                    f"result=OK{extra}"
+                    format_action(
+                        ts, action, user_id, currency_code, amount, base_currency,
+                        "OK", extra,
+                    )
                 )
                 return result
 
@@ -0,0 +1,37 @@
+"""Атомарная замена файла: запись во временный файл рядом и os.replace.
+
+Читатели users/portfolios и индексов не берут блокировок, поэтому файл
+нельзя переписывать на месте: открытый на запись (и усечённый) файл
+читатель увидел бы наполовину записанным. Временный файл создаётся в том
+же каталоге (os.replace атомарен только в пределах одной файловой системы)
+и с уникальным именем — индекс ndjson пересобирают и читатели, без
+блокировки файла данных.
+"""
+
+from __future__ import annotations
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w") -> Iterator[IO]:
+    """Файл для записи, который заменит path только при успешном выходе."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # своё имя у каждого потока каждого процесса
+    tmp = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        encoding = None if "b" in mode else "utf-8"
+        with open(tmp, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
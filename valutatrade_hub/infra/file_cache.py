@@ -0,0 +1,125 @@
+"""Рабочий набор сессии: разобранные записи файлов данных в памяти.
+
+Кэш держит только то, с чем работает вошедший пользователь: его запись
+users, его портфель (ключ — user_id) и rates.json. Запись кэша привязана
+к «подписи» файла (inode, размер, mtime_ns); перед выдачей подпись
+сверяется с os.stat, и если файл изменил другой процесс, запись будет
+перечитана.
+
+Кэш отдаёт и принимает копии (copy.deepcopy), поэтому use case может
+свободно менять полученный портфель: если сохранение не состоится или
+упадёт, в кэше останутся прежние данные.
+
+Запись файла идёт через write() под file_lock(путь): подпись до и после
+записи снимается внутри блокировки, так что между ними файл не мог
+изменить никто другой. Записи остальных пользователей, которых запись не
+касалась, получают новую подпись и остаются в кэше.
+"""
+
+from __future__ import annotations
+import copy
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class StatCache:
+    def __init__(self) -> None:
+        self.enabled = False
+        self._entries: Dict[Tuple[Path, Hashable], Tuple[Signature, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == path]:
+                del self._entries[entry_key]
+
+    def peek(self, path: Path, key: Hashable = "all") -> Any:
+        """Копия значения, если оно ещё соответствует файлу; иначе None."""
+        if not self.enabled:
+            return None
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get((path, key))
+            if entry is None or entry[0] != signature:
+                return None
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def get(self, path: Path, loader: Callable[[], Any], key: Hashable = "all") -> Any:
+        """Копия значения из кэша или результат loader() с запоминанием."""
+        if not self.enabled:
+            return loader()
+        value = self.peek(path, key)
+        if value is not None:
+            return value
+        # подпись снимаем до чтения: если файл поменяется во время загрузки,
+        # следующая проверка это заметит
+        signature = file_signature(path)
+        value = loader()
+        with self._lock:
+            self.misses += 1
+            self._entries[(path, key)] = (signature, copy.deepcopy(value))
+        return value
+
+    def write(
+        self,
+        path: Path,
+        writer: Callable[[], None],
+        updates: Optional[Dict[Hashable, Any]] = None,
+        changed: Optional[Iterable[Hashable]] = None,
+    ) -> None:
+        """Записать файл через writer() и обновить кэш (вызывать под file_lock).
+
+        updates — новые значения записей кэша; changed — ключи, которые
+        запись могла изменить (None — любые). Остальные записи, снятые
+        с файла в его состоянии до записи, остаются действительными.
+        Если writer() упал, все записи файла сбрасываются.
+        """
+        updates = updates or {}
+        before = file_signature(path)
+        try:
+            writer()
+        except BaseException:
+            self.invalidate(path)
+            raise
+        if not self.enabled:
+            return
+        after = file_signature(path)
+        touched = None if changed is None else set(changed) | set(updates)
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == path]:
+                signature, value = self._entries.pop(entry_key)
+                kept = touched is not None and entry_key[1] not in touched
+                if kept and before is not None and signature == before:
+                    self._entries[entry_key] = (after, value)
+            for key, value in updates.items():
+                self._entries[(path, key)] = (after, copy.deepcopy(value))
+
+
+session_cache = StatCache()
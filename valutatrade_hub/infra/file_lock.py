@@ -0,0 +1,73 @@
+"""Межпроцессная блокировка файлов данных (fcntl.flock на файле ``*.lock``).
+
+CLI, HTTP API и воркеры работают с одними файлами в data/, поэтому
+чтение → изменение → запись файла делается под file_lock(путь_к_данным).
+Блокировка повторно входимая внутри потока: вложенный with только
+увеличивает счётчик, flock берётся один раз на самом внешнем уровне
+(повторный flock на другом дескрипторе того же файла заблокировал бы
+процесс сам на себе).
+
+Без fcntl (Windows) остаётся блокировка только внутри процесса.
+"""
+
+from __future__ import annotations
+import threading
+from pathlib import Path
+from typing import Dict, IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._handle: Optional[IO[str]] = None
+
+    def __enter__(self) -> "FileLock":
+        self._lock.acquire()
+        try:
+            if self._depth == 0:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = self.path.open("a")
+                if fcntl is not None:
+                    fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX)
+            self._depth += 1
+        except BaseException:
+            if self._depth == 0 and self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._handle is not None:
+            if fcntl is not None:
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._lock.release()
+
+
+_locks: Dict[Path, FileLock] = {}
+_locks_guard = threading.Lock()
+
+
+def lock_path(path: Path) -> Path:
+    return path.with_name(path.name + ".lock")
+
+
+def file_lock(path: Path) -> FileLock:
+    """Блокировка для файла данных path (один объект на файл в процессе)."""
+    key = lock_path(Path(path).resolve())
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = FileLock(key)
+        return lock
@@ -0,0 +1,101 @@
+"""Снимок + дописываемый журнал событий (ордера, оповещения).
+
+Состояние хранится в двух файлах:
+- снимок ``<name>.json`` (его читает/пишет переданная пара load/save) с номером
+  поколения журнала;
+- журнал ``<name>.<поколение>.log`` — строка JSON на событие, только дописывается.
+
+Владелец держит состояние в памяти и перед каждой операцией дочитывает хвост
+журнала с запомненного смещения (read_new), так что изменение стоит O(1)
+записи, а не перезапись всего файла. compact() записывает новый снимок,
+начинает пустой журнал следующего поколения и переносит закрытые записи
+в архив ``<name>_closed.ndjson``. Другой процесс замечает компактизацию по
+изменившейся подписи снимка (stale) и перечитывает его.
+
+Вызывать под file_lock(снимок): журнал не защищён от параллельной записи.
+"""
+
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List
+from valutatrade_hub.infra.file_cache import Signature, file_signature
+
+
+class Journal:
+    def __init__(
+        self,
+        snapshot: Path,
+        load: Callable[[], dict],
+        save: Callable[[dict], None],
+    ) -> None:
+        self.snapshot = snapshot
+        self.archive = snapshot.with_name(f"{snapshot.stem}_closed.ndjson")
+        self._load = load
+        self._save = save
+        self.generation = 0
+        self.offset = 0
+        self.signature: Signature = None
+
+    def log_path(self, generation: int | None = None) -> Path:
+        gen = self.generation if generation is None else generation
+        return self.snapshot.with_name(f"{self.snapshot.stem}.{gen}.log")
+
+    def load_snapshot(self) -> dict:
+        """Прочитать снимок и встать в начало его журнала."""
+        raw = self._load()
+        self.generation = int(raw.get("generation", 0))
+        self.offset = 0
+        self.signature = file_signature(self.snapshot)
+        return raw
+
+    def stale(self) -> bool:
+        """Снимок переписан другим процессом (компактизация)."""
+        return self.signature != file_signature(self.snapshot)
+
+    def read_new(self) -> Iterator[dict]:
+        """События, дописанные после последнего прочитанного."""
+        try:
+            f = self.log_path().open("rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # недописанная строка (сбой при записи)
+                self.offset += len(line)
+                if line.strip():
+                    yield json.loads(line)
+
+    def append(self, entries: Iterable[dict]) -> None:
+        payload = "".join(
+            json.dumps(e, ensure_ascii=False) + "\n" for e in entries
+        ).encode("utf-8")
+        if not payload:
+            return
+        with self.log_path().open("ab") as f:
+            f.write(payload)
+        self.offset += len(payload)
+
+    def compact(self, state: dict, closed: List[dict]) -> None:
+        """Новый снимок state, пустой журнал, закрытые записи — в архив."""
+        old_log = self.log_path()
+        self.generation += 1
+        self.log_path().write_bytes(b"")
+        self._save({**state, "generation": self.generation})
+        if closed:
+            with self.archive.open("a", encoding="utf-8") as f:
+                for record in closed:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        old_log.unlink(missing_ok=True)
+        self.offset = 0
+        self.signature = file_signature(self.snapshot)
+
+    def iter_archive(self) -> Iterator[dict]:
+        if not self.archive.exists():
+            return
+        with self.archive.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
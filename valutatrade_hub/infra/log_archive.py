@@ -0,0 +1,191 @@
+"""Архив журнала операций: почасовые партиции, gzip и индекс диапазонов времени.
+
+Активный файл остаётся ``logs/actions.log``. При смене партиции (по умолчанию
+раз в час) он переносится в ``logs/archive/actions-<начало>.log`` и сжимается
+в фоновом потоке в ``.log.gz``. Во время сжатия определяется диапазон
+времени записей; он добавляется в ``logs/archive/index.json``, так что запрос
+за интервал открывает только пересекающиеся с ним партиции.
+
+actions.log пишут несколько процессов (CLI, HTTP API), и у каждого свой
+обработчик с таймером ротации. Поэтому запись строки и ротация идут под
+file_lock(actions.log): партицию переносит первый процесс, дошедший до
+границы, остальные видят, что она уже есть, и только переоткрывают файл
+(обработчик сверяет inode открытого файла с путём перед каждой записью).
+Сжатие и изменение индекса — под file_lock(index.json): партицию сжимает
+тот процесс, который первым взял блокировку, остальные её уже не находят.
+"""
+
+from __future__ import annotations
+import gzip
+import json
+import os
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging.handlers import TimedRotatingFileHandler
+from pathlib import Path
+from typing import List, Optional
+from valutatrade_hub.infra.file_lock import file_lock
+
+ARCHIVE_DIRNAME = "archive"
+INDEX_FILENAME = "index.json"
+
+_TS_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})")
+
+# один фоновый поток на процесс: сжатие не блокирует запись логов,
+# а при выходе интерпретатора concurrent.futures дожидается его завершения
+_COMPRESSOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-gzip")
+
+# суффикс имени, под которым TimedRotatingFileHandler «видит» партицию
+_PENDING_SUFFIX = ".rotating"
+
+
+def _index_path(archive_dir: Path) -> Path:
+    return archive_dir / INDEX_FILENAME
+
+
+def load_index(archive_dir: Path) -> list[dict]:
+    path = _index_path(archive_dir)
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f).get("partitions", [])
+
+
+def _append_to_index(archive_dir: Path, entry: dict) -> None:
+    with file_lock(_index_path(archive_dir)):
+        partitions = [
+            p for p in load_index(archive_dir) if p["file"] != entry["file"]
+        ]
+        partitions.append(entry)
+        partitions.sort(key=lambda p: p["start"] or "")
+        tmp = _index_path(archive_dir).with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"partitions": partitions}, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, _index_path(archive_dir))
+
+
+def compress_partition(path: Path) -> Optional[dict]:
+    """Сжимает закрытую партицию в .gz, удаляет исходник и пополняет индекс.
+
+    None — партицию уже сжал другой процесс.
+    """
+    with file_lock(_index_path(path.parent)):
+        if not path.exists():
+            return None
+        return _compress(path)
+
+
+def _compress(path: Path) -> dict:
+    gz_path = path.with_name(path.name + ".gz")
+    start: Optional[bytes] = None
+    end: Optional[bytes] = None
+    lines = 0
+    with path.open("rb") as src, gzip.open(gz_path, "wb") as dst:
+        for line in src:
+            dst.write(line)
+            lines += 1
+            m = _TS_RE.match(line)
+            if m:
+                ts = m.group(1)
+                if start is None or ts < start:
+                    start = ts
+                if end is None or ts > end:
+                    end = ts
+    path.unlink()
+
+    entry = {
+        "file": gz_path.name,
+        "start": start.decode() if start else None,
+        "end": end.decode() if end else None,
+        "lines": lines,
+    }
+    _append_to_index(path.parent, entry)
+    return entry
+
+
+class PartitionedFileHandler(TimedRotatingFileHandler):
+    """TimedRotatingFileHandler, который складывает партиции в архив и сжимает их.
+
+    Старые партиции не удаляются (backupCount=0): история хранится
+    полностью, но в сжатом виде.
+    """
+
+    def __init__(self, filename: str | Path, when: str = "H", **kwargs) -> None:
+        super().__init__(filename, when=when, backupCount=0, **kwargs)
+        self.archive_dir = Path(self.baseFilename).parent / ARCHIVE_DIRNAME
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.namer = self._archive_name
+        self.rotator = self._rotate_and_compress
+        # партиции, не сжатые в прошлый раз (например, после аварийного выхода)
+        for path in sorted(self.archive_dir.glob("*.log")):
+            _COMPRESSOR.submit(compress_partition, path)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        with file_lock(Path(self.baseFilename)):
+            self._reopen_if_moved()
+            super().emit(record)
+
+    def _reopen_if_moved(self) -> None:
+        """Файл ротировал другой процесс — пишем в новый actions.log."""
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = self._open()
+
+    def _archive_name(self, default_name: str) -> str:
+        # actions.log.2026-02-11_21 -> archive/actions-2026-02-11_21.log;
+        # doRollover удаляет существующий файл с этим именем, поэтому отдаём
+        # ему имя-заявку, а настоящее выбирает _rotate_and_compress
+        base = Path(self.baseFilename)
+        suffix = default_name[len(self.baseFilename) + 1 :]
+        name = f"{base.stem}-{suffix}{base.suffix}.{os.getpid()}{_PENDING_SUFFIX}"
+        return str(self.archive_dir / name)
+
+    def _rotate_and_compress(self, source: str, pending: str) -> None:
+        # вызывается из emit, то есть под file_lock(actions.log)
+        dest = Path(pending.rsplit(".", 2)[0])  # без ".<pid>.rotating"
+        gz_dest = dest.with_name(dest.name + ".gz")
+        if not os.path.exists(source) or dest.exists() or gz_dest.exists():
+            return  # эту партицию уже перенёс другой процесс
+        os.replace(source, dest)
+        if dest.stat().st_size == 0:
+            dest.unlink()
+            return
+        _COMPRESSOR.submit(compress_partition, dest)
+
+
+def select_partitions(
+    archive_dir: Path,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Path]:
+    """Архивные партиции, диапазон времени которых пересекает [start, end].
+
+    Несжатые партиции (сжатие ещё идёт или прервалось) в индексе отсутствуют
+    и возвращаются всегда.
+    """
+    lo = start.isoformat(timespec="seconds") if start else None
+    hi = end.isoformat(timespec="seconds") if end else None
+
+    selected: List[Path] = []
+    for entry in load_index(archive_dir):
+        if entry["start"] is None:
+            continue
+        if hi is not None and entry["start"] > hi:
+            continue
+        if lo is not None and entry["end"] < lo:
+            continue
+        path = archive_dir / entry["file"]
+        if path.exists():
+            selected.append(path)
+
+    selected.extend(sorted(archive_dir.glob("*.log")))
+    return selected
+
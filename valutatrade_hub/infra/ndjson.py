@@ -0,0 +1,192 @@
+"""Построчный формат хранения (NDJSON): одна запись — одна строка.
+
+Рядом с файлом данных лежит индекс ``<файл>.idx`` со смещениями строк по
+ключу (user_id), поэтому поиск одной записи — это seek + readline, а полный
+проход по файлу идёт генератором без загрузки всего массива в память.
+
+Файл данных и индекс заменяются атомарно (atomic_open), индекс — после
+файла данных: читатель без блокировки видит либо старую, либо новую
+версию, а индекс с чужой сигнатурой просто пересобирается.
+"""
+
+from __future__ import annotations
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+from valutatrade_hub.infra.atomic_file import atomic_open
+
+
+def index_path(path: Path) -> Path:
+    """Путь к индексу смещений для файла данных."""
+    return path.with_name(path.name + ".idx")
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """Потоково отдаёт записи файла по одной."""
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def split_ranges(path: Path, parts: int) -> list[tuple[int, int]]:
+    """Делит файл на parts байтовых диапазонов по границам строк.
+
+    Диапазоны можно читать независимо (например, в разных процессах).
+    """
+    size = path.stat().st_size if path.exists() else 0
+    if size == 0:
+        return []
+    parts = max(1, min(parts, size))
+    bounds = [0]
+    with path.open("rb") as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()  # дочитываем до конца текущей строки
+            pos = min(f.tell(), size)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def iter_range(path: Path, start: int, end: int) -> Iterator[dict]:
+    """Записи, строки которых начинаются в [start, end)."""
+    for _, record in iter_range_with_offsets(path, start, end):
+        yield record
+
+
+def iter_range_with_offsets(
+    path: Path, start: int, end: int
+) -> Iterator[tuple[int, dict]]:
+    """(смещение строки, запись) для строк, начинающихся в [start, end)."""
+    with path.open("rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield offset, json.loads(line)
+
+
+def iter_selected(
+    path: Path, values: set[int], key: str = "user_id"
+) -> Iterator[tuple[int, dict]]:
+    """(номер записи, запись) только для записей, у которых key из values.
+
+    Целочисленный ключ достаётся из строки регулярным выражением, и
+    json.loads вызывается лишь для выбранных строк: остальные записи
+    не разбираются. Номер считается по всем непустым строкам файла.
+    """
+    if not path.exists():
+        return
+    pattern = re.compile(rb'"%s"\s*:\s*(-?\d+)\s*[,}]' % re.escape(key.encode()))
+    number = 0
+    with path.open("rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            match = pattern.search(line)
+            if match is None or int(match.group(1)) in values:
+                record = json.loads(line)
+                if int(record.get(key) or 0) in values:
+                    yield number, record
+            number += 1
+
+
+def _iter_with_offsets(path: Path) -> Iterator[tuple[int, dict]]:
+    with path.open("rb") as f:
+        offset = f.tell()
+        for line in iter(f.readline, b""):
+            if line.strip():
+                yield offset, json.loads(line)
+            offset = f.tell()
+
+
+def _file_signature(path: Path) -> list[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _save_index(path: Path, offsets: dict[str, int]) -> None:
+    payload = {"signature": _file_signature(path), "offsets": offsets}
+    with atomic_open(index_path(path)) as f:
+        json.dump(payload, f)
+
+
+def build_index(path: Path, key: str = "user_id") -> dict[str, int]:
+    """Пересобирает индекс одним проходом по файлу.
+
+    При дубликатах ключа в индекс попадает первое вхождение — так же,
+    как ``next(...)`` по списку в use cases.
+    """
+    offsets: dict[str, int] = {}
+    for offset, record in _iter_with_offsets(path):
+        offsets.setdefault(str(record.get(key)), offset)
+    _save_index(path, offsets)
+    return offsets
+
+
+def load_index(path: Path, key: str = "user_id") -> dict[str, int]:
+    """Индекс смещений; если файл данных менялся в обход индекса — пересборка."""
+    idx = index_path(path)
+    if idx.exists():
+        with idx.open("r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("signature") == _file_signature(path):
+            return payload["offsets"]
+    return build_index(path, key)
+
+
+def read_record(path: Path, key_value: Any, key: str = "user_id") -> Optional[dict]:
+    """Читает одну запись по ключу через индекс, не разбирая остальной файл."""
+    if not path.exists():
+        return None
+    offset = load_index(path, key).get(str(key_value))
+    if offset is None:
+        return None
+    with path.open("rb") as f:
+        f.seek(offset)
+        line = f.readline()
+    try:
+        record = json.loads(line)
+    except ValueError:
+        record = None
+    if record is not None and str(record.get(key)) == str(key_value):
+        return record
+    # файл заменили между чтением индекса и строки — индекс от старой версии
+    offset = build_index(path, key).get(str(key_value))
+    if offset is None:
+        return None
+    with path.open("rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+def write_records(path: Path, records: Iterable[dict], key: str = "user_id") -> int:
+    """Записывает записи построчно и сразу строит индекс. Возвращает их число."""
+    offsets: dict[str, int] = {}
+    count = 0
+    with atomic_open(path, "wb") as f:
+        for record in records:
+            offsets.setdefault(str(record.get(key)), f.tell())
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+            f.write(line.encode("utf-8") + b"\n")
+            count += 1
+    _save_index(path, offsets)
+    return count
+
+
+def convert_json_file(src: Path, dst: Path, key: str = "user_id") -> int:
+    """Конвертирует JSON-массив (текущий формат users/portfolios) в NDJSON."""
+    if not src.exists():
+        return write_records(dst, [], key)
+    with src.open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return write_records(dst, raw, key)
@@ -0,0 +1,377 @@
+"""Источники курсов с дедлайнами, хеджированием и автоматическим выключателем.
+
+Запрос курса идёт к первому здоровому источнику. Если он не ответил за
+«обычное» для него время (перцентиль hedge_percentile последних задержек),
+тот же запрос дублируется следующему источнику, и берётся первый успешный
+ответ. На весь запрос отводится deadline секунд, после чего бросается
+ApiRequestError (вызывающий код отдаёт курс из кэша).
+
+У каждого источника свой выключатель (circuit breaker): после
+failure_threshold ошибок или таймаутов подряд источник пропускается
+reset_seconds секунд, затем пропускается один пробный запрос.
+
+FakeProvider — локальный источник с искусственной задержкой и ошибками
+для проверки этого поведения без сети.
+"""
+
+from __future__ import annotations
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Deque, Dict, List, Optional, Tuple
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.infra.settings import SettingsLoader
+
+# задержка хеджирования, пока статистики мало (секунды)
+DEFAULT_HEDGE_DELAY = 0.2
+MIN_SAMPLES = 5
+
+
+class PairUnavailableError(ApiRequestError):
+    """Источник работает, но такой пары не знает (не сбой для выключателя)."""
+
+
+class RateProvider(ABC):
+    name: str = "provider"
+
+    @abstractmethod
+    def fetch(self, from_code: str, to_code: str) -> float:
+        """Курс from→to; бросает ApiRequestError, если пары нет."""
+
+
+class ParserServiceProvider(RateProvider):
+    """Заглушка Parser Service (известна только пара USD/BTC)."""
+
+    name = "parser"
+
+    _RATES = {
+        ("USD", "BTC"): 0.00001685,
+        ("BTC", "USD"): 59337.21,
+    }
+
+    def fetch(self, from_code: str, to_code: str) -> float:
+        rate = self._RATES.get((from_code, to_code))
+        if rate is None:
+            raise PairUnavailableError(
+                f"Курс {from_code}→{to_code} недоступен. Повторите попытку позже."
+            )
+        return rate
+
+
+class FakeProvider(RateProvider):
+    """Источник для проверок: курсы другого источника с задержкой и сбоями."""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        inner: Optional[RateProvider] = None,
+        delay: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.inner = inner or ParserServiceProvider()
+        self.delay = delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def fetch(self, from_code: str, to_code: str) -> float:
+        jitter = self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.delay + jitter))
+        if self._random.random() < self.failure_rate:
+            raise ApiRequestError(f"{self.name}: искусственный сбой")
+        return self.inner.fetch(from_code, to_code)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self, failure_threshold: int = 3, reset_seconds: float = 30.0
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            elapsed = time.monotonic() - self.opened_at
+            if self._state == self.OPEN and elapsed >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос (в half-open — только один пробный)."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            with self._lock:
+                # пробный запрос: до его результата источник снова «открыт»
+                self._state = self.OPEN
+                self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._state != self.CLOSED or self.failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ProviderStats:
+    def __init__(self, window: int = 200) -> None:
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedged = 0
+        self.short_circuited = 0
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        pos = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+        return ordered[pos]
+
+
+class ResilientFetcher:
+    def __init__(
+        self,
+        providers: List[RateProvider],
+        deadline: float = 2.0,
+        hedge_percentile: float = 95.0,
+        failure_threshold: int = 3,
+        reset_seconds: float = 30.0,
+    ) -> None:
+        if not providers:
+            raise ValueError("Нужен хотя бы один источник курсов")
+        self.providers = providers
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.breakers: Dict[str, CircuitBreaker] = {
+            p.name: CircuitBreaker(failure_threshold, reset_seconds) for p in providers
+        }
+        self.stats: Dict[str, ProviderStats] = {
+            p.name: ProviderStats() for p in providers
+        }
+
+    def _hedge_delay(self, provider: RateProvider) -> float:
+        stats = self.stats[provider.name]
+        if len(stats.latencies) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return stats.percentile(self.hedge_percentile) or DEFAULT_HEDGE_DELAY
+
+    def _submit(self, provider: RateProvider, from_code: str, to_code: str) -> Future:
+        """Вызов источника в отдельном потоке; результат — (курс, задержка).
+
+        Зависший вызов не отменить, поэтому поток daemon: он не держит
+        завершение процесса (в отличие от потоков ThreadPoolExecutor).
+        """
+        future: Future = Future()
+
+        def run() -> None:
+            started = time.monotonic()
+            try:
+                rate = provider.fetch(from_code, to_code)
+            except BaseException as exc:  # noqa: BLE001
+                future.set_exception(exc)
+            else:
+                future.set_result((rate, time.monotonic() - started))
+
+        future.set_running_or_notify_cancel()
+        threading.Thread(target=run, name=f"rate-{provider.name}", daemon=True).start()
+        return future
+
+    def _settle_late(
+        self, pending: Dict[Future, RateProvider], deadline_at: float, expired: bool
+    ) -> None:
+        """Учесть ответы, которых уже не ждут (проигравший хедж, таймаут).
+
+        Задержка медленного источника попадает в статистику, иначе его
+        перцентиль занижен и хеджирование запаздывает; не уложившийся
+        в дедлайн проигравший считается таймаутом для выключателя.
+        """
+
+        def settle(future: Future, provider: RateProvider) -> None:
+            stats = self.stats[provider.name]
+            try:
+                _, latency = future.result()
+            except PairUnavailableError:
+                return
+            except Exception:  # noqa: BLE001
+                if not expired:
+                    stats.failures += 1
+                    self.breakers[provider.name].record_failure()
+                return
+            stats.latencies.append(latency)
+            if expired:
+                return
+            if time.monotonic() > deadline_at:
+                stats.timeouts += 1
+                self.breakers[provider.name].record_failure()
+            else:
+                stats.successes += 1
+
+        for future, provider in pending.items():
+            future.add_done_callback(lambda f, p=provider: settle(f, p))
+
+    def fetch(self, from_code: str, to_code: str) -> Tuple[float, str]:
+        """(курс, имя_источника); ApiRequestError — нет ответа до дедлайна."""
+        deadline_at = time.monotonic() + self.deadline
+        candidates = []
+        for provider in self.providers:
+            if self.breakers[provider.name].allow():
+                candidates.append(provider)
+            else:
+                self.stats[provider.name].short_circuited += 1
+        if not candidates:
+            raise ApiRequestError("все источники курсов временно отключены")
+
+        pending: Dict[Future, RateProvider] = {}
+        errors: List[str] = []
+        unavailable: List[PairUnavailableError] = []
+        queue = list(candidates)
+
+        def launch() -> None:
+            provider = queue.pop(0)
+            self.stats[provider.name].calls += 1
+            pending[self._submit(provider, from_code, to_code)] = provider
+
+        launch()
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            # пока есть резервный источник, ждём не дольше порога хеджирования
+            timeout = remaining
+            if queue:
+                first = next(iter(pending.values()))
+                timeout = min(remaining, self._hedge_delay(first))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if queue:
+                    self.stats[queue[0].name].hedged += 1
+                    launch()
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                stats = self.stats[provider.name]
+                try:
+                    rate, latency = future.result()
+                except PairUnavailableError as exc:
+                    # источник здоров, просто не знает пару
+                    self.breakers[provider.name].record_success()
+                    unavailable.append(exc)
+                    continue
+                except ApiRequestError as exc:
+                    stats.failures += 1
+                    self.breakers[provider.name].record_failure()
+                    errors.append(f"{provider.name}: {exc.reason}")
+                    continue
+                except Exception as exc:  # noqa: BLE001
+                    stats.failures += 1
+                    self.breakers[provider.name].record_failure()
+                    errors.append(f"{provider.name}: {exc}")
+                    continue
+                stats.successes += 1
+                stats.latencies.append(latency)
+                self.breakers[provider.name].record_success()
+                self._settle_late(pending, deadline_at, expired=False)
+                return rate, provider.name
+
+            # источник ответил ошибкой — сразу пробуем следующий
+            if not pending and queue:
+                launch()
+
+        for provider in pending.values():
+            self.stats[provider.name].timeouts += 1
+            self.breakers[provider.name].record_failure()
+        self._settle_late(pending, deadline_at, expired=True)
+        if pending:
+            errors.append(f"нет ответа за {self.deadline:g} с")
+        if unavailable and not errors:
+            raise unavailable[0]
+        raise ApiRequestError("; ".join(errors) or "источники курсов не ответили")
+
+    def snapshot(self) -> List[dict]:
+        """Состояние источников для provider-stats."""
+        rows = []
+        for provider in self.providers:
+            stats = self.stats[provider.name]
+            rows.append(
+                {
+                    "name": provider.name,
+                    "state": self.breakers[provider.name].state,
+                    "calls": stats.calls,
+                    "successes": stats.successes,
+                    "failures": stats.failures,
+                    "timeouts": stats.timeouts,
+                    "hedged": stats.hedged,
+                    "short_circuited": stats.short_circuited,
+                    "p50": stats.percentile(50),
+                    "p95": stats.percentile(95),
+                }
+            )
+        return rows
+
+
+def _make_provider(name: str, settings: SettingsLoader) -> RateProvider:
+    if name == "parser":
+        return ParserServiceProvider()
+    if name == "fake":
+        return FakeProvider(
+            delay=float(settings.get("fake_provider_delay_ms", 0)) / 1000,
+            jitter=float(settings.get("fake_provider_jitter_ms", 0)) / 1000,
+            failure_rate=float(settings.get("fake_provider_failure_rate", 0.0)),
+        )
+    raise ValueError(f"Неизвестный источник курсов: {name}")
+
+
+_fetcher: Optional[ResilientFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> ResilientFetcher:
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            settings = SettingsLoader()
+            names = settings.get("rate_providers", ["parser"])
+            _fetcher = ResilientFetcher(
+                [_make_provider(name, settings) for name in names],
+                deadline=float(settings.get("provider_deadline_seconds", 2.0)),
+                hedge_percentile=float(settings.get("provider_hedge_percentile", 95)),
+                failure_threshold=int(settings.get("provider_breaker_failures", 3)),
+                reset_seconds=float(settings.get("provider_breaker_reset_seconds", 30)),
+            )
+        return _fetcher
+
+
+def set_fetcher(fetcher: Optional[ResilientFetcher]) -> None:
+    """Подменить набор источников (проверки с FakeProvider)."""
+    global _fetcher
+    with _fetcher_lock:
+        _fetcher = fetcher
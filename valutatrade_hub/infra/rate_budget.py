@@ -0,0 +1,136 @@
+"""Общий для всех процессов бюджет обращений к источнику курсов (token bucket).
+
+Состояние ведра лежит в ``<data_dir>/rate_budget.json``; каждое изменение
+делается под эксклюзивной блокировкой ``rate_budget.lock`` (fcntl.flock),
+поэтому сколько бы процессов CLI и воркеров ни работало на машине,
+обновлений курсов в минуту не больше refill_per_minute (плюс начальный
+запас capacity).
+
+Последние reserve жетонов достаются только «горячим» парам — тем, по которым
+недавно были сделки. Остальные пары при исчерпании бюджета получают
+устаревший курс из кэша.
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from valutatrade_hub.infra.settings import SettingsLoader
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса
+    fcntl = None
+
+BUDGET_FILENAME = "rate_budget.json"
+LOCK_FILENAME = "rate_budget.lock"
+
+
+class RateBudget:
+    def __init__(
+        self,
+        data_dir: Path,
+        capacity: float = 10,
+        refill_per_minute: float = 6,
+        reserve: float = 2,
+        hot_seconds: float = 600,
+    ) -> None:
+        self.path = data_dir / BUDGET_FILENAME
+        self.lock_path = data_dir / LOCK_FILENAME
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_minute) / 60.0
+        self.reserve = min(float(reserve), self.capacity)
+        self.hot_seconds = float(hot_seconds)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        """Состояние ведра под блокировкой; изменения сохраняются на выходе."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._thread_lock, self.lock_path.open("a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                state = self._read()
+                now = time.time()
+                self._refill(state, now)
+                yield state
+                tmp = self.path.with_suffix(".tmp")
+                with tmp.open("w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(tmp, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _read(self) -> dict:
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"tokens": self.capacity, "updated": time.time(), "hot": {}}
+
+    def _refill(self, state: dict, now: float) -> None:
+        elapsed = max(0.0, now - float(state.get("updated", now)))
+        state["tokens"] = min(
+            self.capacity,
+            float(state.get("tokens", 0.0)) + elapsed * self.refill_per_second,
+        )
+        state["updated"] = now
+        state["hot"] = {
+            pair: ts
+            for pair, ts in state.get("hot", {}).items()
+            if now - ts < self.hot_seconds
+        }
+
+    @staticmethod
+    def _is_hot(state: dict, pair: str) -> bool:
+        src, _, dst = pair.partition("_")
+        hot = state.get("hot", {})
+        return pair in hot or f"{dst}_{src}" in hot
+
+    def try_acquire(self, pair: str) -> bool:
+        """Взять жетон на обновление пары; False — бюджет исчерпан."""
+        with self._state() as state:
+            floor = 0.0 if self._is_hot(state, pair) else self.reserve
+            if state["tokens"] - 1.0 < floor:
+                return False
+            state["tokens"] -= 1.0
+            return True
+
+    def mark_traded(self, pair: str) -> None:
+        """Пометить пару как торгуемую: ей доступен резерв жетонов."""
+        with self._state() as state:
+            state["hot"][pair] = time.time()
+
+    def snapshot(self) -> dict:
+        with self._state() as state:
+            return {
+                "tokens": round(state["tokens"], 2),
+                "capacity": self.capacity,
+                "reserve": self.reserve,
+                "hot": sorted(state["hot"]),
+            }
+
+
+_budget: RateBudget | None = None
+
+
+def get_rate_budget() -> RateBudget:
+    global _budget
+    if _budget is None:
+        settings = SettingsLoader()
+        root = Path(settings.get("project_root", "."))
+        data_dir = root / settings.get("data_dir", "data")
+        _budget = RateBudget(
+            data_dir,
+            capacity=settings.get("rate_budget_capacity", 10),
+            refill_per_minute=settings.get("rate_budget_per_minute", 6),
+            reserve=settings.get("rate_budget_reserve", 2),
+            hot_seconds=settings.get("rate_budget_hot_seconds", 600),
+        )
+    return _budget
@@ -0,0 +1,174 @@
+"""Подключаемые форматы хранения для users/portfolios.
+
+Все сериализаторы работают со списком записей-словарей (как в JSON-файлах),
+поэтому use cases не зависят от формата. Формат выбирается настройкой
+``storage_format`` в ``[tool.valutatrade]``: json | ndjson | binary.
+Читатели не берут блокировок, поэтому dump не переписывает файл на месте,
+а заменяет его целиком (infra/atomic_file.py).
+"""
+
+from __future__ import annotations
+import gc
+import json
+import marshal
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+from valutatrade_hub.infra import ndjson
+from valutatrade_hub.infra.atomic_file import atomic_open
+
+
+class Serializer(ABC):
+    """Базовый сериализатор: загрузка/сохранение списка записей."""
+
+    name: str = ""
+    suffix: str = ""
+
+    @abstractmethod
+    def load(self, path: Path) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def dump(self, path: Path, records: Iterable[dict]) -> None:
+        raise NotImplementedError
+
+    def iter(self, path: Path) -> Iterator[dict]:
+        """Записи по одной; по умолчанию — поверх полной загрузки."""
+        yield from self.load(path)
+
+    def find(self, path: Path, user_id: int) -> Optional[dict]:
+        """Первая запись с указанным user_id."""
+        return next((r for r in self.iter(path) if r.get("user_id") == user_id), None)
+
+    def select(self, path: Path, user_ids: set[int]) -> Iterator[tuple[int, dict]]:
+        """(номер записи, запись) для записей с user_id из user_ids.
+
+        Файл-документ (JSON-массив, снимок) разбирается целиком, отбор —
+        после разбора; построчные форматы пропускают чужие строки раньше.
+        """
+        for number, record in enumerate(self.iter(path)):
+            if int(record.get("user_id") or 0) in user_ids:
+                yield number, record
+
+
+class JsonSerializer(Serializer):
+    """Исходный формат: JSON-массив с отступами."""
+
+    name = "json"
+    suffix = ".json"
+
+    def load(self, path: Path) -> list[dict]:
+        if not path.exists():
+            return []
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def dump(self, path: Path, records: Iterable[dict]) -> None:
+        with atomic_open(path) as f:
+            json.dump(list(records), f, ensure_ascii=False, indent=4)
+
+
+class NdjsonSerializer(Serializer):
+    """Построчный формат с индексом смещений (см. infra/ndjson.py)."""
+
+    name = "ndjson"
+    suffix = ".ndjson"
+
+    def load(self, path: Path) -> list[dict]:
+        return list(ndjson.iter_records(path))
+
+    def dump(self, path: Path, records: Iterable[dict]) -> None:
+        ndjson.write_records(path, records)
+
+    def iter(self, path: Path) -> Iterator[dict]:
+        yield from ndjson.iter_records(path)
+
+    def find(self, path: Path, user_id: int) -> Optional[dict]:
+        return ndjson.read_record(path, user_id)
+
+    def select(self, path: Path, user_ids: set[int]) -> Iterator[tuple[int, dict]]:
+        yield from ndjson.iter_selected(path, user_ids)
+
+
+class BinarySnapshotSerializer(Serializer):
+    """Компактный бинарный снимок на marshal (только stdlib).
+
+    Коды валют вынесены в таблицу в начале снимка, а в кошельках вместо
+    кода записан его номер в ней: код хранится один раз независимо от числа
+    портфелей. При загрузке номера заменяются строками из таблицы (одни и те
+    же объекты для всех записей). Сборщик мусора на время разбора
+    приостанавливается: снимок порождает сотни тысяч мелких dict, и без паузы
+    GC съедает больше времени, чем сам разбор. Снимок привязан к версии
+    marshal; при её смене данные нужно пересохранить (convert-storage).
+    """
+
+    name = "binary"
+    suffix = ".bin"
+    MAGIC = b"VTSNAP3\n"
+
+    def load(self, path: Path) -> list[dict]:
+        if not path.exists():
+            return []
+        with path.open("rb") as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f"{path.name}: не бинарный снимок ValutaTrade")
+            raw = f.read()
+
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            version, codes, records = marshal.loads(raw)
+            if version != marshal.version:
+                raise ValueError(
+                    f"{path.name}: снимок создан другой версией marshal"
+                )
+            return [self._unpack_codes(record, codes) for record in records]
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def dump(self, path: Path, records: Iterable[dict]) -> None:
+        ids: dict[str, int] = {}
+        packed = [self._pack_codes(record, ids) for record in records]
+        with atomic_open(path, "wb") as f:
+            f.write(self.MAGIC)
+            marshal.dump((marshal.version, list(ids), packed), f)
+
+    @staticmethod
+    def _pack_codes(record: dict, ids: dict[str, int]) -> dict:
+        wallets = record.get("wallets")
+        if not isinstance(wallets, dict):
+            return record
+        packed = dict(record)
+        packed["wallets"] = {
+            ids.setdefault(code, len(ids)): data for code, data in wallets.items()
+        }
+        return packed
+
+    @staticmethod
+    def _unpack_codes(record: dict, codes: list[str]) -> dict:
+        wallets = record.get("wallets")
+        if isinstance(wallets, dict):
+            record["wallets"] = {codes[i]: data for i, data in wallets.items()}
+        return record
+
+
+_SERIALIZERS: dict[str, Serializer] = {
+    s.name: s
+    for s in (JsonSerializer(), NdjsonSerializer(), BinarySnapshotSerializer())
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    """Сериализатор по имени формата; ValueError для неизвестного."""
+    serializer = _SERIALIZERS.get((name or "json").lower())
+    if serializer is None:
+        available = ", ".join(_SERIALIZERS)
+        raise ValueError(
+            f"Неизвестный формат хранения '{name}'. Доступно: {available}"
+        )
+    return serializer
+
+
+def available_formats() -> list[str]:
+    return list(_SERIALIZERS)
@@ -46,6 +46,42 @@ class SettingsLoader:
             "rates_ttl_seconds": vt.get("rates_ttl_seconds", 300),
             "base_currency": vt.get("base_currency", "USD"),
             "logs_dir": vt.get("logs_dir", "logs"),
+            # период партиций журнала: "H" (час), "D" (сутки), "midnight"
+            "log_partition": vt.get("log_partition", "H"),
+            # формат хранения users/portfolios: "json" | "ndjson" | "binary"
+            "storage_format": vt.get("storage_format", "json"),
+            # каталог валют (относительно data_dir)
+            "currencies_file": vt.get("currencies_file", "currencies.json"),
+            # ключи идемпотентности buy/sell: срок жизни и число хранимых
+            "idempotency_ttl_seconds": vt.get("idempotency_ttl_seconds", 86400),
+            "idempotency_max_keys": vt.get("idempotency_max_keys", 1000),
+            # бюджет обновлений курсов на все процессы (token bucket):
+            # запас, пополнение в минуту, резерв для торгуемых пар
+            "rate_budget_capacity": vt.get("rate_budget_capacity", 10),
+            "rate_budget_per_minute": vt.get("rate_budget_per_minute", 6),
+            "rate_budget_reserve": vt.get("rate_budget_reserve", 2),
+            "rate_budget_hot_seconds": vt.get("rate_budget_hot_seconds", 600),
+            # источники курсов по приоритету ("parser", "fake"), дедлайн запроса,
+            # перцентиль задержки для хеджирования и выключатель (circuit breaker)
+            "rate_providers": vt.get("rate_providers", ["parser"]),
+            "provider_deadline_seconds": vt.get("provider_deadline_seconds", 2.0),
+            "provider_hedge_percentile": vt.get("provider_hedge_percentile", 95),
+            "provider_breaker_failures": vt.get("provider_breaker_failures", 3),
+            "provider_breaker_reset_seconds": vt.get(
+                "provider_breaker_reset_seconds", 30
+            ),
+            # искусственные задержки и сбои источника "fake"
+            "fake_provider_delay_ms": vt.get("fake_provider_delay_ms", 0),
+            "fake_provider_jitter_ms": vt.get("fake_provider_jitter_ms", 0),
+            "fake_provider_failure_rate": vt.get("fake_provider_failure_rate", 0.0),
+            # срок жизни сессии входа (токен login), секунды
+            "session_ttl_seconds": vt.get("session_ttl_seconds", 604800),
+            # сколько секунд действует котировка (quote) для buy/sell --quote
+            "quote_ttl_seconds": vt.get("quote_ttl_seconds", 30),
+            # локальный HTTP API (valutatrade_hub.api.server)
+            "api_host": vt.get("api_host", "127.0.0.1"),
+            "api_port": vt.get("api_port", 8765),
+            "api_workers": vt.get("api_workers", 4),
             "log_format": vt.get(
                 "log_format",
                 "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -1,7 +1,7 @@
 from __future__ import annotations
 import logging
-from logging.handlers import RotatingFileHandler  # [web:452][web:450]
 from pathlib import Path
+from valutatrade_hub.infra.log_archive import PartitionedFileHandler
 from valutatrade_hub.infra.settings import SettingsLoader
 
 
@@ -37,11 +37,11 @@ def setup_logging(force: bool = False) -> None:
     # Удаляем старые хендлеры, чтобы при повторном вызове не дублировать вывод
     logger.handlers.clear()
 
-    # Хендлер ротации файла: ~1 МБ, 5 резервных копий
-    file_handler = RotatingFileHandler(
+    # Партиции по времени (по умолчанию почасовые): закрытые партиции
+    # сжимаются в фоне в logs/archive/*.log.gz и хранятся без ограничения числа
+    file_handler = PartitionedFileHandler(
         log_path,
-        maxBytes=1_000_000,
-        backupCount=5,
+        when=settings.get("log_partition", "H"),
         encoding="utf-8",
     )
     file_formatter = logging.Formatter(